@@ -0,0 +1,91 @@
+"""
+Benchmark of per-request authentication overhead (`verify_token_dep`) with a locally generated key set.
+
+Usage: uv run ./scripts/benchmark_auth.py --requests 2000
+Results are printed as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+from fastapi.security import HTTPAuthorizationCredentials
+from joserfc import jwt
+from joserfc.jwk import RSAKey
+
+# add parent dir to sys.path
+sys.path.append(str(Path(__file__).parents[1]))
+from src.api.dependencies import verify_token_dep  # noqa: E402
+from src.modules.inh_accounts_sdk import inh_accounts  # noqa: E402
+
+
+async def benchmark(requests: int, tokens: int) -> dict:
+    key = RSAKey.generate_key(2048, parameters={"kid": inh_accounts.PUBLIC_KID})
+    with patch.object(inh_accounts, "get_key_set", AsyncMock(return_value={"keys": [key.as_dict(private=False)]})):
+        await inh_accounts.update_key_set()
+    exp = int(time.time()) + 3600
+    credentials = [
+        HTTPAuthorizationCredentials(
+            scheme="Bearer",
+            credentials=jwt.encode(
+                {"alg": "RS256", "kid": key.kid},
+                {"uid": str(i), "email": f"user{i}@innopolis.university", "exp": exp},
+                key,
+            ),
+        )
+        for i in range(tokens)
+    ]
+
+    async def run(cached: bool) -> float:
+        start = time.perf_counter()
+        for i in range(requests):
+            if not cached:
+                inh_accounts._verified_tokens.clear()
+            await verify_token_dep(credentials[i % tokens])
+        return (time.perf_counter() - start) / requests
+
+    # previous behaviour: the public key was imported from JWKS on every request
+    public_jwk = key.as_dict(private=False)
+    with patch.object(inh_accounts, "get_public_key", lambda kid=None: RSAKey.import_key(public_jwk)):
+        import_every_request = await run(cached=False)
+    uncached = await run(cached=False)
+    cached = await run(cached=True)
+    return {
+        "benchmark": "auth",
+        "requests": requests,
+        "distinct_tokens": tokens,
+        "results": [
+            {
+                "mode": "import key and verify every request",
+                "microseconds_per_request": round(import_every_request * 1e6, 1),
+            },
+            {
+                "mode": "verify every request",
+                "microseconds_per_request": round(uncached * 1e6, 1),
+                "speedup": round(import_every_request / uncached, 1),
+            },
+            {
+                "mode": "verified tokens cache",
+                "microseconds_per_request": round(cached * 1e6, 1),
+                "speedup": round(import_every_request / cached, 1),
+            },
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=20, help="Number of distinct tokens (users)")
+    args = parser.parse_args()
+    logging.getLogger("src").setLevel(logging.WARNING)
+    print(json.dumps(asyncio.run(benchmark(args.requests, args.tokens)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
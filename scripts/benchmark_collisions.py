@@ -0,0 +1,310 @@
+"""
+Collisions check benchmarks on synthetic spreadsheets (see tests/fixtures/xlsx.py) and synthetic semesters
+(see tests/fixtures/semester.py).
+
+Usage:
+  uv run ./scripts/benchmark_collisions.py checks --scales 1 2 4 8
+  uv run ./scripts/benchmark_collisions.py checks --scales 4 16 64 --checks room teacher capacity --workers 1 3
+  uv run ./scripts/benchmark_collisions.py wire-format --sheets 6
+  uv run ./scripts/benchmark_collisions.py pipeline --sheets 6 --latency 0.3
+Results are printed as JSON together with the current commit, so that they can be compared across commits.
+"""
+
+import argparse
+import asyncio
+import datetime
+import gzip
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+# add parent dir to sys.path
+sys.path.append(str(Path(__file__).parents[1]))
+from src.core_courses.config import Target  # noqa: E402
+from src.modules.bookings.client import BookingDTO, RoomDTO  # noqa: E402
+from src.modules.collisions.check import CheckTimings, run_check  # noqa: E402
+from src.modules.collisions.collision_checker import CollisionChecker, Weekdays  # noqa: E402
+from src.modules.collisions.core_courses_adapter import get_all_core_courses_lessons  # noqa: E402
+from src.modules.collisions.parallel import checks_pool  # noqa: E402
+from src.modules.collisions.schemas import CheckParameters, CheckResults, Lesson, NormalizedCheckResults  # noqa: E402
+from src.modules.options.repository import OptionsData, SemesterOptions  # noqa: E402
+from tests.fixtures.semester import generate_semester  # noqa: E402
+from tests.fixtures.xlsx import (  # noqa: E402
+    build_core_courses_workbook,
+    core_courses_config,
+    core_courses_sheet_names,
+    sheet_gids,
+)
+
+BOOKING_TITLES = ["Meeting", "Exam", "Workshop", "Defense", "Seminar"]
+
+
+def synthetic_check_results(sheets: int, seed: int) -> CheckResults:
+    """Parse a synthetic core courses workbook and check it with synthetic rooms and Outlook bookings."""
+    lessons, rooms, targets, bookings = _synthetic_check_inputs(sheets, seed)
+    booking_client = AsyncMock()
+    booking_client.get_all_bookings.return_value = bookings
+
+    checker = CollisionChecker(token="", rooms=rooms, teachers=[], very_same_lessons=[])
+    with patch("src.modules.collisions.collision_checker.booking_client", booking_client):
+        issues = asyncio.run(checker.get_collisions(lessons, targets=targets))
+    return CheckResults(issues=issues)
+
+
+def _synthetic_check_inputs(
+    sheets: int, seed: int
+) -> tuple[list[Lesson], list[RoomDTO], list[Target], list[BookingDTO]]:
+    """Lessons of a synthetic core courses workbook, rooms of the lessons, targets from today and Outlook bookings."""
+    rng = random.Random(seed)
+    config = core_courses_config(sheets)
+    with _patched_core_courses_download(sheets, seed):
+        lessons = asyncio.run(get_all_core_courses_lessons(config))
+    room_ids = sorted({room for lesson in lessons if lesson.room for room in CollisionChecker._rooms_set(lesson)})
+    rooms = [RoomDTO(id=room, title=room, capacity=rng.randint(20, 60)) for room in room_ids]
+
+    # targets start today, so that the bookings are in the future and are not skipped by the Outlook check
+    today = datetime.date.today()
+    targets = [
+        Target(
+            sheet_name=target.sheet_name, start_date=today, end_date=today + datetime.timedelta(days=28), override=[]
+        )
+        for target in config.targets
+    ]
+    return lessons, rooms, targets, _synthetic_bookings(lessons, today, rng)
+
+
+def _patched_core_courses_download(sheets: int, seed: int, latency: float = 0):
+    async def fetch_xlsx_spreadsheet(**_):
+        await asyncio.sleep(latency)
+        return build_core_courses_workbook(sheets=sheets, seed=seed)
+
+    return patch.multiple(
+        "src.modules.collisions.core_courses_adapter",
+        fetch_xlsx_spreadsheet=fetch_xlsx_spreadsheet,
+        get_sheet_gids=AsyncMock(return_value=sheet_gids(core_courses_sheet_names(sheets))),
+    )
+
+
+def _synthetic_bookings(lessons: list[Lesson], today: datetime.date, rng: random.Random) -> list[BookingDTO]:
+    tz = datetime.timezone(datetime.timedelta(hours=3))
+    bookings = []
+    for lesson in lessons:
+        if not isinstance(lesson.room, str) or not lesson.weekday or rng.random() > 0.2:
+            continue
+        days_ahead = (Weekdays.get_weekday(lesson.weekday) - today.weekday()) % 7 + 7 * rng.randint(1, 3)
+        date = today + datetime.timedelta(days=days_ahead)
+        bookings.append(
+            BookingDTO.model_validate(
+                {
+                    "room_id": lesson.room,
+                    "title": rng.choice(BOOKING_TITLES),
+                    "start": datetime.datetime.combine(date, lesson.start_time, tzinfo=tz),
+                    "end": datetime.datetime.combine(date, lesson.end_time, tzinfo=tz),
+                }
+            )
+        )
+    return bookings
+
+
+def benchmark_checks(args: argparse.Namespace) -> dict:
+    """Time of every kind of collisions check on synthetic semesters of growing scale, bookings are not fetched. With
+    --workers, also time of room, teacher and capacity checks together in `get_collisions` with that many workers."""
+    results = []
+    for scale in args.scales:
+        semester = generate_semester(
+            courses=4 * scale,
+            electives=10 * scale,
+            rooms=30 * scale,
+            teachers=40 * scale,
+            weeks=args.weeks,
+            seed=args.seed,
+        )
+        checker = CollisionChecker(token="", rooms=semester.rooms, teachers=semester.teachers, very_same_lessons=[])
+        booking_client = AsyncMock()
+        booking_client.get_all_bookings.return_value = semester.bookings
+        checks = {
+            "room": lambda: checker.check_for_room_issue(semester.lessons),
+            "teacher": lambda: checker.check_for_teacher_issue(semester.lessons),
+            "capacity": lambda: checker.check_for_capacity_issue(semester.lessons),
+            "outlook": lambda: asyncio.run(checker.check_for_outlook_issue(semester.lessons, semester.targets)),
+        }
+        with patch("src.modules.collisions.collision_checker.booking_client", booking_client):
+            for check, fn in checks.items():
+                if args.checks and check not in args.checks:
+                    continue
+                issues = fn()
+                seconds = min(_timed(fn) for _ in range(args.repeat))
+                results.append(
+                    {
+                        "scale": scale,
+                        "lessons": len(semester.lessons),
+                        "bookings": len(semester.bookings),
+                        "check": check,
+                        "issues": len(issues),
+                        "seconds": round(seconds, 4),
+                    }
+                )
+        for workers in args.workers or []:
+
+            def check_all(workers: int = workers) -> list:
+                return asyncio.run(
+                    checker.get_collisions(semester.lessons, check_outlook_collisions=False, workers=workers)
+                )
+
+            issues = check_all()  # worker processes are started on the first run
+            seconds = min(_timed(check_all) for _ in range(args.repeat))
+            results.append(
+                {
+                    "scale": scale,
+                    "lessons": len(semester.lessons),
+                    "check": "room+teacher+capacity",
+                    "workers": workers,
+                    "issues": len(issues),
+                    "seconds": round(seconds, 4),
+                }
+            )
+    checks_pool.shutdown()
+    return {"benchmark": "checks", **_environment(), "weeks": args.weeks, "seed": args.seed, "results": results}
+
+
+def benchmark_wire_format(args: argparse.Namespace) -> dict:
+    """`CheckResults` against `NormalizedCheckResults`: bytes on the wire and serialization time."""
+    results = synthetic_check_results(args.sheets, args.seed)
+
+    def serialize(output_format: str) -> bytes:
+        if output_format == "normalized":
+            return NormalizedCheckResults.from_check_results(results).model_dump_json().encode()
+        return results.model_dump_json().encode()
+
+    formats = []
+    for output_format in ("nested", "normalized"):
+        content = serialize(output_format)
+        serialize_seconds = min(_timed(serialize, output_format) for _ in range(args.repeat))
+        parse_seconds = min(_timed(json.loads, content) for _ in range(args.repeat))
+        formats.append(
+            {
+                "format": output_format,
+                "bytes": len(content),
+                "gzip_bytes": len(gzip.compress(content)),
+                "serialize_seconds": round(serialize_seconds, 4),
+                "json_parse_seconds": round(parse_seconds, 4),
+            }
+        )
+    return {
+        "benchmark": "wire-format",
+        **_environment(),
+        "sheets": args.sheets,
+        "issues": dict(Counter(issue.collision_type.value for issue in results.issues)),
+        "results": formats,
+    }
+
+
+def benchmark_pipeline(args: argparse.Namespace) -> dict:
+    """`run_check` on a synthetic workbook with simulated latency of Google Sheets and InNoHassle Booking: start and
+    end of every phase, so that overlapping phases are seen, and wall time against the sum of phases."""
+    lessons, rooms, targets, bookings = _synthetic_check_inputs(args.sheets, args.seed)
+    options = OptionsData(
+        semester=SemesterOptions(
+            name="benchmark", core_courses_spreadsheet_id="benchmark", core_courses_targets=targets
+        )
+    )
+
+    async def get_rooms(token: str) -> list[RoomDTO]:
+        await asyncio.sleep(args.latency)
+        return rooms
+
+    async def get_all_bookings(**_) -> list[BookingDTO]:
+        await asyncio.sleep(args.latency)
+        return bookings
+
+    booking_client = AsyncMock()
+    booking_client.get_rooms.side_effect = get_rooms
+    booking_client.get_all_bookings.side_effect = get_all_bookings
+
+    def run() -> tuple[float, CheckTimings, CheckResults]:
+        timings = CheckTimings()
+        with (
+            _patched_core_courses_download(args.sheets, args.seed, latency=args.latency),
+            patch("src.modules.collisions.check.booking_client", booking_client),
+            patch("src.modules.collisions.collision_checker.booking_client", booking_client),
+        ):
+            start = time.perf_counter()
+            results = asyncio.run(run_check(options, CheckParameters(), token="", timings=timings))
+            return time.perf_counter() - start, timings, results
+
+    seconds, timings, results = min((run() for _ in range(args.repeat)), key=lambda result: result[0])
+    return {
+        "benchmark": "pipeline",
+        **_environment(),
+        "sheets": args.sheets,
+        "latency_seconds": args.latency,
+        "lessons": len(lessons),
+        "issues": len(results.issues),
+        "phases": {
+            name: {"start": round(start, 4), "end": round(end, 4)} for name, (start, end) in timings.phases.items()
+        },
+        "sum_of_phases_seconds": round(sum(end - start for start, end in timings.phases.values()), 4),
+        "wall_seconds": round(seconds, 4),
+    }
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version()}
+
+
+def _timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    checks = subparsers.add_parser("checks", help=benchmark_checks.__doc__)
+    checks.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4], help="4 courses and 10 electives per unit")
+    checks.add_argument("--checks", nargs="+", choices=["room", "teacher", "capacity", "outlook"])
+    checks.add_argument("--workers", type=int, nargs="+", help="numbers of workers for checks in get_collisions")
+    checks.add_argument("--weeks", type=int, default=8)
+    checks.add_argument("--seed", type=int, default=0)
+    checks.add_argument("--repeat", type=int, default=3)
+    checks.set_defaults(func=benchmark_checks)
+
+    wire_format = subparsers.add_parser("wire-format", help=benchmark_wire_format.__doc__)
+    wire_format.add_argument("--sheets", type=int, default=6)
+    wire_format.add_argument("--seed", type=int, default=0)
+    wire_format.add_argument("--repeat", type=int, default=5)
+    wire_format.set_defaults(func=benchmark_wire_format)
+
+    pipeline = subparsers.add_parser("pipeline", help=benchmark_pipeline.__doc__)
+    pipeline.add_argument("--sheets", type=int, default=6)
+    pipeline.add_argument("--latency", type=float, default=0.3, help="Seconds of every download and request")
+    pipeline.add_argument("--seed", type=int, default=0)
+    pipeline.add_argument("--repeat", type=int, default=3)
+    pipeline.set_defaults(func=benchmark_pipeline)
+
+    args = parser.parse_args()
+    # keep stdout clean for JSON output
+    logging.getLogger("src").setLevel(logging.WARNING)
+    stdout = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    print(json.dumps(args.func(args), indent=2), file=stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Parser benchmarks on synthetic spreadsheets (see tests/fixtures/xlsx.py).
+
+Usage: uv run ./scripts/benchmark_parser.py {throughput,parallel,cells,readers,responses} --sheets 12
+Results are printed as JSON.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import get_args
+from unittest.mock import AsyncMock, patch
+
+import openpyxl
+import yaml
+
+# add parent dir to sys.path
+sys.path.append(str(Path(__file__).parents[1]))
+from src.core_courses.config import CoreCoursesEngine  # noqa: E402
+from src.core_courses.parser import CoreCoursesParser  # noqa: E402
+from src.electives.config import ElectivesReader  # noqa: E402
+from src.modules.collisions.core_courses_adapter import get_all_core_courses_lessons  # noqa: E402
+from src.modules.collisions.electives_adapter import get_all_electives_lessons  # noqa: E402
+from src.modules.parser.routes import parse_core_courses_route  # noqa: E402
+from src.utils import (
+    XlsxReaderName,  # noqa: E402
+    sanitize_sheet_name,  # noqa: E402
+)
+from src.xlsx import XLSX_READERS  # noqa: E402
+from tests.fixtures.xlsx import (  # noqa: E402
+    build_core_courses_workbook,
+    build_electives_workbook,
+    core_courses_config,
+    core_courses_sheet_names,
+    electives_config,
+    electives_sheet_names,
+    sheet_gids,
+)
+
+
+def benchmark_throughput(args: argparse.Namespace) -> dict:
+    """End-to-end `get_all_core_courses_lessons` and `get_all_electives_lessons`: cells per second and peak memory."""
+    kinds = {
+        "core_courses": (
+            build_core_courses_workbook(sheets=args.sheets, seed=args.seed).getvalue(),
+            core_courses_config(args.sheets),
+            core_courses_sheet_names(args.sheets),
+            get_all_core_courses_lessons,
+        ),
+        "electives": (
+            build_electives_workbook(sheets=args.sheets, weeks=args.weeks, seed=args.seed).getvalue(),
+            electives_config(args.sheets),
+            electives_sheet_names(args.sheets),
+            get_all_electives_lessons,
+        ),
+    }
+    results = []
+    for kind, (content, config, sheet_names, get_all_lessons) in kinds.items():
+        if args.kinds and kind not in args.kinds:
+            continue
+        workbook = openpyxl.load_workbook(io.BytesIO(content))
+        cells = sum(
+            1
+            for sheet_name in sheet_names
+            for row in workbook[sheet_name].iter_rows(values_only=True)
+            for v in row
+            if v
+        )
+
+        def run(trace_memory: bool) -> tuple[float, int, int]:
+            adapter = f"src.modules.collisions.{kind}_adapter"
+            with (
+                patch(f"{adapter}.fetch_xlsx_spreadsheet", AsyncMock(side_effect=lambda **_: io.BytesIO(content))),
+                patch(f"{adapter}.get_sheet_gids", AsyncMock(return_value=sheet_gids(sheet_names))),
+            ):
+                if trace_memory:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                if kind == "core_courses":
+                    kwargs = {"engine": args.engine, "reader": args.core_courses_reader}
+                else:
+                    kwargs = {"reader": args.electives_reader}
+                lessons = asyncio.run(get_all_lessons(config, **kwargs))
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+                tracemalloc.stop()
+            return seconds, len(lessons), peak
+
+        timings = [run(trace_memory=False) for _ in range(args.repeat)]
+        seconds = min(t[0] for t in timings)
+        peak = run(trace_memory=True)[2]
+        results.append(
+            {
+                "kind": kind,
+                **({"engine": args.engine} if kind == "core_courses" else {}),
+                "reader": args.core_courses_reader if kind == "core_courses" else args.electives_reader,
+                "sheets": args.sheets,
+                "xlsx_bytes": len(content),
+                "cells": cells,
+                "lessons": timings[0][1],
+                "seconds": round(seconds, 4),
+                "cells_per_second": round(cells / seconds),
+                "peak_traced_memory_mb": round(peak / 2**20, 2),
+            }
+        )
+    return {"benchmark": "throughput", "results": results}
+
+
+def benchmark_parallel(args: argparse.Namespace) -> dict:
+    """Sequential `CoreCoursesParser.pipeline` against `pipeline_parallel` with different number of workers."""
+    xlsx = build_core_courses_workbook(sheets=args.sheets, seed=args.seed)
+    sheet_names = core_courses_sheet_names(args.sheets)
+    gids = sheet_gids(sheet_names)
+    cpu_count = os.cpu_count() or 1
+
+    def run(max_workers: int | None) -> float:
+        best = float("inf")
+        for _ in range(args.repeat):
+            parser = CoreCoursesParser()
+            start = time.perf_counter()
+            if max_workers is None:
+                list(parser.pipeline(xlsx, sheet_names, gids, "benchmark"))
+            else:
+                list(parser.pipeline_parallel(xlsx, sheet_names, gids, "benchmark", max_workers=max_workers))
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    sequential = run(None)
+    results = [{"workers": 0, "mode": "sequential", "seconds": round(sequential, 4), "speedup": 1.0}]
+    workers = sorted({1, 2, 4, 8, cpu_count} & set(range(1, max(cpu_count, 2) + 1)))
+    for max_workers in workers:
+        seconds = run(max_workers)
+        results.append(
+            {
+                "workers": max_workers,
+                "mode": "parallel",
+                "seconds": round(seconds, 4),
+                "speedup": round(sequential / seconds, 2),
+            }
+        )
+    return {"benchmark": "parallel", "cpu_count": cpu_count, "sheets": args.sheets, "results": results}
+
+
+def benchmark_cells(args: argparse.Namespace) -> dict:
+    """Cells of clear core courses sheets: `process_sheet_df` dataframes against `iter_sheet_cells`."""
+    xlsx = build_core_courses_workbook(sheets=args.sheets, seed=args.seed)
+    sheet_names = [sanitize_sheet_name(sheet_name) for sheet_name in core_courses_sheet_names(args.sheets)]
+    parser = CoreCoursesParser()
+    dfs, _ = parser.get_clear_dataframes_from_xlsx(xlsx, sheet_names)
+    kwargs = dict(spreadsheet_id="benchmark", google_sheet_name="benchmark", google_sheet_gid="0")
+
+    def dataframes(sheet_name: str) -> list:
+        # time columns are detected from the sheet, the xlsx is only used to log the rightmost column
+        with patch.object(parser, "get_rightmost_column_index", return_value=0):
+            grouped_dfs_with_cells_lst = parser.process_sheet_df(dfs[sheet_name].copy(), xlsx, sheet_name, **kwargs)
+        return [
+            cell
+            for grouped_dfs_with_cells in grouped_dfs_with_cells_lst
+            for _, column in grouped_dfs_with_cells.items()
+            for cell in column
+            if cell is not None
+        ]
+
+    def cells(sheet_name: str) -> list:
+        return [cell for *_, cell in parser.iter_sheet_cells(dfs[sheet_name], **kwargs)]
+
+    def run(extract, trace_memory: bool) -> tuple[float, int, int]:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        count = sum(len(extract(sheet_name)) for sheet_name in sheet_names)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+        tracemalloc.stop()
+        return seconds, count, peak
+
+    results = []
+    for engine, extract in (("dataframes", dataframes), ("cells", cells)):
+        timings = [run(extract, trace_memory=False) for _ in range(args.repeat)]
+        seconds = min(t[0] for t in timings)
+        peak = run(extract, trace_memory=True)[2]
+        results.append(
+            {
+                "engine": engine,
+                "cells": timings[0][1],
+                "seconds_per_sheet": round(seconds / args.sheets, 4),
+                "peak_traced_memory_mb": round(peak / 2**20, 2),
+            }
+        )
+    results[1]["speedup"] = round(results[0]["seconds_per_sheet"] / results[1]["seconds_per_sheet"], 2)
+    return {"benchmark": "cells", "sheets": args.sheets, "results": results}
+
+
+def benchmark_readers(args: argparse.Namespace) -> dict:
+    """Xlsx readers side by side: time to read target sheets of the same workbooks into grids and peak memory."""
+    workbooks = {
+        "core_courses": (
+            build_core_courses_workbook(sheets=args.sheets, seed=args.seed),
+            core_courses_sheet_names(args.sheets),
+        ),
+        "electives": (
+            build_electives_workbook(sheets=args.sheets, weeks=args.weeks, seed=args.seed),
+            electives_sheet_names(args.sheets),
+        ),
+    }
+    results = []
+    for kind, (xlsx, original_sheet_names) in workbooks.items():
+        sheet_names = [sanitize_sheet_name(sheet_name) for sheet_name in original_sheet_names]
+        kind_results = []
+        for name, reader in XLSX_READERS.items():
+
+            def run(trace_memory: bool) -> tuple[float, int]:
+                if trace_memory:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                reader.read_sheets(xlsx, sheet_names)
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+                tracemalloc.stop()
+                return seconds, peak
+
+            seconds = min(run(trace_memory=False)[0] for _ in range(args.repeat))
+            kind_results.append(
+                {
+                    "kind": kind,
+                    "reader": name,
+                    "xlsx_bytes": xlsx.getbuffer().nbytes,
+                    "seconds": round(seconds, 4),
+                    "peak_traced_memory_mb": round(run(trace_memory=True)[1] / 2**20, 2),
+                }
+            )
+        for result in kind_results:
+            result["speedup"] = round(kind_results[0]["seconds"] / result["seconds"], 2)
+        results.extend(kind_results)
+    return {"benchmark": "readers", "sheets": args.sheets, "results": results}
+
+
+def benchmark_responses(args: argparse.Namespace) -> dict:
+    """`/parser/parse-core-courses` response formats: time to first byte, total time and peak traced memory."""
+    config_yaml = yaml.safe_dump(core_courses_config(args.sheets).model_dump(mode="json"))
+    gids = sheet_gids(core_courses_sheet_names(args.sheets))
+
+    async def respond(output_format: str) -> tuple[float, float, int]:
+        start = time.perf_counter()
+        response = await parse_core_courses_route(None, input=config_yaml, output_format=output_format)  # type: ignore
+        first_byte = None
+        size = 0
+        if hasattr(response, "body_iterator"):
+            async for chunk in response.body_iterator:
+                first_byte = first_byte or time.perf_counter()
+                size += len(chunk)
+        else:
+            first_byte = time.perf_counter()
+            size = len(response.body)
+        return first_byte - start, time.perf_counter() - start, size
+
+    def run(output_format: str, trace_memory: bool) -> tuple[float, float, int, int]:
+        with (
+            patch(
+                "src.modules.collisions.core_courses_adapter.fetch_xlsx_spreadsheet",
+                AsyncMock(side_effect=lambda **_: build_core_courses_workbook(sheets=args.sheets, seed=args.seed)),
+            ),
+            patch("src.modules.collisions.core_courses_adapter.get_sheet_gids", AsyncMock(return_value=gids)),
+        ):
+            if trace_memory:
+                tracemalloc.start()
+            first_byte, total, size = asyncio.run(respond(output_format))
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+            tracemalloc.stop()
+        return first_byte, total, size, peak
+
+    results = []
+    for output_format in ("json", "ndjson"):
+        timings = [run(output_format, trace_memory=False) for _ in range(args.repeat)]
+        first_byte = min(t[0] for t in timings)
+        total = min(t[1] for t in timings)
+        size = timings[0][2]
+        peak = run(output_format, trace_memory=True)[3]
+        results.append(
+            {
+                "format": output_format,
+                "time_to_first_byte_seconds": round(first_byte, 4),
+                "total_seconds": round(total, 4),
+                "response_bytes": size,
+                "peak_traced_memory_mb": round(peak / 2**20, 2),
+            }
+        )
+    return {"benchmark": "responses", "sheets": args.sheets, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    throughput = subparsers.add_parser("throughput", help=benchmark_throughput.__doc__)
+    throughput.add_argument("--sheets", type=int, default=4)
+    throughput.add_argument("--weeks", type=int, default=16, help="Weeks per electives sheet")
+    throughput.add_argument("--kinds", nargs="+", choices=["core_courses", "electives"])
+    throughput.add_argument("--seed", type=int, default=0)
+    throughput.add_argument("--repeat", type=int, default=1)
+    throughput.add_argument(
+        "--engine", choices=get_args(CoreCoursesEngine), default="pandas", help="Core courses engine"
+    )
+    throughput.add_argument(
+        "--core-courses-reader",
+        choices=get_args(XlsxReaderName),
+        default="openpyxl",
+        help="Xlsx reader of the core courses grid engine",
+    )
+    throughput.add_argument(
+        "--electives-reader", choices=get_args(ElectivesReader), default="pandas", help="Electives reader"
+    )
+    throughput.set_defaults(func=benchmark_throughput)
+
+    parallel = subparsers.add_parser("parallel", help=benchmark_parallel.__doc__)
+    parallel.add_argument("--sheets", type=int, default=12)
+    parallel.add_argument("--seed", type=int, default=0)
+    parallel.add_argument("--repeat", type=int, default=1)
+    parallel.set_defaults(func=benchmark_parallel)
+
+    cells = subparsers.add_parser("cells", help=benchmark_cells.__doc__)
+    cells.add_argument("--sheets", type=int, default=4)
+    cells.add_argument("--seed", type=int, default=0)
+    cells.add_argument("--repeat", type=int, default=3)
+    cells.set_defaults(func=benchmark_cells)
+
+    readers = subparsers.add_parser("readers", help=benchmark_readers.__doc__)
+    readers.add_argument("--sheets", type=int, default=4)
+    readers.add_argument("--weeks", type=int, default=16, help="Weeks per electives sheet")
+    readers.add_argument("--seed", type=int, default=0)
+    readers.add_argument("--repeat", type=int, default=3)
+    readers.set_defaults(func=benchmark_readers)
+
+    responses = subparsers.add_parser("responses", help=benchmark_responses.__doc__)
+    responses.add_argument("--sheets", type=int, default=6)
+    responses.add_argument("--seed", type=int, default=0)
+    responses.add_argument("--repeat", type=int, default=1)
+    responses.set_defaults(func=benchmark_responses)
+
+    args = parser.parse_args()
+    # keep stdout clean for JSON output: logs (also of worker processes) go to stderr
+    logging.getLogger("src").setLevel(logging.WARNING)
+    stdout = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    print(json.dumps(args.func(args), indent=2), file=stdout)
+
+
+if __name__ == "__main__":
+    main()
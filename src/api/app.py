@@ -80,6 +80,8 @@ app.add_middleware(
 
 from src.modules.bookings.routes import router as router_bookings  # noqa: E402
 from src.modules.collisions.routes import router as router_collisions  # noqa: E402
+from src.modules.lessons.routes import router as router_lessons  # noqa: E402
+from src.modules.metrics.routes import router as router_metrics  # noqa: E402
 from src.modules.options.routes import router as router_options  # noqa: E402
 from src.modules.parser.routes import router as router_parser  # noqa: E402
 
@@ -88,4 +90,6 @@ app.include_router(router_collisions)
 app.include_router(router_options)
 app.include_router(router_bookings)
 app.include_router(router_parser)
+app.include_router(router_lessons)
+app.include_router(router_metrics)
 # ^
@@ -1,11 +1,13 @@
-__all__ = ["VerifyTokenDep", "verify_token_dep"]
+__all__ = ["VerifyTokenDep", "verify_token_dep", "ProfilingDep"]
 
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from src.config import settings
 from src.modules.inh_accounts_sdk import UserTokenData, inh_accounts
+from src.profiling import profiling_requested
 
 bearer_scheme = HTTPBearer(
     scheme_name="Bearer",
@@ -41,3 +43,20 @@ VerifyTokenDep = Annotated[tuple[UserTokenData, str], Depends(verify_token_dep)]
 """
 Dependency for verifying the user token.
 """
+
+
+async def profiling_dep(
+    _user_and_token: VerifyTokenDep,
+    x_profile: bool = Header(
+        False, description="Profile this request, see `GET /metrics/profiles`. Ignored unless enabled in settings"
+    ),
+) -> None:
+    # async, so that the context variable is set in the context the endpoint function runs in
+    if x_profile and settings.profiling.enabled:
+        profiling_requested.set(True)
+
+
+ProfilingDep = Depends(profiling_dep)
+"""
+Route dependency that enables profiling of the request sent with `X-Profile: true` header.
+"""
@@ -1,11 +1,22 @@
+import asyncio
+import contextlib
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from src.config import settings
+from src.modules.collisions.parallel import checks_pool
 from src.modules.inh_accounts_sdk import inh_accounts
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await inh_accounts.update_key_set()
+    key_set_refresh = asyncio.create_task(
+        inh_accounts.refresh_key_set_periodically(settings.accounts.jwks_refresh_interval)
+    )
     yield
+    key_set_refresh.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await key_set_refresh
+    checks_pool.shutdown()
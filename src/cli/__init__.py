@@ -0,0 +1,3 @@
+"""
+Command-line tools working with local files instead of Google Sheets and InNoHassle Booking.
+"""
@@ -0,0 +1,12 @@
+import os
+import sys
+
+from src.prepare import BASE_DIR
+
+# only parsing settings are used offline, so the example settings are enough when there is no settings.yaml
+if not os.getenv("SETTINGS_PATH") and not (BASE_DIR / "settings.yaml").exists():
+    os.environ["SETTINGS_PATH"] = str(BASE_DIR / "settings.example.yaml")
+
+from src.cli.check import main  # noqa: E402
+
+sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Check schedule for collisions offline: from local xlsx files, options JSON and optional rooms and bookings JSON.
+
+Usage:
+  uv run -m src.cli --options data/options.json --core-courses core.xlsx --electives electives.xlsx \\
+    --rooms rooms.json --bookings bookings.json --format table
+Core courses sheets are parsed in worker processes. Nothing is requested from Google Sheets or InNoHassle Booking.
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import sys
+from collections import Counter
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TextIO, get_args
+
+from pydantic import TypeAdapter
+
+from src.config import settings
+from src.core_courses.config import CoreCoursesEngine
+from src.electives.config import ElectivesReader
+from src.modules.bookings.client import BookingDTO, RoomDTO
+from src.modules.collisions.check import run_check
+from src.modules.collisions.schemas import (
+    CapacityIssue,
+    CheckParameters,
+    CheckResults,
+    CollisionTypeEnum,
+    Issue,
+    Lesson,
+    NormalizedCheckResults,
+    TeacherIssue,
+)
+from src.modules.options.repository import OptionsData
+from src.utils import XlsxReaderName
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Check schedule for collisions using local files, without network",
+    )
+    parser.add_argument("--options", type=Path, default=Path("data/options.json"), help="options JSON with semester")
+    parser.add_argument("--core-courses", type=Path, help="xlsx export of the core courses spreadsheet")
+    parser.add_argument("--electives", type=Path, help="xlsx export of the electives spreadsheet")
+    parser.add_argument(
+        "--rooms", type=Path, help="JSON list of rooms as returned by InNoHassle Booking, needed for capacity check"
+    )
+    parser.add_argument(
+        "--bookings",
+        type=Path,
+        help="JSON list of bookings as returned by InNoHassle Booking, Outlook check finds nothing without them",
+    )
+    parser.add_argument(
+        "--checks",
+        nargs="+",
+        choices=[t.value for t in CollisionTypeEnum],
+        default=[t.value for t in CollisionTypeEnum],
+        help="kinds of collisions to check",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes for parsing core courses sheets",
+    )
+    parser.add_argument(
+        "--check-workers",
+        type=int,
+        default=1,
+        help="number of room, teacher and capacity checks running at the same time in worker processes",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=get_args(CoreCoursesEngine),
+        default="pandas",
+        help="how core courses sheets are read, lessons are the same",
+    )
+    parser.add_argument(
+        "--core-courses-reader",
+        choices=get_args(XlsxReaderName),
+        default="openpyxl",
+        help="reader of xlsx files for the grid engine of core courses, lessons are the same",
+    )
+    parser.add_argument(
+        "--electives-reader",
+        choices=get_args(ElectivesReader),
+        default="pandas",
+        help="how electives sheets are read, lessons are the same",
+    )
+    parser.add_argument("--format", choices=["json", "normalized-json", "table"], default="json")
+    parser.add_argument("--output", type=Path, help="write results to the file instead of stdout")
+    parser.add_argument("--fail-on-issues", action="store_true", help="exit with code 1 if any issue is found")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log parsing and checking progress")
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.core_courses and not args.electives:
+        parser.error("at least one of --core-courses and --electives is required")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.check_workers < 1:
+        parser.error("--check-workers must be at least 1")
+
+    logging.getLogger("src").setLevel(logging.INFO if args.verbose else logging.WARNING)
+    settings.parsing.core_courses_workers = args.workers
+    settings.collisions.checks_workers = args.check_workers
+    # keep stdout clean for results: logs of this process and of parsing workers go to stderr
+    stdout = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return check(args, stdout)
+
+
+def check(args: argparse.Namespace, stdout: TextIO | None = None) -> int:
+    """
+    Run the check with parsed arguments and write results.
+
+    :return: exit code
+    """
+    options = OptionsData.model_validate_json(args.options.read_bytes())
+    if options.semester is None:
+        raise SystemExit(f"No semester in {args.options}")
+    semester = options.semester
+    # spreadsheet ids are only used in results when spreadsheets are local, file names will do if they are not set
+    semester = semester.model_copy(
+        update={
+            "core_courses_spreadsheet_id": semester.core_courses_spreadsheet_id
+            or (args.core_courses.stem if args.core_courses else "core_courses"),
+            "electives_spreadsheet_id": semester.electives_spreadsheet_id
+            or (args.electives.stem if args.electives else None),
+        }
+    )
+    options = options.model_copy(update={"semester": semester})
+
+    xlsx_files: dict[str, io.BytesIO] = {}
+    if args.core_courses:
+        xlsx_files[semester.core_courses_spreadsheet_id] = io.BytesIO(args.core_courses.read_bytes())
+    if args.electives:
+        xlsx_files[semester.electives_spreadsheet_id] = io.BytesIO(args.electives.read_bytes())
+    rooms = TypeAdapter(list[RoomDTO]).validate_json(args.rooms.read_bytes()) if args.rooms else []
+    bookings = TypeAdapter(list[BookingDTO]).validate_json(args.bookings.read_bytes()) if args.bookings else []
+
+    params = CheckParameters(
+        care_about_core_courses=bool(args.core_courses),
+        care_about_electives=bool(args.electives),
+        check_room_collisions=CollisionTypeEnum.ROOM in args.checks,
+        check_teacher_collisions=CollisionTypeEnum.TEACHER in args.checks,
+        check_space_collisions=CollisionTypeEnum.CAPACITY in args.checks and bool(rooms),
+        check_outlook_collisions=CollisionTypeEnum.OUTLOOK in args.checks and bool(rooms) and bool(bookings),
+        core_courses_engine=args.engine,
+        core_courses_reader=args.core_courses_reader,
+        electives_reader=args.electives_reader,
+    )
+    results = asyncio.run(run_check(options, params, token="", xlsx_files=xlsx_files, rooms=rooms, bookings=bookings))
+
+    if args.format == "json":
+        output = results.model_dump_json(indent=2)
+    elif args.format == "normalized-json":
+        output = NormalizedCheckResults.from_check_results(results).model_dump_json(indent=2)
+    else:
+        output = format_table(results)
+    if args.output:
+        args.output.write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output, file=stdout or sys.stdout, flush=True)
+
+    return 1 if args.fail_on_issues and results.issues else 0
+
+
+def format_table(results: CheckResults) -> str:
+    """
+    Number of issues of every kind by sheet. An issue with lessons from several sheets is counted in each of them.
+    """
+    types = list(CollisionTypeEnum)
+    by_sheet: dict[str, Counter[CollisionTypeEnum]] = {}
+    for issue in results.issues:
+        for sheet in sorted({lesson.google_sheet_name for lesson in _issue_lessons(issue)}):
+            by_sheet.setdefault(sheet, Counter())[issue.collision_type] += 1
+    total = Counter(issue.collision_type for issue in results.issues)
+
+    rows = [["sheet", *types, "total"]]
+    for sheet, counts in sorted(by_sheet.items()):
+        rows.append([sheet, *(str(counts[t]) for t in types), str(counts.total())])
+    rows.append(["total", *(str(total[t]) for t in types), str(total.total())])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    )
+
+
+def _issue_lessons(issue: Issue) -> list[Lesson]:
+    if isinstance(issue, CapacityIssue):
+        return [issue.lesson]
+    if isinstance(issue, TeacherIssue):
+        return [*issue.teaching_lessons, *issue.studying_lessons]
+    return issue.lessons
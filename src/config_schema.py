@@ -15,6 +15,8 @@ class Accounts(SettingBaseModel):
     "URL of the Accounts API"
     api_jwt_token: SecretStr
     "JWT token for accessing the Accounts API as a service"
+    jwks_refresh_interval: float = Field(3600, gt=0)
+    "Seconds between background refreshes of the Accounts public keys (JWKS)"
 
 
 class Booking(SettingBaseModel):
@@ -24,6 +26,47 @@ class Booking(SettingBaseModel):
     "URL of the Booking API"
 
 
+class Parsing(SettingBaseModel):
+    """Spreadsheet parsing settings"""
+
+    core_courses_workers: int = Field(1, ge=1)
+    "Number of worker processes for parsing core courses sheets in parallel. 1 = parse sheets one by one in the API process"
+
+
+class Collisions(SettingBaseModel):
+    """Collisions check settings"""
+
+    check_result_ttl: float = Field(0.0, ge=0)
+    "Seconds to reuse result of a collisions check for identical requests. 0 = only share checks that are in flight"
+    lessons_ttl: float = Field(300.0, ge=0)
+    "Seconds to reuse lessons parsed from the semester spreadsheets for lessons queries and free rooms search"
+    occupancy_index_ttl: float = Field(300.0, ge=0)
+    "Seconds to reuse occupancy of rooms (parsed spreadsheets and bookings) for free rooms search"
+    checks_workers: int = Field(1, ge=1)
+    "Number of room, teacher and capacity checks running at the same time in worker processes (threads on free-threaded Python builds). 1 = one after another in a thread of the API process"
+    jobs_workers: int = Field(1, ge=1)
+    "Number of background collisions check jobs running at the same time"
+    jobs_max_queued: int = Field(8, ge=1)
+    "Number of background collisions check jobs that may wait in queue, new jobs are rejected when it is full"
+    jobs_keep_finished: int = Field(50, ge=0)
+    "Number of finished background collisions check jobs to keep results of"
+
+
+class Profiling(SettingBaseModel):
+    """On-demand profiling of requests sent with `X-Profile: true` header"""
+
+    enabled: bool = False
+    "Allow profiling of requests. When disabled, the header is ignored"
+    directory: Path = Path("data/profiles")
+    "Directory to store profiles in"
+    sampling_interval: float = Field(0.005, gt=0)
+    "Seconds between samples of the endpoint stack"
+    top_allocations: int = Field(30, ge=1)
+    "Number of source lines with the largest allocations to report"
+    keep: int = Field(50, ge=1)
+    "Number of latest profiles to keep, older ones are deleted"
+
+
 class Settings(SettingBaseModel):
     """Settings for the application."""
 
@@ -36,6 +79,12 @@ class Settings(SettingBaseModel):
     "InNoHassle Accounts integration settings"
     booking: Booking = Booking()
     "Booking API integration settings"
+    parsing: Parsing = Parsing()
+    "Spreadsheet parsing settings"
+    collisions: Collisions = Collisions()
+    "Collisions check settings"
+    profiling: Profiling = Profiling()
+    "On-demand profiling settings"
 
     @classmethod
     def from_yaml(cls, path: Path) -> "Settings":
@@ -5,16 +5,17 @@ https://github.com/one-zero-eight/schedule-builder-backend/blob/main/src/core_co
 """
 
 import datetime
+import functools
 import re
 import warnings
-from typing import Literal
+from typing import Literal, NamedTuple
 
 from pydantic import BaseModel, ConfigDict, Field
 
 from src.logging_ import logger
 
 from ..utils import MOSCOW_TZ, WEEKDAYS, remove_repeating_spaces_and_trailing_spaces
-from .config import Target
+from .config import DateRangeResolver, Target
 from .location_parser import Item, parse_location_string
 from .parser import CoreCourseCell
 
@@ -65,7 +66,13 @@ class CoreCourseEvent(BaseModel):
     class_type: Literal["lec", "tut", "lab", "лек", "тут", "лаб"] | None = None
     "Event class type"
 
-    def __init__(self, **data):
+    def __init__(self, derived: "DerivedFields | None" = None, **data):
+        """
+        :param derived: subject, teacher and location processed already for the same cell value, see `EventFieldsMemo`
+        """
+        if derived is not None:
+            super().__init__(**(data | derived._asdict()))
+            return
         super().__init__(**data)
         self.process_subject()
         self.process_teacher()
@@ -144,6 +151,95 @@ class CoreCourseEvent(BaseModel):
         return f"{self.course} / {self.group} | {self.subject} {timeslot}"
 
 
+class DerivedFields(NamedTuple):
+    """
+    Fields of `CoreCourseEvent` which depend only on the original cell value
+    """
+
+    subject: str
+    class_type: str | None
+    teacher: str | None
+    location: str | None
+    location_item: Item | None
+
+
+class EventFieldsMemo:
+    """
+    Processed subject, teacher and location by original cell value, the same lesson usually takes cells of many groups.
+    One memo is used for all sheets of a pipeline. Location items are shared by events of the same cell value, so they
+    must not be modified.
+    """
+
+    def __init__(self):
+        self._derived: dict[tuple, DerivedFields] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, value: tuple) -> DerivedFields | None:
+        derived = self._derived.get(value)
+        if derived is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return derived
+
+    def put(self, value: tuple, event: CoreCourseEvent) -> None:
+        self._derived[value] = DerivedFields(
+            subject=event.subject,
+            class_type=event.class_type,
+            teacher=event.teacher,
+            location=event.location,
+            location_item=event.location_item,
+        )
+
+
+GROUP_STUDENT_NUMBER_PATTERN = re.compile(r"\(?(G\d+|\d+)\)?\s*$")
+
+
+@functools.lru_cache(maxsize=4096)
+def preprocess_group(value: str) -> tuple[str, int | None]:
+    """
+    Process group name
+
+    - "M21-DS(16)" -> "M21-DS"
+    - "M22-TE-01 (10)" -> "M22-TE-01"
+    - "B20-SD-02 (29)" -> "B20-SD-02"
+
+    :return: group name and student number
+    """
+    student_number = None
+    # Match (G\d+) or (\d+) at the end
+    if student_number_m := GROUP_STUDENT_NUMBER_PATTERN.search(value):
+        match_text = student_number_m.group(1)
+        if match_text.startswith("G"):
+            student_number = int(match_text[1:])
+        else:
+            student_number = int(match_text)
+        value = value.replace(student_number_m.group(0), "").strip()
+    return value, student_number
+
+
+class ColumnHeader(NamedTuple):
+    """
+    What events of a (course, group) column of a target share
+    """
+
+    group: str
+    "Normalized group name"
+    group_student_number: int | None
+    starts: datetime.date
+    ends: datetime.date
+
+
+def get_column_header(course: str, group: str, dates: DateRangeResolver) -> ColumnHeader:
+    """
+    Normalize group of the column and resolve dates of its events
+    """
+    group, group_student_number = preprocess_group(group)
+    starts, ends = dates.resolve(group, course)
+    return ColumnHeader(group, group_student_number, starts, ends)
+
+
 def convert_cell_to_event(
     cell: CoreCourseCell,
     weekday: str,
@@ -151,9 +247,14 @@ def convert_cell_to_event(
     course: str,
     group: str,
     target: Target,
+    header: ColumnHeader | None = None,
+    memo: EventFieldsMemo | None = None,
 ) -> CoreCourseEvent | None:
     """
     Convert cell to event
+
+    :param header: header of the column computed once for all cells of the column, see `get_column_header`
+    :param memo: processed fields of cell values seen before
     """
     weekday_int = WEEKDAYS.index(weekday)
     start_time, end_time = timeslot
@@ -169,37 +270,13 @@ def convert_cell_to_event(
             case _:
                 raise ValueError(f"Unknown value: {cell.value}")
 
-        starts = target.start_date
-        ends = target.end_date
-
-        def preprocess_group(value: str) -> tuple[str, int | None]:
-            """
-            Process group name
-
-            - "M21-DS(16)" -> "M21-DS"
-            - "M22-TE-01 (10)" -> "M22-TE-01"
-            - "B20-SD-02 (29)" -> "B20-SD-02"
-            """
-            student_number = None
-            # Match (G\d+) or (\d+) at the end
-            if student_number_m := re.search(r"\(?(G\d+|\d+)\)?\s*$", value):
-                match_text = student_number_m.group(1)
-                if match_text.startswith("G"):
-                    student_number = int(match_text[1:])
-                else:
-                    student_number = int(match_text)
-                value = value.replace(student_number_m.group(0), "").strip()
-            return value, student_number
-
-        group, group_student_number = preprocess_group(group)
-
-        for override in target.override:
-            if group in override.groups or course in override.courses:
-                starts = override.start_date
-                ends = override.end_date
-                break
+        if header is None:
+            header = get_column_header(course, group, DateRangeResolver(target))
+        group, group_student_number, starts, ends = header
+        derived = memo.get(cell.value) if memo is not None else None
 
         event = CoreCourseEvent(
+            derived,
             start_time=start_time,
             end_time=end_time,
             dtstamp=datetime.datetime.combine(target.start_date, datetime.time.min, tzinfo=MOSCOW_TZ),
@@ -218,6 +295,8 @@ def convert_cell_to_event(
             teacher=teacher,
             location=location,
         )
+        if memo is not None and derived is None:
+            memo.put(cell.value, event)
         return event
     except ValueError:
         logger.error(f"Error parsing cell {cell.value} for {course} {group} {weekday} {timeslot}", exc_info=True)
@@ -5,6 +5,8 @@ https://github.com/one-zero-eight/schedule-builder-backend/blob/main/src/core_co
 """
 
 import datetime
+from collections.abc import Hashable
+from typing import Literal
 
 from pydantic import BaseModel
 
@@ -31,6 +33,34 @@ class Target(BaseModel):
     "Override"
 
 
+class DateRangeResolver:
+    """
+    Effective dates of lessons of a target: the first override matching the group or the course, otherwise dates of
+    the target. Resolved ranges are cached, so overrides are scanned once per (group, course) of the target.
+    """
+
+    def __init__(self, target: Target):
+        self.target = target
+        self._resolved: dict[tuple[Hashable, Hashable], tuple[datetime.date, datetime.date]] = {}
+
+    def resolve(self, group: Hashable, course: Hashable) -> tuple[datetime.date, datetime.date]:
+        """
+        :param group: normalized group name, e.g. "B20-SD-02"
+        :param course: course name
+        :return: (start date, end date)
+        """
+        key = (group, course)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = (self.target.start_date, self.target.end_date)
+            for override in self.target.override:
+                if group in override.groups or course in override.courses:
+                    resolved = (override.start_date.date(), override.end_date)
+                    break
+            self._resolved[key] = resolved
+        return resolved
+
+
 class Tag(BaseModel):
     alias: str
     "Slugged alias of tag"
@@ -51,3 +81,7 @@ class CoreCoursesConfig(BaseModel):
         "Elective courses on Physical Education",
         "Elective course on Physical Education",
     ]
+
+
+CoreCoursesEngine = Literal["pandas", "grid"]
+"How clear sheets are read: pandas dataframes or arrays of the grid engine (see `grid.py`), the same cells either way"
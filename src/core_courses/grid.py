@@ -0,0 +1,95 @@
+"""
+Grid engine of the core courses parser: clear sheets as 2-D object arrays of sheets read by an xlsx reader.
+
+Gives the same clear sheets as `CoreCoursesParser.get_clear_dataframes_from_xlsx`, but every sheet is read once by a
+reader from `src.xlsx`, while the pandas path reads it with pandas and then loads the whole workbook three more times to
+find the rightmost column, the last row and merged cells. Values are the same as pandas reads them, except that columns
+holding only numbers are not converted to floats.
+"""
+
+import numpy as np
+from openpyxl.worksheet.cell_range import MultiCellRange
+
+from src.utils import WEEKDAYS, prettify_string
+from src.xlsx import SheetGrid
+
+
+def get_time_columns(values: np.ndarray) -> list[int]:
+    """
+    Columns where all weekdays from Monday to Saturday are present.
+    """
+    return [j for j in range(values.shape[1]) if all(weekday in values[:, j] for weekday in WEEKDAYS[:-1])]
+
+
+def get_rightmost_column_index(grid: SheetGrid, time_columns: list[int]) -> int:
+    """
+    Same as `CoreCoursesParser.get_rightmost_column_index`: the column before the first column after the last time
+    column without borders in the first row.
+    """
+    bordered = _header_cells_with_border(grid)
+
+    def has_border(column: int) -> bool:
+        return column < len(bordered) and bordered[column]
+
+    next_column = time_columns[-1] + 1
+    if not has_border(next_column):
+        return next_column - 1
+    for column in range(next_column + 1, len(bordered) + 1):
+        if not has_border(column):
+            return column - 1
+    return next_column  # fallback
+
+
+def _header_cells_with_border(grid: SheetGrid) -> list[bool]:
+    """
+    Whether cells of the first row have right, top or bottom border, as if the whole workbook was loaded: then merged
+    cells other than the top-left one lose their own borders and get borders of the top-left cell on edges of the range.
+    """
+
+    def styled(border: frozenset[str], *sides: str) -> bool:
+        return not border.isdisjoint(sides)
+
+    bordered = [styled(border, "right", "top", "bottom") for border in grid.header_borders]
+    for merged_range in grid.merged_ranges:
+        min_col, min_row, max_col, max_row = merged_range.bounds
+        if min_row != 1:
+            continue
+        start = grid.header_borders[min_col - 1] if min_col - 1 < len(grid.header_borders) else frozenset()
+        bordered.extend([False] * (max_col - len(bordered)))
+        for column in range(min_col, max_col):  # 0-based columns after the top-left one
+            bordered[column] = (
+                styled(start, "top")
+                or (max_row == 1 and styled(start, "bottom"))
+                or (column == max_col - 1 and styled(start, "right"))
+            )
+    return bordered
+
+
+def fill_merged_ranges(values: np.ndarray, merged_ranges: MultiCellRange) -> list[tuple[int, int, int, int]]:
+    """
+    Fill merged ranges with values of their top-left cells, the same way as `CoreCoursesParser.merge_cells` does.
+
+    :return: list of merged ranges: (min_row, min_col, max_row, max_col)
+    """
+    nrows, ncols = values.shape
+    result = []
+    for merged_range in merged_ranges:
+        min_col, min_row, max_col, max_row = merged_range.bounds
+        min_col = max(min(min_col - 1, ncols - 1), 0)
+        min_row = max(min(min_row - 1, nrows - 1), 0)
+        max_col = max(min(max_col - 1, ncols - 1), 0)
+        max_row = max(min(max_row - 1, nrows - 1), 0)
+        values[min_row : max_row + 1, min_col : max_col + 1] = values[min_row, min_col]
+        result.append((min_row, min_col, max_row, max_col))
+    return result
+
+
+def clear_values(values: np.ndarray) -> np.ndarray:
+    """
+    Empty strings of spaces are NaN, other strings are prettified.
+    """
+    cleared = values.copy()
+    for index, value in np.ndenumerate(values):
+        if isinstance(value, str):
+            cleared[index] = prettify_string(value) if value.strip() else np.nan
+    return cleared
@@ -6,10 +6,15 @@ https://github.com/one-zero-eight/schedule-builder-backend/blob/main/src/core_co
 
 import datetime
 import io
+import mmap
+import multiprocessing
 import re
+import tempfile
 from collections import defaultdict
-from collections.abc import Generator
+from collections.abc import Generator, Iterable
+from concurrent.futures import ProcessPoolExecutor
 from itertools import pairwise
+from typing import NamedTuple
 
 import numpy as np
 import openpyxl
@@ -18,9 +23,13 @@ from openpyxl.utils import get_column_letter
 from pandas.core.frame import DataFrame
 from pydantic import BaseModel, ConfigDict, Field
 
+from src.core_courses.config import CoreCoursesEngine
 from src.logging_ import logger
+from src.utils import XlsxReaderName
+from src.xlsx import XLSX_READERS
 
-from ..utils import WEEKDAYS, prettify_string, sanitize_sheet_name
+from ..utils import WEEKDAYS, parse_time_range, prettify_string, sanitize_sheet_name
+from . import grid
 
 
 class CoreCourseCell(BaseModel):
@@ -41,6 +50,18 @@ class CoreCourseCell(BaseModel):
         return "\n".join(map(str, self.value))
 
 
+class CourseBlockCell(NamedTuple):
+    """
+    Non-empty cell of a course block with its header and index, see `CoreCoursesParser.iter_sheet_cells`.
+    """
+
+    course: str
+    group: str
+    weekday: str
+    timeslot: tuple[datetime.time, datetime.time]
+    cell: CoreCourseCell
+
+
 class CoreCoursesParser:
     def __init__(self):
         self.last_dfs_merged_ranges: dict[str, list[tuple[int, int, int, int]]] | None = None
@@ -51,9 +72,14 @@ class CoreCoursesParser:
         original_target_sheet_names: list[str],
         sheet_gids: dict[str, str],
         spreadsheet_id: str,
-    ) -> Generator[list[DataFrame]]:
+        as_cells: bool = False,
+        engine: CoreCoursesEngine = "pandas",
+        reader: XlsxReaderName = "openpyxl",
+    ) -> Generator[list[DataFrame] | Iterable[CourseBlockCell]]:
         """
         Run pipeline and generate lists of GroupBy with CoreCourseCell(value=[subject, teacher, location], a1=excel_range) by sheet.
+        With `as_cells` generate iterators of `CourseBlockCell` (see `iter_sheet_cells`) instead, a sheet is processed
+        while its cells are consumed. The grid engine only generates cells, its sheets are read by `reader`.
 
         ### Usage:
 
@@ -98,47 +124,215 @@ class CoreCoursesParser:
             sanitize_sheet_name(sheet_name): sheet_name for sheet_name in sheet_gids.keys()
         }
 
-        dfs, self.last_dfs_merged_ranges = self.get_clear_dataframes_from_xlsx(
-            xlsx_file=xlsx_file, target_sheet_names=sanitized_sheet_names
-        )
+        if engine == "grid" and not as_cells:
+            raise ValueError("Grid engine only generates cells, use as_cells=True")
+        if engine == "grid":
+            dfs, self.last_dfs_merged_ranges = self.get_clear_grids_from_xlsx(xlsx_file, sanitized_sheet_names, reader)
+        else:
+            dfs, self.last_dfs_merged_ranges = self.get_clear_dataframes_from_xlsx(xlsx_file, sanitized_sheet_names)
 
         for target_sheet_name in sanitized_sheet_names:
             # find dataframe from dfs
             if target_sheet_name not in dfs:
                 logger.warning(f"Sheet {target_sheet_name} not found in xlsx file")
                 continue
-            sheet_df = dfs[target_sheet_name]
             google_sheet_name = sanitized_sheet_name_x_google_sheet_name.get(target_sheet_name)
             google_sheet_gid = sheet_gids.get(google_sheet_name) if google_sheet_name else None
 
-            time_columns_index = self.get_time_columns(sheet_df)
-            logger.info(f"Sheet Time columns: {[get_column_letter(col + 1) for col in time_columns_index]}")
-            rightmost_column_index = self.get_rightmost_column_index(xlsx_file, target_sheet_name, time_columns_index)
-            logger.info(f"Rightmost column index: {get_column_letter(rightmost_column_index + 1)}")
+            if as_cells:
+                yield self.iter_sheet_cells(
+                    dfs[target_sheet_name],
+                    spreadsheet_id=spreadsheet_id,
+                    google_sheet_name=google_sheet_name,
+                    google_sheet_gid=google_sheet_gid,
+                )
+                continue
+            yield self.process_sheet_df(
+                dfs[target_sheet_name],
+                xlsx_file,
+                target_sheet_name,
+                spreadsheet_id=spreadsheet_id,
+                google_sheet_name=google_sheet_name,
+                google_sheet_gid=google_sheet_gid,
+            )
 
-            by_courses = self.split_df_by_courses(sheet_df, time_columns_index)
-            grouped_dfs_with_cells_lst = []
-            for course_df in by_courses:
-                # ---- Set course and group as header; weekday and timeslot as index ----
-                self.set_course_and_group_as_header(course_df)
-                self.set_weekday_and_time_as_index(course_df)
-                # ---- Convert it to GroupBy with CoreCourseCell(value=[subject, teacher, location], a1=excel_range) ----
-                grouped_dfs_with_cells = (
-                    course_df
-                    # ---- Group by weekday and time ----
-                    .groupby(level=[0, 1], sort=False)
-                    .agg(list)
-                    # ---- Convert each cell to CoreCourseCell ----
-                    .map(
-                        self.factory_core_course_cell,
+    def pipeline_parallel(
+        self,
+        xlsx_file: io.BytesIO,
+        original_target_sheet_names: list[str],
+        sheet_gids: dict[str, str],
+        spreadsheet_id: str,
+        max_workers: int | None = None,
+        as_cells: bool = False,
+        engine: CoreCoursesEngine = "pandas",
+        reader: XlsxReaderName = "openpyxl",
+    ) -> Generator[list[DataFrame] | Iterable[CourseBlockCell]]:
+        """
+        Same as `pipeline`, but every target sheet is processed in a separate worker process.
+
+        The workbook is written once to a temporary file which workers memory-map, so the xlsx bytes are not pickled
+        for every sheet. Results are yielded in the order of target sheets.
+
+        :param max_workers: number of worker processes, defaults to the number of target sheets
+        """
+        sanitized_sheet_names = [
+            sanitize_sheet_name(target_sheet_name) for target_sheet_name in original_target_sheet_names
+        ]
+
+        sanitized_sheet_name_x_google_sheet_name = {
+            sanitize_sheet_name(sheet_name): sheet_name for sheet_name in sheet_gids.keys()
+        }
+
+        if engine == "grid" and not as_cells:
+            raise ValueError("Grid engine only generates cells, use as_cells=True")
+        self.last_dfs_merged_ranges = defaultdict(list)
+        max_workers = min(max_workers or len(sanitized_sheet_names), len(sanitized_sheet_names)) or 1
+
+        with tempfile.NamedTemporaryFile(suffix=".xlsx") as tmp:
+            tmp.write(xlsx_file.getbuffer())
+            tmp.flush()
+            # forkserver: do not fork the API process with its event loop and threads
+            mp_context = multiprocessing.get_context("forkserver")
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+                futures = []
+                for target_sheet_name in sanitized_sheet_names:
+                    google_sheet_name = sanitized_sheet_name_x_google_sheet_name.get(target_sheet_name)
+                    google_sheet_gid = sheet_gids.get(google_sheet_name) if google_sheet_name else None
+                    futures.append(
+                        executor.submit(
+                            _process_sheet_in_worker,
+                            tmp.name,
+                            target_sheet_name,
+                            spreadsheet_id=spreadsheet_id,
+                            google_sheet_name=google_sheet_name,
+                            google_sheet_gid=google_sheet_gid,
+                            as_cells=as_cells,
+                            engine=engine,
+                            reader=reader,
+                        )
+                    )
+
+                for target_sheet_name, future in zip(sanitized_sheet_names, futures):
+                    grouped_dfs_with_cells_lst, merged_ranges = future.result()
+                    self.last_dfs_merged_ranges[target_sheet_name] = merged_ranges
+                    yield grouped_dfs_with_cells_lst
+
+    def process_sheet_df(
+        self,
+        sheet_df: pd.DataFrame,
+        xlsx_file: io.BytesIO,
+        target_sheet_name: str,
+        *,
+        spreadsheet_id: str,
+        google_sheet_name: str | None,
+        google_sheet_gid: str | None,
+    ) -> list[DataFrame]:
+        """
+        Split clear sheet dataframe by courses and convert each of them to GroupBy with
+        CoreCourseCell(value=[subject, teacher, location], a1=excel_range).
+
+        :return: list of dataframes, one per course
+        """
+        time_columns_index = self.get_time_columns(sheet_df)
+        logger.info(f"Sheet Time columns: {[get_column_letter(col + 1) for col in time_columns_index]}")
+        rightmost_column_index = self.get_rightmost_column_index(xlsx_file, target_sheet_name, time_columns_index)
+        logger.info(f"Rightmost column index: {get_column_letter(rightmost_column_index + 1)}")
+
+        subject_cells_a1 = self.get_subject_cells_a1(sheet_df)
+        by_courses = self.split_df_by_courses(sheet_df, time_columns_index)
+        grouped_dfs_with_cells_lst = []
+        for course_df in by_courses:
+            # ---- Sheet columns of the course cells (the first column is weekday and time) ----
+            columns_positions = sheet_df.columns.get_indexer(course_df.columns[1:])
+            # ---- Set course and group as header; weekday and timeslot as index ----
+            self.set_course_and_group_as_header(course_df)
+            self.set_weekday_and_time_as_index(course_df)
+            # ---- A1 coordinates of subject cells, aligned with course cells ----
+            rows_positions = sheet_df.index.get_indexer(course_df.index.get_level_values("row"))
+            course_a1 = pd.DataFrame(
+                subject_cells_a1[np.ix_(rows_positions, columns_positions)],
+                index=course_df.index,
+                columns=course_df.columns,
+            )
+            # ---- Group by weekday and time ----
+            grouped_values = course_df.groupby(level=[0, 1], sort=False).agg(list)
+            grouped_a1 = course_a1.groupby(level=[0, 1], sort=False).last()
+            # ---- Convert each cell to CoreCourseCell(value=[subject, teacher, location], a1=excel_range) ----
+            grouped_dfs_with_cells = pd.DataFrame(
+                [
+                    [
+                        self.factory_core_course_cell(
+                            values,
+                            a1=a1 if isinstance(a1, str) else None,
+                            spreadsheet_id=spreadsheet_id,
+                            google_sheet_name=google_sheet_name,
+                            google_sheet_gid=google_sheet_gid,
+                        )
+                        for values, a1 in zip(values_row, a1_row)
+                    ]
+                    for values_row, a1_row in zip(grouped_values.to_numpy(), grouped_a1.to_numpy())
+                ],
+                index=grouped_values.index,
+                columns=grouped_values.columns,
+            )
+            grouped_dfs_with_cells_lst.append(grouped_dfs_with_cells)
+        return grouped_dfs_with_cells_lst
+
+    def iter_sheet_cells(
+        self,
+        sheet_df: pd.DataFrame | np.ndarray,
+        *,
+        spreadsheet_id: str,
+        google_sheet_name: str | None,
+        google_sheet_gid: str | None,
+    ) -> Generator[CourseBlockCell]:
+        """
+        Same non-empty cells as in dataframes of `process_sheet_df` and in the same order (course by course, column by
+        column, timeslot by timeslot), but read straight from the array of the clear sheet dataframe: rows of every
+        course block are grouped by (weekday, timeslot) once and then the same rows are taken from every column.
+
+        :param sheet_df: clear sheet dataframe or clear sheet array of the grid engine
+        """
+        values = sheet_df.to_numpy(dtype=object) if isinstance(sheet_df, pd.DataFrame) else sheet_df
+        time_columns_index = grid.get_time_columns(values)
+        logger.info(f"Sheet Time columns: {[get_column_letter(col + 1) for col in time_columns_index]}")
+        subject_cells_a1 = self.get_subject_cells_a1(values)
+        n_rows, n_columns = values.shape
+
+        for start, end in pairwise(time_columns_index + [n_columns]):
+            # ---- Course and group of every column, empty ones are filled from the left ----
+            header = [_fill_forward(values[0, start:end]), _fill_forward(values[1, start:end])]
+            # ---- Rows by weekday and timeslot, the time column is filled from above ----
+            rows_by_slot: dict[tuple, list[int]] = {}
+            weekday = time = None
+            for row in range(2, n_rows):
+                if not pd.isna(values[row, start]):
+                    time = values[row, start]
+                if time in WEEKDAYS:
+                    weekday = time
+                    continue
+                if weekday is None or time is None:
+                    continue
+                timeslot = (isinstance(time, str) and parse_time_range(time)) or time
+                rows_by_slot.setdefault((weekday, timeslot), []).append(row)
+
+            for column in range(start + 1, end):
+                course, group = header[0][column - start], header[1][column - start]
+                for (weekday, timeslot), rows in rows_by_slot.items():
+                    cell_values = [values[row, column] for row in rows]
+                    if all(pd.isna(v) for v in cell_values):
+                        continue
+                    a1 = None
+                    for row in rows:
+                        a1 = subject_cells_a1[row, column] or a1
+                    cell = self.factory_core_course_cell(
+                        cell_values,
+                        a1=a1,
                         spreadsheet_id=spreadsheet_id,
                         google_sheet_name=google_sheet_name,
                         google_sheet_gid=google_sheet_gid,
                     )
-                )
-                assert isinstance(grouped_dfs_with_cells, DataFrame)
-                grouped_dfs_with_cells_lst.append(grouped_dfs_with_cells)
-            yield grouped_dfs_with_cells_lst
+                    yield CourseBlockCell(course, group, weekday, timeslot, cell)
 
     def get_clear_dataframes_from_xlsx(
         self, xlsx_file: io.BytesIO, target_sheet_names: list[str]
@@ -146,14 +340,12 @@ class CoreCoursesParser:
         """
         Get data from xlsx file and return it as a DataFrame with merged
         cells and empty cells in the course row filled by left value.
-        Also adds excel range to each 'subject' cell (first of three cells),
-        so will be `Analytical Geometry and Linear Algebra I (lab)$D10`
 
         :return: mapping of sheet name to clear dataframe
         :rtype: dict[str, pd.DataFrame]
         """
-        # ---- Read xlsx file into dataframes ----
-        dfs = pd.read_excel(xlsx_file, engine="openpyxl", sheet_name=None, header=None)
+        # ---- Read target sheets of xlsx file into dataframes ----
+        dfs = pd.read_excel(xlsx_file, engine="openpyxl", sheet_name=target_sheet_names, header=None)
         # ---- Clean up dataframes ----
         merged_ranges: dict[str, list[tuple[int, int, int, int]]] = defaultdict(list)
         for target_sheet_name in target_sheet_names:
@@ -163,8 +355,6 @@ class CoreCoursesParser:
             df = df.iloc[min_row : max_row + 1, min_col : max_col + 1]
             # ---- Fill merged cells with values ----
             merged_ranges[target_sheet_name] = self.merge_cells(df, xlsx_file, target_sheet_name)
-            # ---- Add excel range to each 'subject' cell (first of three cells) ----
-            self.assign_excel_row_and_column_to_subject(df)
             # ---- Fill empty cells ----
             df = df.replace(r"^\s*$", np.nan, regex=True)
             # ---- Strip, translate and remove trailing spaces ----
@@ -174,6 +364,31 @@ class CoreCoursesParser:
 
         return dfs, merged_ranges
 
+    def get_clear_grids_from_xlsx(
+        self, xlsx_file: io.BytesIO, target_sheet_names: list[str], reader: XlsxReaderName = "openpyxl"
+    ) -> tuple[dict[str, np.ndarray], dict]:
+        """
+        Same as `get_clear_dataframes_from_xlsx`, but sheets are read by the grid engine as arrays.
+
+        :param reader: reader of the xlsx file, see `src.xlsx`
+        :return: mapping of sheet name to clear array and mapping of sheet name to merged ranges
+        """
+        grids = XLSX_READERS[reader].read_sheets(xlsx_file, target_sheet_names)
+        clear_grids: dict[str, np.ndarray] = {}
+        merged_ranges: dict[str, list[tuple[int, int, int, int]]] = defaultdict(list)
+        for target_sheet_name, sheet_grid in grids.items():
+            # ---- Select range ----
+            time_columns_index = grid.get_time_columns(sheet_grid.values)
+            logger.info(f"Time columns: {[get_column_letter(col + 1) for col in time_columns_index]}")
+            rightmost_column_index = grid.get_rightmost_column_index(sheet_grid, time_columns_index)
+            logger.info(f"Rightmost column index: {get_column_letter(rightmost_column_index + 1)}")
+            values = sheet_grid.values[:, : rightmost_column_index + 1]
+            # ---- Fill merged cells with values ----
+            merged_ranges[target_sheet_name] = grid.fill_merged_ranges(values, sheet_grid.merged_ranges)
+            # ---- Fill empty cells, strip, translate and remove trailing spaces ----
+            clear_grids[target_sheet_name] = grid.clear_values(values)
+        return clear_grids, merged_ranges
+
     def auto_detect_range(
         self, sheet_df: pd.DataFrame, xlsx_file: io.BytesIO, sheet_name: str
     ) -> tuple[int, int, int, int]:
@@ -192,12 +407,7 @@ class CoreCoursesParser:
 
     def get_time_columns(self, sheet_df: pd.DataFrame) -> list[int]:
         # find columns where presents "MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY"
-        time_columns = []
-        for column in sheet_df.columns:
-            values_in_column = sheet_df[column].values
-            if all(weekday in values_in_column for weekday in WEEKDAYS[:-1]):
-                time_columns.append(column)
-        return time_columns
+        return grid.get_time_columns(sheet_df.to_numpy(dtype=object))
 
     def get_rightmost_column_index(self, xlsx_file: io.BytesIO, sheet_name: str, time_columns: list[int]) -> int:
         # Column after time columns that has no borders formatting
@@ -235,27 +445,34 @@ class CoreCoursesParser:
         sheet = wb[sheet_name]
         return sheet.max_row
 
-    def assign_excel_row_and_column_to_subject(self, df: pd.DataFrame) -> None:
+    def get_subject_cells_a1(self, df: pd.DataFrame | np.ndarray) -> np.ndarray:
+        """
+        Find 'subject' cells (first of three cells: subject, teacher, location) in clear sheet dataframe or array.
+
+        :return: array of the same shape as dataframe with A1 coordinates of subject cells and None elsewhere
+        """
+
         def check_value_is_time(string_to_check: str) -> bool:
             return bool(re.match(r"^\d{1,2}:\d{2}\s*-\s*\d{1,2}:\d{2}$", string_to_check))
 
-        used_cells: set[tuple[int, int]] = set()
-        for i in range(3, len(df.values)):
-            for j in range(1, len(df.values[i])):
-                if (i, j) in used_cells:
+        values = df.to_numpy(dtype=object) if isinstance(df, pd.DataFrame) else df
+        subject_cells_a1 = np.full(values.shape, None, dtype=object)
+        for j in range(1, values.shape[1]):
+            column_letter = get_column_letter(j + 1)
+            used_until = 0  # rows of teacher and location of the last found subject
+            for i in range(3, values.shape[0]):
+                if i < used_until:
                     continue
-
-                v = df.iloc[i, j]
+                v = values[i, j]
                 if isinstance(v, str):
                     v = v.strip()
 
                 if not v or pd.isna(v) or v in WEEKDAYS or check_value_is_time(v):
                     continue
 
-                excel_coords = f"{get_column_letter(j + 1)}{i + 1}"
-                df.iloc[i, j] = f"{df.iloc[i, j]}${excel_coords}"
-                for x in range(i, i + 3):
-                    used_cells.add((x, j))
+                subject_cells_a1[i, j] = f"{column_letter}{i + 1}"
+                used_until = i + 3
+        return subject_cells_a1
 
     def merge_cells(
         self, df: pd.DataFrame, xlsx: io.BytesIO, target_sheet_name: str
@@ -296,7 +513,8 @@ class CoreCoursesParser:
 
     def set_weekday_and_time_as_index(self, df: pd.DataFrame, column: int = 0) -> None:
         """
-        Set time column as index and process it to datetime format
+        Set time column as index and process it to datetime format.
+        Original row labels are kept in "row" level of the index.
 
         :param df: dataframe to process
         :type df: pd.DataFrame
@@ -304,8 +522,8 @@ class CoreCoursesParser:
         :type column: int, optional
         """
 
-        # get column view and iterate over it
-        df_column = df.iloc[:, column]
+        # get column copy (as object, so it can hold time tuples) and iterate over it
+        df_column = df.iloc[:, column].astype(object)
         df_column: pd.Series
         # drop column
         df.drop(df.columns[column], axis=1, inplace=True)
@@ -321,21 +539,17 @@ class CoreCoursesParser:
         last_index = len(df_column)
         for start, end in pairwise(weekdays_indexes + [last_index]):
             index_mapping.iloc[start] = "delete"
-            index_mapping.iloc[start + 1 : end] = df_column[start]
+            index_mapping.iloc[start + 1 : end] = df_column.iloc[start]
 
         # ----- Process time ------ #
         matched = df_column[df_column.str.match(r"\d{1,2}:\d{2}-\d{1,2}:\d{2}")]
 
         for i, cell in matched.items():
             # "9:00-10:30" -> datetime.time(9, 0), datetime.time(10, 30)
-            start, end = cell.split("-")
-            df_column.loc[i] = (
-                datetime.datetime.strptime(start, "%H:%M").time(),
-                datetime.datetime.strptime(end, "%H:%M").time(),
-            )
+            df_column.loc[i] = parse_time_range(cell)
 
-        # create multiindex from index mapping and time column
-        multiindex = pd.MultiIndex.from_arrays([index_mapping, df_column], names=["weekday", "time"])
+        # create multiindex from index mapping, time column and original row labels
+        multiindex = pd.MultiIndex.from_arrays([index_mapping, df_column, df.index], names=["weekday", "time", "row"])
         # set multiindex as index
         df.set_index(multiindex, inplace=True)
         # drop rows with weekday
@@ -354,8 +568,7 @@ class CoreCoursesParser:
         # get rows with course and group
         df_header = df.iloc[rows[0] : rows[1] + 1]
         # drop rows with course and group
-        df.drop(list(rows), inplace=True)
-        df.reset_index(drop=True, inplace=True)
+        df.drop(df.index[list(rows)], inplace=True)
         # fill nan values with previous value
         with pd.option_context("future.no_silent_downcasting", True):
             df_header = df_header.ffill(axis=1)
@@ -368,6 +581,7 @@ class CoreCoursesParser:
         google_sheet_name: str,
         google_sheet_gid: str,
         spreadsheet_id: str,
+        a1: str | None = None,
     ) -> CoreCourseCell | None:
         if all(pd.isna(y) for y in values):
             return None
@@ -381,10 +595,6 @@ class CoreCoursesParser:
         assert values[0] is not None, f"Subject must not be None, got {values}"
         assert len(values) == 3, f"Length of value must be 3, got {values}"
 
-        a1 = None
-        for i, v in enumerate(values):
-            if v is not None and isinstance(v, str) and "$" in v:
-                values[i], a1 = v.rsplit("$", maxsplit=1)
         return CoreCourseCell(
             value=tuple(values),
             spreadsheet_id=spreadsheet_id,
@@ -421,3 +631,66 @@ class CoreCoursesParser:
             split_df = df.iloc[:, start:end].copy()
             split_dfs.append(split_df)
         return split_dfs
+
+
+def _process_sheet_in_worker(
+    xlsx_path: str,
+    target_sheet_name: str,
+    *,
+    spreadsheet_id: str,
+    google_sheet_name: str | None,
+    google_sheet_gid: str | None,
+    as_cells: bool = False,
+    engine: CoreCoursesEngine = "pandas",
+    reader: XlsxReaderName = "openpyxl",
+) -> tuple[list[DataFrame] | list[CourseBlockCell], list[tuple[int, int, int, int]]]:
+    """
+    Process one sheet in a worker process of `CoreCoursesParser.pipeline_parallel`.
+
+    :param xlsx_path: path to the xlsx file shared between workers
+    :return: list of dataframes (one per course) or cells of the sheet and merged ranges of the sheet
+    """
+    parser = CoreCoursesParser()
+    with open(xlsx_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as xlsx_file:
+        if engine == "grid":
+            dfs, merged_ranges = parser.get_clear_grids_from_xlsx(
+                xlsx_file,  # type: ignore[arg-type]
+                [target_sheet_name],
+                reader,
+            )
+        else:
+            dfs, merged_ranges = parser.get_clear_dataframes_from_xlsx(
+                xlsx_file,  # type: ignore[arg-type]
+                [target_sheet_name],
+            )
+        if as_cells:
+            return list(
+                parser.iter_sheet_cells(
+                    dfs[target_sheet_name],
+                    spreadsheet_id=spreadsheet_id,
+                    google_sheet_name=google_sheet_name,
+                    google_sheet_gid=google_sheet_gid,
+                )
+            ), merged_ranges[target_sheet_name]
+        grouped_dfs_with_cells_lst = parser.process_sheet_df(
+            dfs[target_sheet_name],
+            xlsx_file,  # type: ignore[arg-type]
+            target_sheet_name,
+            spreadsheet_id=spreadsheet_id,
+            google_sheet_name=google_sheet_name,
+            google_sheet_gid=google_sheet_gid,
+        )
+    return grouped_dfs_with_cells_lst, merged_ranges[target_sheet_name]
+
+
+def _fill_forward(values: np.ndarray) -> list:
+    """
+    Fill empty values with the previous non-empty one, like `DataFrame.ffill(axis=1)` for one row.
+    """
+    filled = []
+    last = np.nan
+    for value in values:
+        if not pd.isna(value):
+            last = value
+        filled.append(last)
+    return filled
@@ -4,9 +4,13 @@ from collections.abc import Generator
 
 from pydantic import BaseModel
 
-from ..utils import MOSCOW_TZ
+from ..utils import MOSCOW_TZ, parse_time
 from .config import Elective
 
+TIMESLOT_PATTERN = re.compile(r"\(?(\d{2}:\d{2})-(\d{2}:\d{2})\)?")
+STARTS_AT_PATTERNS = (re.compile(r"\(?starts at (\d{2}:\d{2})\)?"), re.compile(r"\(?начало в (\d{2}:\d{2})\)?"))
+ENDS_AT_PATTERNS = (re.compile(r"\(?ends at (\d{2}:\d{2})\)?"), re.compile(r"\(?конец в (\d{2}:\d{2})\)?"))
+
 
 class ElectiveEvent(BaseModel):
     elective: Elective
@@ -102,23 +106,19 @@ def parse_one_line_in_value(
 
     # find time xx:xx-xx:xx
     starts_at = ends_at = None
-    if timeslot_m := re.search(r"\(?(\d{2}:\d{2})-(\d{2}:\d{2})\)?", string):
-        starts_at = datetime.datetime.strptime(timeslot_m.group(1), "%H:%M").time()
-        ends_at = datetime.datetime.strptime(timeslot_m.group(2), "%H:%M").time()
+    if timeslot_m := TIMESLOT_PATTERN.search(string):
+        starts_at = parse_time(timeslot_m.group(1))
+        ends_at = parse_time(timeslot_m.group(2))
         string = string.replace(timeslot_m.group(0), "")
 
     # find starts at xx:xx
-    if timeslot_m := (
-        re.search(r"\(?starts at (\d{2}:\d{2})\)?", string) or re.search(r"\(?начало в (\d{2}:\d{2})\)?", string)
-    ):
-        starts_at = datetime.datetime.strptime(timeslot_m.group(1), "%H:%M").time()
+    if timeslot_m := STARTS_AT_PATTERNS[0].search(string) or STARTS_AT_PATTERNS[1].search(string):
+        starts_at = parse_time(timeslot_m.group(1))
         string = string.replace(timeslot_m.group(0), "")
 
     # find ends at xx:xx
-    if timeslot_m := re.search(r"\(?ends at (\d{2}:\d{2})\)?", string) or re.search(
-        r"\(?конец в (\d{2}:\d{2})\)?", string
-    ):
-        ends_at = datetime.datetime.strptime(timeslot_m.group(1), "%H:%M").time()
+    if timeslot_m := ENDS_AT_PATTERNS[0].search(string) or ENDS_AT_PATTERNS[1].search(string):
+        ends_at = parse_time(timeslot_m.group(1))
         string = string.replace(timeslot_m.group(0), "")
 
     # find (lab), (lec)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 
@@ -37,3 +39,7 @@ class ElectivesParserConfig(BaseModel):
     semester_tag: Tag
     spreadsheet_id: str
     electives: list[Elective]
+
+
+ElectivesReader = Literal["pandas", "openpyxl", "iterparse"]
+"How electives sheets are read: with pandas or with a reader of `src.xlsx`, the same lessons either way"
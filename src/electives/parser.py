@@ -8,8 +8,8 @@ import datetime
 import io
 import re
 import warnings
-from collections.abc import Generator
-from itertools import groupby, pairwise
+from collections.abc import Generator, Iterable
+from itertools import groupby, pairwise, repeat
 
 import numpy as np
 import openpyxl
@@ -18,12 +18,20 @@ from openpyxl.utils import get_column_letter
 from pydantic import BaseModel
 
 from src.logging_ import logger
+from src.xlsx import XLSX_READERS
 
-from ..utils import prettify_string, sanitize_sheet_name
+from ..utils import parse_month_day, parse_time_range, prettify_string, sanitize_sheet_name
 from .cell_to_event import ElectiveEvent
-from .config import Elective
+from .config import Elective, ElectivesReader
 
 BRACKETS_PATTERN = re.compile(r"\((.*?)\)")
+EXCEL_MAX_COLUMNS = 16384
+"Coordinates of cells are kept aside from values as integers: `row * EXCEL_MAX_COLUMNS + column` (0-indexed)"
+
+
+def coordinates_to_a1(coordinates: int) -> str:
+    row, column = divmod(int(coordinates), EXCEL_MAX_COLUMNS)
+    return f"{get_column_letter(column + 1)}{row + 1}"
 
 
 class ElectiveCell(BaseModel):
@@ -59,11 +67,16 @@ class ElectiveParser:
         electives: list[Elective],
         sheet_gids: dict[str, str],
         spreadsheet_id: str,
+        reader: ElectivesReader = "pandas",
     ) -> Generator[list[Separation]]:
+        """
+        :param reader: how sheets are read, with pandas or with a reader of `src.xlsx`
+        """
         sanitized_target_sheet_names = [
             sanitize_sheet_name(target_sheet_name) for target_sheet_name in original_target_sheet_names
         ]
-        dfs = self.get_clear_dataframes_from_xlsx(xlsx_file, sanitized_target_sheet_names)
+        dfs, coordinates = self.get_clear_dataframes_from_xlsx(xlsx_file, sanitized_target_sheet_names, reader)
+        year = datetime.date.today().year
 
         sanitized_sheet_name_x_google_sheet_name = {
             sanitize_sheet_name(sheet_name): sheet_name for sheet_name in sheet_gids.keys()
@@ -80,18 +93,16 @@ class ElectiveParser:
             google_sheet_name = sanitized_sheet_name_x_google_sheet_name.get(target_sheet_name)
             google_sheet_gid = sheet_gids.get(google_sheet_name, "") if google_sheet_name else ""
 
-            by_weeks = self.split_df_by_weeks(sheet_df)
-            index = {}
-            for sheet_df in by_weeks:
-                index.update(sheet_df.index.tolist())
-            big_df = pd.DataFrame(index=index)
-            big_df = pd.concat([big_df, *by_weeks], axis=1)
-            big_df.dropna(axis=1, how="all", inplace=True)
-            big_df.dropna(axis=0, how="all", inplace=True)
-            all_events = list(
-                self.parse_df(
-                    big_df,
+            # weeks are parsed one by one, so only one week block is in memory besides the sheet
+            all_events = (
+                event
+                for week_df, week_coordinates in self.split_df_by_weeks(
+                    sheet_df, coordinates[target_sheet_name], year=year
+                )
+                for event in self.parse_df(
+                    week_df,
                     electives,
+                    coordinates=week_coordinates,
                     spreadsheet_id=spreadsheet_id,
                     google_sheet_name=google_sheet_name or original_target_sheet_name,
                     google_sheet_gid=google_sheet_gid,
@@ -101,53 +112,71 @@ class ElectiveParser:
             yield converted
 
     def get_clear_dataframes_from_xlsx(
-        self, xlsx_file: io.BytesIO, target_sheet_names: list[str]
-    ) -> dict[str, pd.DataFrame]:
+        self, xlsx_file: io.BytesIO, target_sheet_names: list[str], reader: ElectivesReader = "pandas"
+    ) -> tuple[dict[str, pd.DataFrame], dict[str, np.ndarray]]:
         """
         Get data from xlsx file and return it as a DataFrame with merged
         cells and empty cells in the course row filled by left value.
+        Excel coordinates of cells are returned separately as arrays aligned with dataframes (see `EXCEL_MAX_COLUMNS`).
 
         :param xlsx_file: xlsx file with data
         :type xlsx_file: io.BytesIO
         :param target_sheet_names: list of target sheet names to get data from
         :type target_sheet_names: list[str]
+        :param reader: how sheets are read, with pandas or with a reader of `src.xlsx`
+        :type reader: ElectivesReader
 
-        :return: dataframes with merged cells and empty cells filled
-        :rtype: dict[str, pd.DataFrame]
+        :return: dataframes with merged cells and empty cells filled, coordinates of their cells
+        :rtype: tuple[dict[str, pd.DataFrame], dict[str, np.ndarray]]
         """
         # ------- Read xlsx file into dataframes -------
-        dfs = pd.read_excel(xlsx_file, engine="openpyxl", sheet_name=None, header=None)
+        last_row_indexes: dict[str, int] = {}
+        if reader == "pandas":
+            dfs = pd.read_excel(xlsx_file, engine="openpyxl", sheet_name=None, header=None)
+        else:
+            grids = XLSX_READERS[reader].read_sheets(xlsx_file, target_sheet_names)
+            dfs = {sheet_name: pd.DataFrame(sheet_grid.values) for sheet_name, sheet_grid in grids.items()}
+            last_row_indexes = {sheet_name: sheet_grid.max_row for sheet_name, sheet_grid in grids.items()}
 
         # ------- Clean up dataframes -------
+        coordinates: dict[str, np.ndarray] = {}
         for target_sheet_name in target_sheet_names:
+            if target_sheet_name not in dfs:
+                continue
             df = dfs[target_sheet_name]
             # -------- Select range --------
-            (min_row, min_col, max_row, max_col) = self.auto_detect_range(df, xlsx_file, target_sheet_name)
-
-            # -------- Add Excel coordinates to cell values --------
+            (min_row, min_col, max_row, max_col) = self.auto_detect_range(
+                df, xlsx_file, target_sheet_name, last_row_indexes.get(target_sheet_name)
+            )
             df = df.iloc[min_row : max_row + 1, min_col : max_col + 1]
-            self.assign_excel_row_and_column_to_cells(df, min_row, min_col)
+            # -------- Excel coordinates of cells --------
+            rows, columns = np.indices(df.shape)
+            df_coordinates = (rows + min_row) * EXCEL_MAX_COLUMNS + columns + min_col
             # -------- Set time column as index --------
             df = self.set_time_column_as_index(df)
+            df_coordinates = df_coordinates[:, 1:]
             # -------- Strip all values --------
             df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
             # -------- Fill empty cells --------
             df = df.replace(r"^\s*$", np.nan, regex=True)
             # -------- Exclude nan rows --------
-            df = df.dropna(how="all")
+            not_empty = df.notna().any(axis=1).to_numpy()
+            df = df[not_empty]
+            df_coordinates = df_coordinates[not_empty]
             # -------- Strip, translate and remove trailing spaces --------
             df = df.map(prettify_string)
             # -------- Update dataframe --------
             dfs[target_sheet_name] = df
+            coordinates[target_sheet_name] = df_coordinates
 
-        return dfs
+        return dfs, coordinates
 
-    def events_to_separation_by_elective(self, events: list[ElectiveEvent]) -> list[Separation]:
+    def events_to_separation_by_elective(self, events: Iterable[ElectiveEvent]) -> list[Separation]:
         """
-        Convert list of events to dict with separation by Elective.
+        Convert events to dict with separation by Elective.
 
-        :param events: list of events to convert
-        :type events: list[ElectiveEvent]
+        :param events: events to convert
+        :type events: Iterable[ElectiveEvent]
         :return: separations by Elective
         :rtype: list[Separation]
         """
@@ -177,9 +206,10 @@ class ElectiveParser:
         return list(output.values())
 
     def auto_detect_range(
-        self, sheet_df: pd.DataFrame, xlsx_file: io.BytesIO, sheet_name: str
+        self, sheet_df: pd.DataFrame, xlsx_file: io.BytesIO, sheet_name: str, last_row_index: int | None = None
     ) -> tuple[int, int, int, int]:
         """
+        :param last_row_index: last row of the sheet if it is known already, otherwise the workbook is loaded to find it
         :return: tuple of (min_row, min_col, max_row, max_col)
         """
 
@@ -194,7 +224,8 @@ class ElectiveParser:
         rightmost_column_index = max(weekday_columns_index)
         leftmost_column_index = min(weekday_columns_index) - 1
         logger.info(f"Rightmost column index: {get_column_letter(rightmost_column_index + 1)}")
-        last_row_index = self.get_last_row_index(xlsx_file, sheet_name)
+        if last_row_index is None:
+            last_row_index = self.get_last_row_index(xlsx_file, sheet_name)
         target_range = f"{get_column_letter(leftmost_column_index + 1)}1:{get_column_letter(rightmost_column_index + 1)}{last_row_index}"
         logger.info(f"Target range: {target_range}")
         return (0, leftmost_column_index, last_row_index, rightmost_column_index)
@@ -216,24 +247,15 @@ class ElectiveParser:
 
         # "9:00-10:30" -> datetime.time(9, 0), datetime.time(10, 30)
         def process_time_cell(cell: str) -> tuple[datetime.time, datetime.time] | str:
-            if "$" in cell:
-                cell, a1 = cell.rsplit("$", maxsplit=1)
-                cell = cell.strip()
-            if re.match(r"\d{1,2}:\d{2}-\d{1,2}:\d{2}", cell):
-                start, end = cell.split("-")
-                return (
-                    datetime.datetime.strptime(start, "%H:%M").time(),
-                    datetime.datetime.strptime(end, "%H:%M").time(),
-                )
-            else:
-                return cell
+            cell = cell.strip()
+            return parse_time_range(cell) or cell
 
         df[column] = df[column].apply(lambda x: process_time_cell(x) if isinstance(x, str) else x)
         df.set_index(column, inplace=True)
         df.rename_axis(index="time", inplace=True)
         return df
 
-    def set_date_row_as_header(self, df: pd.DataFrame, row: int = 0) -> pd.DataFrame:
+    def set_date_row_as_header(self, df: pd.DataFrame, row: int = 0, year: int | None = None) -> pd.DataFrame:
         """
         Set date row as columns and process it to datetime format
 
@@ -241,61 +263,40 @@ class ElectiveParser:
         :type df: pd.DataFrame
         :param row: row to set as columns, defaults to 0
         :type row: int, optional
+        :param year: year of dates, defaults to the current year
+        :type year: int, optional
         """
+        if year is None:
+            year = datetime.date.today().year
 
-        # "June 7" -> datetime.date(current_year, 6, 7)
+        # "June 7" -> datetime.date(year, 6, 7)
         def process_date_cell(cell: str) -> datetime.date | str:
-            if "$" in cell:
-                cell, a1 = cell.rsplit("$", maxsplit=1)
-                cell = cell.strip()
-            if re.match(r"\w+ \d+", cell):
-                dtime = datetime.datetime.strptime(cell, "%B %d")
-                dtime = dtime.replace(year=datetime.date.today().year)
-                return dtime.date()
-            else:
-                return cell
+            cell = cell.strip()
+            return parse_month_day(cell, year) or cell
 
         index = df.index[row]
-        df.loc[index] = df.loc[index].apply(lambda x: process_date_cell(x) if isinstance(x, str) else x)
-        df.columns = df.loc[index]
+        # not assigned back to the row: dates do not fit into columns of `str` dtype
+        df.columns = df.loc[index].apply(lambda x: process_date_cell(x) if isinstance(x, str) else x)
         df.drop(index, inplace=True)
         df.rename_axis(columns="date", inplace=True)
         return df
 
-    def assign_excel_row_and_column_to_cells(self, df: pd.DataFrame, min_row: int, min_col: int) -> None:
+    def split_df_by_weeks(
+        self, df: pd.DataFrame, coordinates: np.ndarray, year: int | None = None
+    ) -> Generator[tuple[pd.DataFrame, np.ndarray]]:
         """
-        Add Excel coordinates to cell values in the format: "value$A1"
-
-        :param df: dataframe to process
-        :type df: pd.DataFrame
-        :param min_row: minimum row index in original sheet (0-indexed)
-        :type min_row: int
-        :param min_col: minimum column index in original sheet (0-indexed)
-        :type min_col: int
-        """
-        for i in range(len(df.values)):
-            for j in range(len(df.values[i])):
-                v = df.iloc[i, j]
-                if pd.isna(v) or not isinstance(v, str) or not v.strip():
-                    continue
-
-                # Calculate Excel coordinates (1-indexed)
-                excel_row = min_row + i + 1
-                excel_col = min_col + j + 1
-                excel_coords = f"{get_column_letter(excel_col)}{excel_row}"
-
-                # Add coordinates to cell value if not already present
-                if "$" not in v:
-                    df.iloc[i, j] = f"{v}${excel_coords}"
-
-    def split_df_by_weeks(self, df: pd.DataFrame) -> list[pd.DataFrame]:
-        """
-        Split dataframe by "Week *" rows
+        Split dataframe by "Week *" rows, week blocks are made lazily one at a time.
+        Empty rows and columns of a week are dropped, rows are ordered by the first appearance of their timeslot
+        in the sheet (as if all weeks were joined into one table by timeslot).
 
         :param df: dataframe to split
         :type df: pd.DataFrame
-        :return: list of dataframes
-        :rtype: list[pd.DataFrame]
+        :param coordinates: coordinates of cells of the dataframe
+        :type coordinates: np.ndarray
+        :param year: year of dates, defaults to the current year
+        :type year: int, optional
+        :return: dataframes of weeks with dates as columns and coordinates of their cells
+        :rtype: Generator[tuple[pd.DataFrame, np.ndarray]]
         """
 
         logger.debug("Parsing dataframe to separation by days|groups...")
@@ -308,22 +309,34 @@ class ElectiveParser:
 
         max_x, _ = df.shape
         week_locations += [max_x]  # add last index
+        first_appearance: dict = {}
+        for location, timeslot in enumerate(df.index):
+            first_appearance.setdefault(timeslot, location)
         # split dataframe by week indexes
-        dfs = []
         for start, end in pairwise(week_locations):
             week = df.index[start]
             logger.debug(f"Processing week: {week}... From ({start}) to ({end})")
             week_df: pd.DataFrame = df.iloc[start:end].copy()
             # ----- Set date row as header -----
-            week_df = self.set_date_row_as_header(week_df)
-            dfs.append(week_df)
-        return dfs
+            week_df = self.set_date_row_as_header(week_df, year=year)
+            # ----- Drop empty rows and columns -----
+            not_empty = week_df.notna().to_numpy()
+            not_empty_rows, not_empty_columns = not_empty.any(axis=1), not_empty.any(axis=0)
+            week_df = week_df.iloc[not_empty_rows, not_empty_columns]
+            week_coordinates = coordinates[start + 1 : end][np.ix_(not_empty_rows, not_empty_columns)]
+            # ----- Order rows as in other weeks -----
+            order = np.argsort([first_appearance[timeslot] for timeslot in week_df.index], kind="stable")
+            if (np.diff(order) < 0).any():
+                week_df = week_df.iloc[order]
+                week_coordinates = week_coordinates[order]
+            yield week_df, week_coordinates
 
     def parse_df(
         self,
         df: pd.DataFrame,
         electives: list[Elective],
         *,
+        coordinates: np.ndarray | None = None,
         spreadsheet_id: str,
         google_sheet_name: str,
         google_sheet_gid: str,
@@ -335,6 +348,8 @@ class ElectiveParser:
         :type df: pd.DataFrame
         :param electives: list of electives
         :type electives: list[Elective]
+        :param coordinates: coordinates of cells of the dataframe, same shape
+        :type coordinates: np.ndarray | None
         :param spreadsheet_id: spreadsheet ID
         :type spreadsheet_id: str
         :param google_sheet_name: name of the sheet being parsed
@@ -353,25 +368,19 @@ class ElectiveParser:
         if has_electives:
             _elective_line_pattern = re.compile(r"(?P<elective_short_name>" + "|".join(_elective_short_names) + r")")
 
-        def process_line(line: str) -> ElectiveCell | None:
+        def process_line(line: str, a1: str | None) -> ElectiveCell | None:
             """
             Process line of the dataframe
 
             :param line: line to process (may contain newlines)
             :type line: str
+            :param a1: A1 coordinates of the cell
+            :type a1: str | None
             :return: ElectiveCell or nothing
             :rtype: ElectiveCell | None
             """
-            if pd.isna(line):
-                return None
             line = line.strip()
 
-            # Extract a1 coordinates if present (format: "value$A1")
-            a1 = None
-            if isinstance(line, str) and "$" in line:
-                line, a1 = line.rsplit("$", maxsplit=1)
-                line = line.strip()
-
             # First: split by newlines
             lines = [line_part.strip() for line_part in line.split("\n") if line_part.strip()]
             if not lines:
@@ -416,13 +425,12 @@ class ElectiveParser:
                 a1=a1,
             )
 
-        df = df.map(lambda x: process_line(x) if isinstance(x, str) else x)
-
-        for date, date_column in df.items():
+        columns_coordinates = coordinates.T if coordinates is not None else repeat(None)
+        for (date, date_column), column_coordinates in zip(df.items(), columns_coordinates):
             if not isinstance(date, datetime.date):
                 warnings.warn(f"Expected date as index, got {type(date).__name__}")
                 continue
-            for timeslot, cell in date_column.items():
+            for position, (timeslot, value) in enumerate(date_column.items()):
                 if not (
                     isinstance(timeslot, tuple)
                     and len(timeslot) == 2
@@ -431,5 +439,9 @@ class ElectiveParser:
                     warnings.warn(f"Expected timeslot as tuple of two datetime.time, got {timeslot!r}")
                     continue
 
-                if isinstance(cell, ElectiveCell):
+                if not isinstance(value, str):
+                    continue
+                a1 = coordinates_to_a1(column_coordinates[position]) if column_coordinates is not None else None
+                cell = process_line(value, a1)
+                if cell is not None:
                     yield from convert_cell_to_events(cell, date, timeslot, electives)
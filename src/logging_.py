@@ -1,9 +1,11 @@
 __all__ = ["logger"]
 
 import asyncio
+import functools
 import inspect
 import logging.config
 import os
+from collections.abc import Callable
 from typing import Any
 
 import fastapi
@@ -11,6 +13,9 @@ import yaml
 from fastapi.dependencies.models import Dependant
 from starlette.concurrency import run_in_threadpool
 
+from src.metrics import endpoint_latency
+from src.profiling import RequestProfiler, profiling_requested
+
 
 class RelativePathFilter(logging.Filter):
     def filter(self, record: logging.LogRecord) -> bool:
@@ -65,35 +70,71 @@ logger = logging.getLogger("src")
 logger.addFilter(RelativePathFilter())
 
 
+SLOW_ENDPOINT_SECONDS = 1.0
+"Endpoint functions running longer are logged, durations of all calls go to `src.metrics.endpoint_latency`"
+
+
+@functools.cache
+def _callable_source(callback: Callable) -> tuple[str, str, int]:
+    """
+    Name, source file and line of the endpoint function, resolved once per function.
+    """
+    func_name = getattr(callback, "__name__", type(callback).__name__)
+    try:
+        pathname = inspect.getsourcefile(callback) or "unknown"
+        lineno = inspect.getsourcelines(callback)[1]
+    except (OSError, TypeError):
+        pathname, lineno = "unknown", 0
+    return func_name, pathname, lineno
+
+
 async def run_endpoint_function(*, dependant: Dependant, values: dict[str, Any], is_coroutine: bool) -> Any:
     # Only called by get_request_handler. Has been split into its own function to
     # facilitate profiling endpoints, since inner functions are harder to profile.
     assert dependant.call is not None, "dependant.call must be a function"
+    profiler = _start_profiler(dependant) if profiling_requested.get() else None
     loop = asyncio.get_running_loop()
     start_time = loop.time()
-    if is_coroutine:
-        r = await dependant.call(**values)
-    else:
-        r = await run_in_threadpool(dependant.call, **values)
-    finish_time = loop.time()
-    duration = finish_time - start_time
-    callback = dependant.call
-    func_name = callback.__name__
-    pathname = inspect.getsourcefile(callback) or "unknown"
-    lineno = inspect.getsourcelines(callback)[1]
-    record = logging.LogRecord(
-        name="src.fastapi.run_endpoint_function",
-        level=logging.INFO,
-        pathname=pathname,
-        lineno=lineno,
-        msg=f"Handler `{func_name}` took {int(duration * 1000)} ms",
-        args=(),
-        exc_info=None,
-        func=func_name,
-    )
-    record.relativePath = os.path.relpath(record.pathname)
-    logger.handle(record)
-    return r
+    try:
+        if is_coroutine:
+            return await dependant.call(**values)
+        else:
+            return await run_in_threadpool(dependant.call, **values)
+    finally:
+        finish_time = loop.time()
+        _observe_endpoint_duration(dependant, finish_time - start_time)
+        if profiler is not None:
+            paths = profiler.stop()
+            logger.info(f"Profile of `{profiler.name}` is saved to {', '.join(map(str, paths))}")
+
+
+def _start_profiler(dependant: Dependant) -> RequestProfiler | None:
+    assert dependant.call is not None
+    func_name, _, _ = _callable_source(dependant.call)
+    profiler = RequestProfiler(func_name)
+    if not profiler.start():
+        logger.warning(f"Another request is being profiled, `{func_name}` is not profiled")
+        return None
+    return profiler
+
+
+def _observe_endpoint_duration(dependant: Dependant, duration: float) -> None:
+    assert dependant.call is not None
+    func_name, pathname, lineno = _callable_source(dependant.call)
+    endpoint_latency.labels(dependant.path or "unknown", func_name).observe(duration)
+    if duration >= SLOW_ENDPOINT_SECONDS:
+        record = logging.LogRecord(
+            name="src.fastapi.run_endpoint_function",
+            level=logging.INFO,
+            pathname=pathname,
+            lineno=lineno,
+            msg=f"Handler `{func_name}` took {int(duration * 1000)} ms",
+            args=(),
+            exc_info=None,
+            func=func_name,
+        )
+        record.relativePath = os.path.relpath(record.pathname)
+        logger.handle(record)
 
 
 # monkey patch fastapi to log endpoint function duration and link to source code
@@ -0,0 +1,283 @@
+"""
+In-process metrics. Values are kept per process (per gunicorn worker) and reset on restart.
+
+All metrics are registered in `registry`, which renders them in Prometheus text exposition format (`GET /metrics`),
+so they can be read with curl or scraped by any Prometheus-compatible collector.
+"""
+
+import abc
+import bisect
+import contextlib
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+"Upper bounds of latency buckets in seconds, from 1 ms up to the gunicorn timeout"
+SIZE_BUCKETS = (1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7, 3e7, 1e8)
+"Upper bounds of size buckets in bytes, from 10 KB up to 100 MB"
+COUNT_BUCKETS = (0, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+"Upper bounds of buckets for number of items (lessons, bookings)"
+
+
+class Histogram:
+    """
+    Counts of observed values in fixed buckets. Quantiles are estimated by linear interpolation inside a bucket.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        "Count of values in every bucket (not cumulative), the last one is for values above the last bound"
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        # checks run in worker threads too
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    @contextlib.contextmanager
+    def time(self) -> Iterator[None]:
+        """
+        Observe duration of the block in seconds, also if it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    # above the last bound: the maximum is the best estimate
+                    return self.max
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = min(self.buckets[i], self.max)
+                return lower + (upper - lower) * max(rank - cumulative, 0) / bucket_count
+            cumulative += bucket_count
+        return self.max
+
+
+class Counter:
+    """
+    Monotonically increasing value.
+    """
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _Labeled[T](abc.ABC):
+    """
+    Child metrics for every combination of label values.
+    """
+
+    type: str
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._children: dict[tuple[str, ...], T] = {}
+
+    @abc.abstractmethod
+    def _new_child(self) -> T: ...
+
+    def labels(self, *label_values: str) -> T:
+        child = self._children.get(label_values)
+        if child is None:
+            if len(label_values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {label_values}")
+            child = self._children.setdefault(label_values, self._new_child())
+        return child
+
+    def items(self) -> Iterator[tuple[dict[str, str], T]]:
+        for label_values, child in list(self._children.items()):
+            yield dict(zip(self.label_names, label_values)), child
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        """
+        :return: generator of (sample name, labels, value)
+        """
+
+
+class LabeledHistogram(_Labeled[Histogram]):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: tuple[str, ...], buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+
+    def _new_child(self) -> Histogram:
+        return Histogram(self.buckets)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for labels, histogram in self.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), histogram.bucket_counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, histogram.sum
+            yield f"{self.name}_count", labels, histogram.count
+
+
+class LabeledCounter(_Labeled[Counter]):
+    type = "counter"
+
+    def _new_child(self) -> Counter:
+        return Counter()
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for labels, counter in self.items():
+            yield self.name, labels, counter.value
+
+
+class Gauge:
+    """
+    Values read at collection time from `function`, which returns pairs of (label values, value).
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...],
+        function: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.function = function
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for label_values, value in self.function():
+            yield self.name, dict(zip(self.label_names, label_values)), value
+
+
+type Metric = LabeledHistogram | LabeledCounter | Gauge
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register[M: Metric](self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is registered already")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Render all metrics in Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for sample_name, labels, value in metric.samples():
+                if labels:
+                    formatted_labels = ",".join(f'{k}="{_escape_label_value(str(v))}"' for k, v in labels.items())
+                    lines.append(f"{sample_name}{{{formatted_labels}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{sample_name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = Registry()
+
+endpoint_latency = registry.register(
+    LabeledHistogram("endpoint_duration_seconds", "Duration of endpoint functions", ("path", "handler"))
+)
+spreadsheet_download_duration = registry.register(
+    LabeledHistogram("spreadsheet_download_duration_seconds", "Duration of xlsx export from Google Sheets", ("source",))
+)
+spreadsheet_download_size = registry.register(
+    LabeledHistogram(
+        "spreadsheet_download_size_bytes", "Size of xlsx export from Google Sheets", ("source",), SIZE_BUCKETS
+    )
+)
+sheet_parse_duration = registry.register(
+    LabeledHistogram("sheet_parse_duration_seconds", "Duration of parsing of one sheet into lessons", ("source",))
+)
+sheet_lessons = registry.register(
+    LabeledHistogram("sheet_lessons", "Number of lessons parsed from one sheet", ("source",), COUNT_BUCKETS)
+)
+collisions_check_duration = registry.register(
+    LabeledHistogram("collisions_check_duration_seconds", "Duration of one kind of collisions check", ("type",))
+)
+check_phase_duration = registry.register(
+    LabeledHistogram(
+        "check_phase_duration_seconds",
+        "Duration of phases of a collisions check (lessons, rooms, bookings, checks), some of them run concurrently",
+        ("phase",),
+    )
+)
+collisions_issues = registry.register(LabeledCounter("collisions_issues_total", "Number of found issues", ("type",)))
+booking_request_duration = registry.register(
+    LabeledHistogram("booking_request_duration_seconds", "Duration of requests to InNoHassle Booking", ("method",))
+)
+booking_request_items = registry.register(
+    LabeledHistogram(
+        "booking_request_items", "Number of items returned by InNoHassle Booking", ("method",), COUNT_BUCKETS
+    )
+)
+cache_lookups = registry.register(
+    LabeledCounter(
+        "cache_lookups_total",
+        "Lookups in in-process caches by result (hit, miss; coalesced for joined computations in flight)",
+        ("cache", "result"),
+    )
+)
@@ -7,6 +7,7 @@ from pydantic import Field
 
 from src.config import settings
 from src.custom_pydantic import CustomModel
+from src.metrics import booking_request_duration, booking_request_items
 
 
 class BookingDTO(CustomModel):
@@ -57,12 +58,14 @@ class BookingClient:
         async with httpx.AsyncClient(headers={"Authorization": f"Bearer {token}"}) as client:
             safe_room_id = quote(room_id, safe="")
             full_url = urljoin(self.url, f"room/{safe_room_id}/bookings")
-            response = await client.get(
-                full_url,
-                params={"start": start.isoformat(), "end": end.isoformat()},
-            )
-            response.raise_for_status()
-            data = response.json()
+            with booking_request_duration.labels("room_bookings").time():
+                response = await client.get(
+                    full_url,
+                    params={"start": start.isoformat(), "end": end.isoformat()},
+                )
+                response.raise_for_status()
+                data = response.json()
+            booking_request_items.labels("room_bookings").observe(len(data))
             return [BookingDTO.model_validate(entry) for entry in data]
 
     async def get_all_bookings(
@@ -72,20 +75,25 @@ class BookingClient:
         end: datetime.datetime,
     ) -> list[BookingDTO]:
         async with httpx.AsyncClient(headers={"Authorization": f"Bearer {token}"}) as client:
-            response = await client.get(
-                urljoin(self.url, "bookings/"),
-                params={"start": start.isoformat(), "end": end.isoformat(), "include_red": True},
-                timeout=60,
-            )
-            response.raise_for_status()
-            data = response.json()
+            with booking_request_duration.labels("bookings").time():
+                response = await client.get(
+                    urljoin(self.url, "bookings/"),
+                    params={"start": start.isoformat(), "end": end.isoformat(), "include_red": True},
+                    timeout=60,
+                )
+                response.raise_for_status()
+                data = response.json()
+            booking_request_items.labels("bookings").observe(len(data))
             return [BookingDTO.model_validate(entry) for entry in data]
 
     async def get_rooms(self, token: str) -> list[RoomDTO]:
         async with httpx.AsyncClient(headers={"Authorization": f"Bearer {token}"}) as client:
-            response = await client.get(urljoin(self.url, "rooms/"), params={"include_red": True})
-            response.raise_for_status()
-            return [RoomDTO.model_validate(entry) for entry in response.json()]
+            with booking_request_duration.labels("rooms").time():
+                response = await client.get(urljoin(self.url, "rooms/"), params={"include_red": True})
+                response.raise_for_status()
+                data = response.json()
+            booking_request_items.labels("rooms").observe(len(data))
+            return [RoomDTO.model_validate(entry) for entry in data]
 
 
 booking_client: BookingClient = BookingClient(url=settings.booking.api_url)
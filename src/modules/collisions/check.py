@@ -0,0 +1,276 @@
+import asyncio
+import contextlib
+import datetime
+import hashlib
+import io
+import time
+from collections.abc import Awaitable, Iterator
+
+from src.config import settings
+from src.core_courses.config import CoreCoursesConfig
+from src.core_courses.config import Tag as CoreCoursesTag
+from src.electives.config import ElectivesParserConfig
+from src.electives.config import Tag as ElectivesTag
+from src.logging_ import logger
+from src.metrics import check_phase_duration
+from src.modules.bookings.client import BookingDTO, RoomDTO, booking_client
+from src.modules.collisions.collision_checker import CollisionChecker, fetch_outlook_bookings
+from src.modules.collisions.core_courses_adapter import get_all_core_courses_lessons
+from src.modules.collisions.electives_adapter import get_all_electives_lessons
+from src.modules.collisions.occupancy import OccupancyIndex
+from src.modules.collisions.schemas import (
+    CheckParameters,
+    CheckPhaseEnum,
+    CheckProgress,
+    CheckResults,
+    Lesson,
+    ProgressCallback,
+)
+from src.modules.collisions.single_flight import SingleFlight
+from src.modules.lessons.index import lesson_index
+from src.modules.options.repository import OptionsData, SemesterOptions
+from src.utcnow import utcnow
+
+check_single_flight: SingleFlight[tuple[str, str, str], CheckResults] = SingleFlight(
+    "collisions check", ttl=settings.collisions.check_result_ttl
+)
+lessons_single_flight: SingleFlight[str, list[Lesson]] = SingleFlight(
+    "semester lessons", ttl=settings.collisions.lessons_ttl
+)
+occupancy_single_flight: SingleFlight[tuple[str, str], OccupancyIndex] = SingleFlight(
+    "occupancy index", ttl=settings.collisions.occupancy_index_ttl
+)
+
+OCCUPANCY_BOOKINGS_DAYS = 61
+"Outlook bookings of this number of days from now are put into the occupancy index, as many as the Outlook check gets"
+
+
+class CheckTimings:
+    """
+    Start and end of phases of a collisions check relative to its start, phases running concurrently overlap.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, tuple[float, float]] = {}
+        "Phase -> (start, end) in seconds from the start of the check"
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.phases[name] = (start - self.started, end - self.started)
+            check_phase_duration.labels(name).observe(end - start)
+
+    async def timed[T](self, name: str, awaitable: Awaitable[T]) -> T:
+        with self.phase(name):
+            return await awaitable
+
+    def __str__(self) -> str:
+        spans = sorted(self.phases.items(), key=lambda item: item[1])
+        return ", ".join(f"{name} {start:.3f}-{end:.3f} s" for name, (start, end) in spans)
+
+
+def _discard_tasks(*tasks: asyncio.Task | None) -> None:
+    """
+    Cancel prefetch tasks which are not needed anymore and retrieve exceptions of finished ones, so that a failed
+    request which was never awaited is not reported as "Task exception was never retrieved".
+    """
+    for task in tasks:
+        if task is None:
+            continue
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+
+
+async def run_check(
+    options: OptionsData,
+    params: CheckParameters,
+    token: str,
+    on_progress: ProgressCallback | None = None,
+    *,
+    xlsx_files: dict[str, io.BytesIO] | None = None,
+    rooms: list[RoomDTO] | None = None,
+    bookings: list[BookingDTO] | None = None,
+    timings: CheckTimings | None = None,
+) -> CheckResults:
+    """
+    Fetch lessons from spreadsheets and check them for collisions.
+
+    Rooms and Outlook bookings depend only on the semester options, so they are fetched while spreadsheets are
+    downloaded and parsed. Checks start once lessons and rooms are there, the Outlook check waits for bookings.
+
+    :param on_progress: called each time a download, a sheet or a kind of collisions check is finished
+    :param xlsx_files: spreadsheet id -> exported xlsx file, such spreadsheets are not downloaded
+    :param rooms: rooms to use instead of fetching them from InNoHassle Booking
+    :param bookings: Outlook bookings to use instead of fetching them from InNoHassle Booking
+    :param timings: filled with start and end of phases (lessons, rooms, bookings, checks)
+    """
+    semester_options = options.semester
+    if not semester_options or not semester_options.core_courses_spreadsheet_id:
+        raise ValueError("core_courses_spreadsheet_id must be set in semester options")
+    logger.info(f"Semester options: {semester_options}")
+    timings = timings or CheckTimings()
+    targets = [*semester_options.core_courses_targets, *semester_options.electives_targets]
+
+    rooms_task = bookings_task = None
+    if rooms is None:
+        rooms_task = asyncio.create_task(timings.timed("rooms", booking_client.get_rooms(token)))
+    if bookings is None and params.check_outlook_collisions:
+        bookings_task = asyncio.create_task(timings.timed("bookings", fetch_outlook_bookings(token, targets)))
+    try:
+        # let the requests go out before parsing takes the event loop
+        await asyncio.sleep(0)
+        with timings.phase("lessons"):
+            lessons = await fetch_lessons(semester_options, params, on_progress, xlsx_files)
+
+        teachers = options.teachers.data if options.teachers is not None else []
+        logger.info(f"Found {len(teachers)} teachers")
+
+        if rooms_task is not None:
+            rooms = await rooms_task
+            if on_progress:
+                on_progress(CheckProgress(phase=CheckPhaseEnum.DOWNLOAD, step="rooms"))
+
+        collisions_use_case = CollisionChecker(
+            token=token,
+            rooms=rooms,
+            teachers=teachers,
+            very_same_lessons=semester_options.very_same_lessons,
+            bookings=bookings_task if bookings_task is not None else bookings,
+        )
+
+        with timings.phase("checks"):
+            issues = await collisions_use_case.get_collisions(
+                lessons,
+                targets=targets,
+                check_room_collisions=params.check_room_collisions,
+                check_teacher_collisions=params.check_teacher_collisions,
+                check_space_collisions=params.check_space_collisions,
+                check_outlook_collisions=params.check_outlook_collisions,
+                on_progress=on_progress,
+                workers=settings.collisions.checks_workers,
+            )
+    finally:
+        _discard_tasks(rooms_task, bookings_task)
+    logger.info(f"Check phases: {timings}")
+
+    return CheckResults(issues=issues)
+
+
+async def fetch_lessons(
+    semester_options: SemesterOptions,
+    params: CheckParameters,
+    on_progress: ProgressCallback | None = None,
+    xlsx_files: dict[str, io.BytesIO] | None = None,
+) -> list[Lesson]:
+    """
+    Fetch and parse core courses and electives lessons the parameters care about.
+
+    :param xlsx_files: spreadsheet id -> exported xlsx file, such spreadsheets are not downloaded
+    """
+    xlsx_files = xlsx_files or {}
+    if semester_options.core_courses_spreadsheet_id and params.care_about_core_courses:
+        core_courses_lessons = await get_all_core_courses_lessons(
+            CoreCoursesConfig(
+                targets=semester_options.core_courses_targets,
+                spreadsheet_id=semester_options.core_courses_spreadsheet_id,
+                semester_tag=CoreCoursesTag(alias="", type="", name=""),
+            ),
+            on_progress=on_progress,
+            xlsx_file=xlsx_files.get(semester_options.core_courses_spreadsheet_id),
+            engine=params.core_courses_engine,
+            reader=params.core_courses_reader,
+        )
+    else:
+        core_courses_lessons = []
+    logger.info(f"Found {len(core_courses_lessons)} core courses lessons")
+
+    if semester_options.electives_spreadsheet_id and params.care_about_electives:
+        electives_lessons = await get_all_electives_lessons(
+            ElectivesParserConfig(
+                targets=semester_options.electives_targets,
+                spreadsheet_id=semester_options.electives_spreadsheet_id,
+                semester_tag=ElectivesTag(alias="", type="", name=""),
+                electives=semester_options.electives,
+            ),
+            on_progress=on_progress,
+            xlsx_file=xlsx_files.get(semester_options.electives_spreadsheet_id),
+            reader=params.electives_reader,
+        )
+    else:
+        electives_lessons = []
+    logger.info(f"Found {len(electives_lessons)} electives lessons")
+
+    return core_courses_lessons + electives_lessons
+
+
+async def run_check_coalesced(options: OptionsData, params: CheckParameters, token: str) -> CheckResults:
+    """
+    Same as `run_check`, but identical concurrent checks (same options, parameters and token) share one computation.
+    Rooms and Outlook bookings are fetched with the token, so checks of different users are not shared.
+    """
+    key = (
+        hashlib.sha256(options.model_dump_json().encode()).hexdigest(),
+        params.model_dump_json(),
+        hashlib.sha256(token.encode()).hexdigest(),
+    )
+    return await check_single_flight.do(key, lambda: run_check(options, params, token))
+
+
+async def get_semester_lessons(semester_options: SemesterOptions) -> list[Lesson]:
+    """
+    Lessons of all spreadsheets of the semester, parsed again at most every `settings.collisions.lessons_ttl` seconds.
+    `lesson_index` is updated every time they are parsed.
+    """
+    key = hashlib.sha256(semester_options.model_dump_json().encode()).hexdigest()
+    return await lessons_single_flight.do(key, lambda: _load_semester_lessons(semester_options))
+
+
+async def _load_semester_lessons(semester_options: SemesterOptions) -> list[Lesson]:
+    lessons = await fetch_lessons(semester_options, CheckParameters())
+    lesson_index.update(lessons)
+    return lessons
+
+
+async def build_occupancy_index(semester_options: SemesterOptions, token: str) -> OccupancyIndex:
+    """
+    Build occupancy of rooms by lessons from all spreadsheets and by upcoming Outlook bookings.
+
+    Errors of fetching rooms or bookings are raised: an index without bookings would report booked rooms as free for
+    the whole `settings.collisions.occupancy_index_ttl`, while a failed build is not cached.
+    """
+    now = utcnow()
+    # rooms and bookings do not depend on lessons, they are fetched while spreadsheets are parsed
+    rooms_task = asyncio.create_task(booking_client.get_rooms(token))
+    bookings_task = asyncio.create_task(
+        booking_client.get_all_bookings(token, now, now + datetime.timedelta(days=OCCUPANCY_BOOKINGS_DAYS))
+    )
+    try:
+        await asyncio.sleep(0)
+        lessons = await get_semester_lessons(semester_options)
+        rooms = await rooms_task
+        bookings = await bookings_task
+    finally:
+        _discard_tasks(rooms_task, bookings_task)
+    logger.info(
+        f"Building occupancy index of {len(rooms)} rooms from {len(lessons)} lessons and {len(bookings)} bookings"
+    )
+    return OccupancyIndex.build(lessons, rooms, bookings)
+
+
+async def get_occupancy_index(semester_options: SemesterOptions, token: str) -> OccupancyIndex:
+    """
+    Occupancy index for the semester options, rebuilt at most every `settings.collisions.occupancy_index_ttl` seconds.
+    Rooms and bookings are fetched with the token of the user, so indexes are not shared between users.
+    """
+    key = (
+        hashlib.sha256(semester_options.model_dump_json().encode()).hexdigest(),
+        hashlib.sha256(token.encode()).hexdigest(),
+    )
+    return await occupancy_single_flight.do(key, lambda: build_occupancy_index(semester_options, token))
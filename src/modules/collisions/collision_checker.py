@@ -1,19 +1,26 @@
+import asyncio
 import datetime
+import time
 from collections import defaultdict
-from collections.abc import Generator
+from collections.abc import Generator, Sequence
 from enum import Enum
 
+from src.core_courses.config import DateRangeResolver
 from src.core_courses.config import Target as CoreCourseTarget
 from src.custom_pydantic import CustomModel
 from src.electives.config import Target as ElectiveTarget
 from src.logging_ import logger
+from src.metrics import collisions_check_duration, collisions_issues
 from src.modules.bookings.client import BookingDTO, RoomDTO, booking_client
 from src.modules.collisions.schemas import (
     CapacityIssue,
+    CheckPhaseEnum,
+    CheckProgress,
     CollisionTypeEnum,
     Issue,
     Lesson,
     OutlookIssue,
+    ProgressCallback,
     RoomIssue,
     TeacherIssue,
 )
@@ -21,6 +28,8 @@ from src.modules.options.repository import Teacher, VerySameLessonId
 from src.utcnow import utcnow
 
 from .graph import UndirectedGraph
+from .occupancy import lesson_weekdays, slot_mask
+from .parallel import checks_pool
 
 
 class Weekdays(Enum):
@@ -38,6 +47,49 @@ class Weekdays(Enum):
         return Weekdays[weekday.upper()].value
 
 
+OUTLOOK_TZ = datetime.timezone(datetime.timedelta(hours=3))
+
+
+def outlook_bookings_window(
+    targets: list[CoreCourseTarget | ElectiveTarget] | None = None,
+) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    Time range of Outlook bookings the Outlook check needs: dates of core courses targets (at least the next 30 days
+    from today), but not more than 61 days.
+    """
+    today = datetime.datetime.now(OUTLOOK_TZ).date()
+    targets_list = [t for t in (targets or []) if isinstance(t, CoreCourseTarget)]
+    if not targets_list:
+        min_needed_time = datetime.datetime.combine(today, datetime.time.min)
+        max_needed_time = datetime.datetime.combine(today + datetime.timedelta(days=30), datetime.time.max)
+    else:
+        all_start_dates = [target.start_date for target in targets_list]
+        all_end_dates = [target.end_date for target in targets_list]
+        min_start_date = min(*all_start_dates, today)
+        max_end_date = max(*all_end_dates, today + datetime.timedelta(days=30))
+        min_needed_time = datetime.datetime.combine(min_start_date, datetime.time.min)
+        max_needed_time = datetime.datetime.combine(max_end_date, datetime.time.max)
+    # Limit max_needed_time to 61 days from min_needed_time
+    max_needed_time = min(max_needed_time, min_needed_time + datetime.timedelta(days=61))
+    return min_needed_time, max_needed_time
+
+
+async def fetch_outlook_bookings(
+    token: str, targets: list[CoreCourseTarget | ElectiveTarget] | None = None
+) -> list[BookingDTO] | None:
+    """
+    Fetch Outlook bookings for the Outlook check, see `outlook_bookings_window`.
+
+    :return: bookings or None if they could not be fetched
+    """
+    start, end = outlook_bookings_window(targets)
+    try:
+        return await booking_client.get_all_bookings(token=token, start=start, end=end)
+    except Exception as e:
+        logger.warning(f"Error while fetching bookings: {e}", exc_info=True)
+        return None
+
+
 class CollisionChecker:
     def __init__(
         self,
@@ -45,11 +97,17 @@ class CollisionChecker:
         teachers: list[Teacher] | None = None,
         rooms: list[RoomDTO] | None = None,
         very_same_lessons: list[list[VerySameLessonId]] | None = None,
+        bookings: list[BookingDTO] | asyncio.Future[list[BookingDTO] | None] | None = None,
     ) -> None:
+        """
+        :param bookings: Outlook bookings to check lessons against, fetched from InNoHassle Booking if not given;
+            may be a task fetching them already (see `fetch_outlook_bookings`), then the Outlook check awaits it
+        """
         self.token = token
         self.teachers = teachers or []
         self.rooms = rooms or []
         self.very_same_lessons: list[list[VerySameLessonId]] = very_same_lessons or []
+        self.bookings = bookings
 
         # Map student_group -> teachers who are students in that group
         self.group_to_studying_teachers: dict[str, list[Teacher]] = defaultdict(list)
@@ -223,61 +281,66 @@ class CollisionChecker:
         return name
 
     def check_for_room_issue(self, lessons: list[Lesson]) -> list[RoomIssue]:
-        room_to_slots: dict[str, list[tuple[int, Lesson]]] = defaultdict(list)
+        # room -> weekday -> (index, lesson, bitmap of time slots), only lessons in the same room on the same weekday
+        # with overlapping bitmaps may collide, so most pairs are rejected by a bitwise AND
+        room_to_slots: dict[str, dict[int, list[tuple[int, Lesson, int]]]] = defaultdict(lambda: defaultdict(list))
 
         vertices_number = len(lessons)
         for i, slot in enumerate(lessons):
             if self.is_online_slot(slot) or slot.room is None:
                 continue
+            if slot.lesson_name == "Elective course on Physical Education":
+                logger.debug("Skip Physical Education")
+                continue
+            mask = slot_mask(slot.start_time, slot.end_time)
+            weekdays = lesson_weekdays(slot)
             for room in slot.room if isinstance(slot.room, tuple) else [slot.room]:
-                room_to_slots[room].append((i, slot))
+                for weekday in weekdays:
+                    room_to_slots[room][weekday].append((i, slot, mask))
 
         graph = UndirectedGraph(vertices_number)
         collision_room_map: dict[tuple[int, int], str] = {}
 
-        for room, room_lessons in room_to_slots.items():
-            room_lessons: list[tuple[int, Lesson]]
+        for room, weekday_to_lessons in room_to_slots.items():
             if self.is_online_slot(room):
                 logger.debug("No need to check room collision for online")
                 continue
 
-            if len(room_lessons) == 1:
-                logger.debug(f"Room {room} has only one lesson")
-                continue
-
-            for i, (ind1, lesson1) in enumerate(room_lessons):
-                if lesson1.lesson_name == "Elective course on Physical Education":
-                    logger.info("Skip Physical Education")
-                    continue
-                for j in range(i + 1, len(room_lessons)):
-                    ind2, lesson2 = room_lessons[j]
-                    if lesson2.lesson_name == "Elective course on Physical Education":
-                        logger.debug("Skip Physical Education")
+            colliding_pairs: set[tuple[int, int]] = set()
+            for room_lessons in weekday_to_lessons.values():
+                occupied = 0
+                for j, (ind2, lesson2, mask2) in enumerate(room_lessons):
+                    if not occupied & mask2:
+                        occupied |= mask2
                         continue
+                    occupied |= mask2
+                    for ind1, lesson1, mask1 in room_lessons[:j]:
+                        if not mask1 & mask2 or lesson1 is lesson2 or (ind1, ind2) in colliding_pairs:
+                            continue
 
-                    if lesson1 is lesson2:
-                        continue
+                        if self._is_same_logical_lesson(lesson1, lesson2):
+                            continue
 
-                    if self._is_same_logical_lesson(lesson1, lesson2):
-                        continue
+                        if self.check_two_timeslots_collisions_by_time(lesson1, lesson2):
+                            if self.are_very_same_lessons(lesson1, lesson2):
+                                continue
+                            colliding_pairs.add((ind1, ind2))
 
-                    if self.check_two_timeslots_collisions_by_time(lesson1, lesson2):
-                        if self.are_very_same_lessons(lesson1, lesson2):
-                            continue
-                        graph.add_edge(ind1, ind2)
-                        collision_room_map[(min(ind1, ind2), max(ind1, ind2))] = room
+            # edges are added in the order of lessons, so that issues list lessons in the same order
+            for ind1, ind2 in sorted(colliding_pairs):
+                graph.add_edge(ind1, ind2)
+                collision_room_map[(ind1, ind2)] = room
 
         connected_components = graph.get_connected_components()
-        collisions = graph.get_colliding_elements(lessons, connected_components)
+        collisions_indices = graph.get_colliding_elements(list(range(vertices_number)), connected_components)
         room_issues = []
 
-        for collision in collisions:
+        for collision_indices in collisions_indices:
+            collision = [lessons[i] for i in collision_indices]
             # Find all rooms that are involved in this collision
             conflicting_rooms = set()
-            for i, lesson1 in enumerate(collision):
-                for j, lesson2 in enumerate(collision[i + 1 :], i + 1):
-                    lesson1_idx = lessons.index(lesson1)
-                    lesson2_idx = lessons.index(lesson2)
+            for i, lesson1_idx in enumerate(collision_indices):
+                for lesson2_idx in collision_indices[i + 1 :]:
                     edge_key = (min(lesson1_idx, lesson2_idx), max(lesson1_idx, lesson2_idx))
                     if edge_key in collision_room_map:
                         conflicting_rooms.add(collision_room_map[edge_key])
@@ -385,37 +448,26 @@ class CollisionChecker:
             for n in range(days):
                 yield start_date + datetime.timedelta(n)
 
-        tz = datetime.timezone(datetime.timedelta(hours=3))
+        tz = OUTLOOK_TZ
         today = datetime.datetime.now(tz).date()
 
         if not lessons:
             return []
 
         targets_list = [t for t in (targets or []) if isinstance(t, CoreCourseTarget)]
-        targets_by_sheet: dict[str, CoreCourseTarget] = {target.sheet_name: target for target in targets_list}
-
-        if not targets_list:
-            min_needed_time = datetime.datetime.combine(today, datetime.time.min)
-            max_needed_time = datetime.datetime.combine(today + datetime.timedelta(days=30), datetime.time.max)
+        dates_by_sheet: dict[str, DateRangeResolver] = {
+            target.sheet_name: DateRangeResolver(target) for target in targets_list
+        }
+
+        if self.bookings is None:
+            fetched_bookings = await fetch_outlook_bookings(self.token, targets)
+        elif isinstance(self.bookings, asyncio.Future):
+            fetched_bookings = await self.bookings
         else:
-            all_start_dates = [target.start_date for target in targets_list]
-            all_end_dates = [target.end_date for target in targets_list]
-            min_start_date = min(*all_start_dates, today)
-            max_end_date = max(*all_end_dates, today + datetime.timedelta(days=30))
-            min_needed_time = datetime.datetime.combine(min_start_date, datetime.time.min)
-            max_needed_time = datetime.datetime.combine(max_end_date, datetime.time.max)
-        # Limit max_needed_time to 61 days from min_needed_time
-        max_needed_time = min(max_needed_time, min_needed_time + datetime.timedelta(days=61))
-
-        try:
-            all_bookings = await booking_client.get_all_bookings(
-                token=self.token,
-                start=min_needed_time,
-                end=max_needed_time,
-            )
-        except Exception as e:
-            logger.warning(f"Error while fetching bookings: {e}", exc_info=True)
+            fetched_bookings = self.bookings
+        if fetched_bookings is None:
             return []
+        all_bookings = fetched_bookings
 
         result = []
 
@@ -439,20 +491,9 @@ class CollisionChecker:
                 continue
 
             dates_to_check = []
-            target = targets_by_sheet.get(lesson.google_sheet_name)
-            if target:
-                starts = target.start_date
-                ends = target.end_date
-
-                for override in target.override:
-                    if lesson.group_name in override.groups or lesson.course_name in override.courses:
-                        starts = (
-                            override.start_date.date()
-                            if isinstance(override.start_date, datetime.datetime)
-                            else override.start_date
-                        )
-                        ends = override.end_date
-                        break
+            dates = dates_by_sheet.get(lesson.google_sheet_name)
+            if dates is not None:
+                starts, ends = dates.resolve(lesson.group_name, lesson.course_name)
             else:
                 starts = today
                 ends = today + datetime.timedelta(days=30)
@@ -565,26 +606,64 @@ class CollisionChecker:
         check_teacher_collisions: bool = True,
         check_space_collisions: bool = True,
         check_outlook_collisions: bool = True,
+        on_progress: ProgressCallback | None = None,
+        workers: int = 1,
     ) -> list[Issue]:
+        """
+        :param workers: number of room, teacher and capacity checks running at the same time (see `ChecksPool`),
+            1 = one after another in a thread
+        """
         logger.info(f"{len(lessons)} lessons")
         issues: list[Issue] = []
 
-        if check_room_collisions:
-            _ = self.check_for_room_issue(lessons)
-            logger.info(f"Found {len(_)} room issues")
-            issues.extend(_)
-        if check_teacher_collisions:
-            _ = self.check_for_teacher_issue(lessons)
-            logger.info(f"Found {len(_)} teacher issues")
-            issues.extend(_)
-        if check_space_collisions:
-            _ = self.check_for_capacity_issue(lessons)
-            logger.info(f"Found {len(_)} capacity issues")
-            issues.extend(_)
-        if check_outlook_collisions:
-            _ = await self.check_for_outlook_issue(lessons, targets=targets or [])
-            logger.info(f"Found {len(_)} outlook issues")
-            issues.extend(_)
+        def found(collision_type: CollisionTypeEnum, found_issues: Sequence[Issue]) -> None:
+            collisions_issues.labels(collision_type).inc(len(found_issues))
+            logger.info(f"Found {len(found_issues)} {collision_type} issues")
+            issues.extend(found_issues)
+            if on_progress:
+                on_progress(CheckProgress(phase=CheckPhaseEnum.CHECK, step=collision_type, issues=list(found_issues)))
+
+        async def check_outlook() -> list[OutlookIssue]:
+            with collisions_check_duration.labels(CollisionTypeEnum.OUTLOOK).time():
+                return await self.check_for_outlook_issue(lessons, targets=targets or [])
+
+        cpu_checks = [
+            (collision_type, method)
+            for collision_type, method, enabled in [
+                (CollisionTypeEnum.ROOM, "check_for_room_issue", check_room_collisions),
+                (CollisionTypeEnum.TEACHER, "check_for_teacher_issue", check_teacher_collisions),
+                (CollisionTypeEnum.CAPACITY, "check_for_capacity_issue", check_space_collisions),
+            ]
+            if enabled
+        ]
+
+        # the Outlook check waits for bookings, meanwhile the other checks run in a thread or in worker processes, so
+        # the event loop is free; issues are still reported in the same order
+        outlook_task = asyncio.create_task(check_outlook()) if check_outlook_collisions else None
+        cpu_futures: list[asyncio.Future[list[Issue]]] = []
+        try:
+            if workers > 1 and len(cpu_checks) > 1:
+                started = time.perf_counter()
+                cpu_futures = await checks_pool.submit(self, lessons, [method for _, method in cpu_checks], workers)
+                for (collision_type, _), future in zip(cpu_checks, cpu_futures):
+                    # checks run at the same time, every one is timed from the start until it is done
+                    future.add_done_callback(
+                        lambda _, duration=collisions_check_duration.labels(collision_type): duration.observe(
+                            time.perf_counter() - started
+                        )
+                    )
+                for (collision_type, _), future in zip(cpu_checks, cpu_futures):
+                    found(collision_type, await future)
+            else:
+                for collision_type, method in cpu_checks:
+                    with collisions_check_duration.labels(collision_type).time():
+                        found(collision_type, await asyncio.to_thread(getattr(self, method), lessons))
+            if outlook_task is not None:
+                found(CollisionTypeEnum.OUTLOOK, await outlook_task)
+        finally:
+            for future in [outlook_task, *cpu_futures]:
+                if future is not None and not future.done():
+                    future.cancel()
 
         logger.info(f"Found {len(issues)} issues")
         return issues
@@ -1,103 +1,155 @@
 import datetime
+import io
+import time
 from collections import defaultdict
-from collections.abc import Generator
+from collections.abc import AsyncGenerator
 
-import pandas as pd
 from openpyxl.utils import coordinate_to_tuple, get_column_letter
 
-from src.core_courses.cell_to_event import CoreCourseEvent, convert_cell_to_event
-from src.core_courses.config import CoreCoursesConfig, Target
+from src.config import settings
+from src.core_courses.cell_to_event import (
+    ColumnHeader,
+    CoreCourseEvent,
+    EventFieldsMemo,
+    convert_cell_to_event,
+    get_column_header,
+)
+from src.core_courses.config import CoreCoursesConfig, CoreCoursesEngine, DateRangeResolver, Target
 from src.core_courses.location_parser import Item
-from src.core_courses.parser import CoreCourseCell, CoreCoursesParser
+from src.core_courses.parser import CoreCoursesParser
 from src.logging_ import logger
-from src.utils import WEEKDAYS, fetch_xlsx_spreadsheet, get_sheet_gids, nearest_weekday, sanitize_sheet_name
-
-from .schemas import Lesson
+from src.metrics import sheet_lessons, sheet_parse_duration, spreadsheet_download_duration, spreadsheet_download_size
+from src.utils import (
+    WEEKDAYS,
+    XlsxReaderName,
+    fetch_xlsx_spreadsheet,
+    get_sheet_gids,
+    nearest_weekday,
+    sanitize_sheet_name,
+)
+
+from .schemas import CheckPhaseEnum, CheckProgress, Lesson, ProgressCallback
+
+
+async def get_all_core_courses_lessons(
+    parser_config: CoreCoursesConfig,
+    on_progress: ProgressCallback | None = None,
+    xlsx_file: io.BytesIO | None = None,
+    engine: CoreCoursesEngine = "pandas",
+    reader: XlsxReaderName = "openpyxl",
+) -> list[Lesson]:
+    all_lessons = [
+        lesson
+        async for _, lessons in iter_core_courses_lessons(parser_config, on_progress, xlsx_file, engine, reader)
+        for lesson in lessons
+    ]
+    all_lessons.sort(key=_sort_key)
+    return all_lessons
 
 
-def use(
-    processed_column: pd.Series,
-    target: Target,
-) -> Generator[CoreCourseEvent]:
+async def iter_core_courses_lessons(
+    parser_config: CoreCoursesConfig,
+    on_progress: ProgressCallback | None = None,
+    xlsx_file: io.BytesIO | None = None,
+    engine: CoreCoursesEngine = "pandas",
+    reader: XlsxReaderName = "openpyxl",
+) -> AsyncGenerator[tuple[Target, list[Lesson]]]:
     """
-    Generate events from processed cells
+    Parse core courses sheet by sheet
 
-    :param processed_column: series with processed cells (CoreCourseCell),
-        multiindex with (weekday, timeslot) and (course, group) as name
-    :param target: target to generate events for (needed for start and end dates)
-    :return: generator of events
+    :param xlsx_file: the spreadsheet exported already (e.g. a local file), then nothing is downloaded and sheet gids
+        are unknown (empty)
+    :param engine: how sheets are read, lessons are the same
+    :param reader: reader of the xlsx file for the grid engine, lessons are the same
+    :return: generator of (target, lessons of the target sheet sorted by course, group and time)
     """
-    # -------- Iterate over processed cells --------
-    (course, group) = processed_column.name
-    course: str
-    group: str
-
-    for (weekday, timeslot), cell in processed_column.items():
-        cell: CoreCourseCell | None
-        if cell is None:
-            continue
-        weekday: str
-        timeslot: tuple[datetime.time, datetime.time]
-
-        event = convert_cell_to_event(
-            cell=cell,
-            weekday=weekday,
-            timeslot=timeslot,
-            course=course,
-            group=group,
-            target=target,
-        )
-
-        if event is None:
-            continue
-
-        yield event
-
-
-async def get_all_core_courses_lessons(parser_config: CoreCoursesConfig) -> list[Lesson]:
     parser = CoreCoursesParser()
-    xlsx_file = await fetch_xlsx_spreadsheet(spreadsheet_id=parser_config.spreadsheet_id)
     original_target_sheet_names = [target.sheet_name for target in parser_config.targets]
-    sheet_gids = await get_sheet_gids(parser_config.spreadsheet_id)
-    pipeline_result = list(
-        parser.pipeline(xlsx_file, original_target_sheet_names, sheet_gids, parser_config.spreadsheet_id)
-    )
-    dfs_merged_ranges = parser.last_dfs_merged_ranges
-    assert dfs_merged_ranges is not None
+    if xlsx_file is None:
+        with spreadsheet_download_duration.labels("core_courses").time():
+            xlsx_file = await fetch_xlsx_spreadsheet(spreadsheet_id=parser_config.spreadsheet_id)
+        spreadsheet_download_size.labels("core_courses").observe(xlsx_file.getbuffer().nbytes)
+        sheet_gids = await get_sheet_gids(parser_config.spreadsheet_id)
+    else:
+        sheet_gids = dict.fromkeys(original_target_sheet_names, "")
+    if on_progress:
+        on_progress(CheckProgress(phase=CheckPhaseEnum.DOWNLOAD, step="core_courses"))
+    if settings.parsing.core_courses_workers > 1:
+        pipeline = parser.pipeline_parallel(
+            xlsx_file,
+            original_target_sheet_names,
+            sheet_gids,
+            parser_config.spreadsheet_id,
+            max_workers=settings.parsing.core_courses_workers,
+            as_cells=True,
+            engine=engine,
+            reader=reader,
+        )
+    else:
+        pipeline = parser.pipeline(
+            xlsx_file,
+            original_target_sheet_names,
+            sheet_gids,
+            parser_config.spreadsheet_id,
+            as_cells=True,
+            engine=engine,
+            reader=reader,
+        )
 
-    all_lessons: list[Lesson] = []
-    for target, grouped_dfs_with_cells_list in zip(parser_config.targets, pipeline_result):
+    # the same cell values repeat across groups and sheets
+    memo = EventFieldsMemo()
+    # the pipeline parses a sheet when the next one is requested, so time is measured from resumption
+    sheet_started = time.perf_counter()
+    for target, cells in zip(parser_config.targets, pipeline):
+        memo_hits, memo_misses = memo.hits, memo.misses
+        # merged ranges of the sheet are known once the pipeline yields it
+        dfs_merged_ranges = parser.last_dfs_merged_ranges
+        assert dfs_merged_ranges is not None
         merged_ranges = dfs_merged_ranges.get(sanitize_sheet_name(target.sheet_name))
 
         # merge range index -> list of events
         merged_registry_for_events: dict[int, list[CoreCourseEvent]] = defaultdict(list)
         non_merged_events: list[CoreCourseEvent] = []
-
-        for grouped_dfs_with_cells in grouped_dfs_with_cells_list:
-            series_with_generators = grouped_dfs_with_cells.apply(use, target=target)
-            for generator in series_with_generators:
-                generator: Generator[CoreCourseEvent]
-
-                for cell_event in generator:
-                    if cell_event.subject in parser_config.ignored_subjects:
-                        logger.debug(f"> Ignoring {cell_event.subject}")
-                        continue
-
-                    if merged_ranges:
-                        if not cell_event.a1:
-                            non_merged_events.append(cell_event)
-                            continue
-                        cell_row, cell_col = coordinate_to_tuple(cell_event.a1)
-                        cell_row -= 1
-                        cell_col -= 1
-                        for i, (min_row, min_col, max_row, max_col) in enumerate(merged_ranges):
-                            if (min_row <= cell_row <= max_row) and (min_col <= cell_col <= max_col):
-                                merged_registry_for_events[i].append(cell_event)
-                                break
-                        else:
-                            non_merged_events.append(cell_event)
-                    else:
-                        non_merged_events.append(cell_event)
+        # (course, group) column -> its normalized group and dates, shared by all cells of the column
+        dates = DateRangeResolver(target)
+        headers: dict[tuple[str, str], ColumnHeader] = {}
+
+        for course, group, weekday, timeslot, cell in cells:
+            header = headers.get((course, group))
+            if header is None:
+                header = headers[(course, group)] = get_column_header(course, group, dates)
+            cell_event = convert_cell_to_event(
+                cell=cell,
+                weekday=weekday,
+                timeslot=timeslot,
+                course=course,
+                group=group,
+                target=target,
+                header=header,
+                memo=memo,
+            )
+            if cell_event is None:
+                continue
+
+            if cell_event.subject in parser_config.ignored_subjects:
+                logger.debug(f"> Ignoring {cell_event.subject}")
+                continue
+
+            if merged_ranges:
+                if not cell_event.a1:
+                    non_merged_events.append(cell_event)
+                    continue
+                cell_row, cell_col = coordinate_to_tuple(cell_event.a1)
+                cell_row -= 1
+                cell_col -= 1
+                for i, (min_row, min_col, max_row, max_col) in enumerate(merged_ranges):
+                    if (min_row <= cell_row <= max_row) and (min_col <= cell_col <= max_col):
+                        merged_registry_for_events[i].append(cell_event)
+                        break
+                else:
+                    non_merged_events.append(cell_event)
+            else:
+                non_merged_events.append(cell_event)
 
         lessons_from_non_merged: list[Lesson] = []
         for cell_event in non_merged_events:
@@ -159,20 +211,32 @@ async def get_all_core_courses_lessons(parser_config: CoreCoursesConfig) -> list
         logger.info(
             f"For {target.sheet_name} found {len(lessons_from_non_merged)} non-merged lessons and {len(lessons_from_merged)} merged (same a1 range) lessons, totaling {len(lessons_from_merged + lessons_from_non_merged)} lessons"
         )
+        memo_hits, memo_misses = memo.hits - memo_hits, memo.misses - memo_misses
+        if memo_hits + memo_misses:
+            logger.info(
+                f"Event fields memo for {target.sheet_name}: {memo_hits} hits, {memo_misses} misses "
+                f"({memo_hits / (memo_hits + memo_misses):.0%} hit rate)"
+            )
         merged_lessons = merge_identical_lessons(lessons_from_merged + lessons_from_non_merged)
         logger.info(f"After merging identical lessons, for {target.sheet_name} found {len(merged_lessons)} lessons")
-        all_lessons.extend(merged_lessons)
+        if on_progress:
+            on_progress(
+                CheckProgress(phase=CheckPhaseEnum.PARSE, step=target.sheet_name, lessons_count=len(merged_lessons))
+            )
+        merged_lessons.sort(key=_sort_key)
+        sheet_parse_duration.labels("core_courses").observe(time.perf_counter() - sheet_started)
+        sheet_lessons.labels("core_courses").observe(len(merged_lessons))
+        yield target, merged_lessons
+        sheet_started = time.perf_counter()
 
-    def _sort_key(x: Lesson):
-        group = x.group_name
-        if group is None:
-            group = ()
-        elif isinstance(group, str):
-            group = (group,)
-        return (x.course_name or "", group, x.weekday or "", x.start_time)
 
-    all_lessons.sort(key=_sort_key)
-    return all_lessons
+def _sort_key(x: Lesson):
+    group = x.group_name
+    if group is None:
+        group = ()
+    elif isinstance(group, str):
+        group = (group,)
+    return (x.course_name or "", group, x.weekday or "", x.start_time)
 
 
 def _event_to_lesson(
@@ -215,18 +279,12 @@ def _process_location_item(
     assert location_item is not None
     starts = location_item.starts_from or target.start_date
 
-    def convert_weeks_on_to_only_on(item: Item):
-        if item.on_weeks:
-            on = []
-            for week in item.on_weeks:
-                on_date = nearest_weekday(starts, cell_event.weekday) + datetime.timedelta(weeks=week - 1)
-                on.append(on_date)
-            if item.on:
-                item.on.extend(on)
-            elif on:
-                item.on = on
-        if item.on:
-            item.on = sorted(set(item.on))
+    def convert_weeks_on_to_only_on(item: Item) -> list[datetime.date] | None:
+        # the item is not modified, it may be shared by events of the same cell value (see `EventFieldsMemo`)
+        on = list(item.on or [])
+        for week in item.on_weeks or []:
+            on.append(nearest_weekday(starts, cell_event.weekday) + datetime.timedelta(weeks=week - 1))
+        return sorted(set(on)) if on else item.on
 
     lesson_start_time = cell_event.start_time
     lesson_end_time = cell_event.end_time
@@ -240,8 +298,6 @@ def _process_location_item(
     if location_item.till:
         lesson_end_time = location_item.till
 
-    convert_weeks_on_to_only_on(location_item)
-
     main_lesson = Lesson(
         lesson_name=cell_event.subject,
         lesson_class_type=cell_event.class_type,
@@ -252,7 +308,7 @@ def _process_location_item(
         group_name=group_name if group_name is not None else cell_event.group,
         teacher=cell_event.teacher,
         room=location_item.location or cell_event.location,
-        date_on=location_item.on,
+        date_on=convert_weeks_on_to_only_on(location_item),
         date_except=location_item.except_,
         date_from=location_item.starts_from,
         students_number=students_number if students_number is not None else cell_event.group_student_number,
@@ -264,13 +320,12 @@ def _process_location_item(
 
     lessons: list[Lesson] = [main_lesson]
 
-    nested_on: list[Item] = []
+    nested_on: list[tuple[Item, list[datetime.date]]] = []
     extra_nested: list[Item] = []
     if location_item.NEST:
         for item in location_item.NEST:
-            convert_weeks_on_to_only_on(item)
-            if item.on:
-                nested_on.append(item)
+            if on := convert_weeks_on_to_only_on(item):
+                nested_on.append((item, on))
             else:
                 logger.info(f"Root Item: {location_item}, {item}")
                 extra_nested.append(item)
@@ -278,13 +333,12 @@ def _process_location_item(
     if extra_nested:  # TODO: Handle '421 (316 FROM 31/10)' case
         logger.warning(f"Extra nested is not implemented yet\nItem({location_item})")
 
-    for item in nested_on:
-        assert item.on, f"Item {item} has no on"
+    for item, on in nested_on:
         if item.location:
-            main_lesson.date_except = (main_lesson.date_except or []) + item.on
+            main_lesson.date_except = (main_lesson.date_except or []) + on
 
         nested_lesson = main_lesson.model_copy()
-        nested_lesson.date_on = item.on
+        nested_lesson.date_on = on
         nested_lesson.room = item.location or main_lesson.room
         nested_lesson.start_time = item.starts_at or main_lesson.start_time
         nested_lesson.end_time = item.till or main_lesson.end_time
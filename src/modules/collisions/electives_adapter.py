@@ -1,45 +1,95 @@
+import io
+import time
+from collections.abc import AsyncGenerator
+
 from src.electives.cell_to_event import ElectiveEvent
-from src.electives.config import ElectivesParserConfig
+from src.electives.config import ElectivesParserConfig, ElectivesReader, Target
 from src.electives.parser import ElectiveParser
 from src.logging_ import logger
+from src.metrics import sheet_lessons, sheet_parse_duration, spreadsheet_download_duration, spreadsheet_download_size
 from src.utils import WEEKDAYS, fetch_xlsx_spreadsheet, get_sheet_gids
 
-from .schemas import Lesson
+from .schemas import CheckPhaseEnum, CheckProgress, Lesson, ProgressCallback
+
+
+async def get_all_electives_lessons(
+    parser_config: ElectivesParserConfig,
+    on_progress: ProgressCallback | None = None,
+    xlsx_file: io.BytesIO | None = None,
+    reader: ElectivesReader = "pandas",
+) -> list[Lesson]:
+    all_lessons = [
+        lesson
+        async for _, lessons in iter_electives_lessons(parser_config, on_progress, xlsx_file, reader)
+        for lesson in lessons
+    ]
+    all_lessons.sort(key=_sort_key)
+    return all_lessons
 
 
-async def get_all_electives_lessons(parser_config: ElectivesParserConfig) -> list[Lesson]:
+async def iter_electives_lessons(
+    parser_config: ElectivesParserConfig,
+    on_progress: ProgressCallback | None = None,
+    xlsx_file: io.BytesIO | None = None,
+    reader: ElectivesReader = "pandas",
+) -> AsyncGenerator[tuple[Target, list[Lesson]]]:
+    """
+    Parse electives sheet by sheet
+
+    :param xlsx_file: the spreadsheet exported already (e.g. a local file), then nothing is downloaded and sheet gids
+        are unknown (empty)
+    :param reader: how sheets are read, lessons are the same
+    :return: generator of (target, lessons of the target sheet sorted by course, group and time)
+    """
     parser = ElectiveParser()
-    xlsx_file = await fetch_xlsx_spreadsheet(spreadsheet_id=parser_config.spreadsheet_id)
     original_target_sheet_names = [target.sheet_name for target in parser_config.targets]
-    sheet_gids = await get_sheet_gids(parser_config.spreadsheet_id)
-    pipeline_result = list(
-        parser.pipeline(
-            xlsx_file, original_target_sheet_names, parser_config.electives, sheet_gids, parser_config.spreadsheet_id
-        )
+    if xlsx_file is None:
+        with spreadsheet_download_duration.labels("electives").time():
+            xlsx_file = await fetch_xlsx_spreadsheet(spreadsheet_id=parser_config.spreadsheet_id)
+        spreadsheet_download_size.labels("electives").observe(xlsx_file.getbuffer().nbytes)
+        sheet_gids = await get_sheet_gids(parser_config.spreadsheet_id)
+    else:
+        sheet_gids = dict.fromkeys(original_target_sheet_names, "")
+    if on_progress:
+        on_progress(CheckProgress(phase=CheckPhaseEnum.DOWNLOAD, step="electives"))
+    pipeline = parser.pipeline(
+        xlsx_file,
+        original_target_sheet_names,
+        parser_config.electives,
+        sheet_gids,
+        parser_config.spreadsheet_id,
+        reader=reader,
     )
 
-    all_lessons: list[Lesson] = []
-    for target, separations_list in zip(parser_config.targets, pipeline_result):
+    # the pipeline parses a sheet when the next one is requested, so time is measured from resumption
+    sheet_started = time.perf_counter()
+    for target, separations_list in zip(parser_config.targets, pipeline):
+        lessons: list[Lesson] = []
         for separation in separations_list:
             for event in separation.events:
                 lesson = _event_to_lesson(event)
                 if lesson:
-                    all_lessons.append(lesson)
+                    lessons.append(lesson)
 
         logger.info(
             f"For {target.sheet_name} found {len([s for s in separations_list for _ in s.events])} elective events"
         )
+        if on_progress:
+            on_progress(CheckProgress(phase=CheckPhaseEnum.PARSE, step=target.sheet_name, lessons_count=len(lessons)))
+        lessons.sort(key=_sort_key)
+        sheet_parse_duration.labels("electives").observe(time.perf_counter() - sheet_started)
+        sheet_lessons.labels("electives").observe(len(lessons))
+        yield target, lessons
+        sheet_started = time.perf_counter()
 
-    def _sort_key(x: Lesson):
-        group = x.group_name
-        if group is None:
-            group = ()
-        elif isinstance(group, str):
-            group = (group,)
-        return (x.course_name or "", group, x.weekday or "", x.start_time)
 
-    all_lessons.sort(key=_sort_key)
-    return all_lessons
+def _sort_key(x: Lesson):
+    group = x.group_name
+    if group is None:
+        group = ()
+    elif isinstance(group, str):
+        group = (group,)
+    return (x.course_name or "", group, x.weekday or "", x.start_time)
 
 
 def _event_to_lesson(event: ElectiveEvent) -> Lesson | None:
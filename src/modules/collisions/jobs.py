@@ -0,0 +1,173 @@
+import asyncio
+import uuid
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass, field
+
+from src.config import settings
+from src.custom_pydantic import CustomModel
+from src.logging_ import logger
+from src.metrics import Gauge, registry
+from src.modules.collisions.check import run_check
+from src.modules.collisions.schemas import CheckJob, CheckJobStatusEnum, CheckParameters, CheckProgress
+from src.modules.options.repository import OptionsData
+from src.utcnow import utcnow
+
+FINISHED_STATUSES = (CheckJobStatusEnum.DONE, CheckJobStatusEnum.FAILED)
+
+
+class JobQueueFullError(Exception):
+    """Too many jobs are waiting already"""
+
+
+@dataclass
+class _JobState:
+    job: CheckJob
+    owner_id: str
+    options: OptionsData
+    token: str
+    events: list[tuple[str, CustomModel]] = field(default_factory=list)
+    "History of (event name, payload) to replay for late subscribers"
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+    "Set (and replaced) when a new event is published"
+
+
+class CheckJobManager:
+    """
+    Runs collisions checks in background on a bounded queue.
+
+    Workers take jobs one by one; each check runs in a separate thread with its own event loop, so that parsing of
+    spreadsheets does not block the API. Progress is posted back to the API event loop and kept in the job history.
+    """
+
+    def __init__(self, workers: int, max_queued: int, keep_finished: int) -> None:
+        self.workers = workers
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self._jobs: dict[str, _JobState] = {}
+        self._queue: asyncio.Queue[_JobState] | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _ensure_workers(self) -> asyncio.Queue[_JobState]:
+        # workers are started on first use, in the running event loop
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self._queue
+
+    def submit(self, owner_id: str, options: OptionsData, params: CheckParameters, token: str) -> CheckJob:
+        queue = self._ensure_workers()
+        if queue.full():
+            raise JobQueueFullError(f"{queue.qsize()} collisions checks are waiting already")
+        job = CheckJob(id=uuid.uuid4().hex, status=CheckJobStatusEnum.QUEUED, params=params, created_at=utcnow())
+        state = _JobState(job=job, owner_id=owner_id, options=options, token=token)
+        self._jobs[job.id] = state
+        self._publish(state, "status", job.model_copy())
+        queue.put_nowait(state)
+        logger.info(f"Collisions check job {job.id} is queued ({queue.qsize()} in queue)")
+        return job
+
+    def get(self, job_id: str, owner_id: str) -> CheckJob | None:
+        state = self._jobs.get(job_id)
+        if state is None or state.owner_id != owner_id:
+            return None
+        return state.job
+
+    async def events(self, job_id: str) -> AsyncGenerator[tuple[int, str, CustomModel]]:
+        """
+        Replay history of the job events and then follow new ones until the job is finished. Nothing is generated if
+        the job is not found, e.g. it was evicted after the route had found it.
+
+        :return: generator of (event index, event name, payload)
+        """
+        state = self._jobs.get(job_id)
+        if state is None:
+            return
+        i = 0
+        while True:
+            changed = state.changed
+            while i < len(state.events):
+                event, payload = state.events[i]
+                yield i, event, payload
+                i += 1
+            if state.job.status in FINISHED_STATUSES:
+                return
+            await changed.wait()
+
+    def _publish(self, state: _JobState, event: str, payload: CustomModel) -> None:
+        state.events.append((event, payload))
+        state.changed.set()
+        state.changed = asyncio.Event()
+
+    def _on_progress(self, state: _JobState, progress: CheckProgress) -> None:
+        state.job.last_progress = progress
+        self._publish(state, "progress", progress)
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            state = await queue.get()
+            try:
+                await self._run(state)
+            finally:
+                queue.task_done()
+                self._evict_finished()
+
+    async def _run(self, state: _JobState) -> None:
+        job = state.job
+        loop = asyncio.get_running_loop()
+        job.status = CheckJobStatusEnum.RUNNING
+        job.started_at = utcnow()
+        self._publish(state, "status", job.model_copy())
+        logger.info(f"Collisions check job {job.id} is started")
+
+        def on_progress(progress: CheckProgress) -> None:
+            # called from the check thread
+            loop.call_soon_threadsafe(self._on_progress, state, progress)
+
+        try:
+            result = await asyncio.to_thread(
+                asyncio.run, run_check(state.options, job.params, state.token, on_progress=on_progress)
+            )
+        except Exception as e:
+            logger.error(f"Collisions check job {job.id} failed", exc_info=True)
+            job.status = CheckJobStatusEnum.FAILED
+            job.error = str(e) or type(e).__name__
+        else:
+            job.status = CheckJobStatusEnum.DONE
+            job.result = result
+            logger.info(f"Collisions check job {job.id} is done: {len(result.issues)} issues")
+        job.finished_at = utcnow()
+        state.token = ""
+        self._publish(state, "status", job.model_copy(update={"result": None}))
+        if job.result is not None:
+            self._publish(state, "result", job.result)
+
+    def count_by_status(self) -> list[tuple[tuple[str], int]]:
+        counts = dict.fromkeys(CheckJobStatusEnum, 0)
+        for state in list(self._jobs.values()):
+            counts[state.job.status] += 1
+        return [((status,), count) for status, count in counts.items()]
+
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, state in self._jobs.items() if state.job.status in FINISHED_STATUSES]
+        for job_id in finished[: max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job_id]
+
+
+check_job_manager: CheckJobManager = CheckJobManager(
+    workers=settings.collisions.jobs_workers,
+    max_queued=settings.collisions.jobs_max_queued,
+    keep_finished=settings.collisions.jobs_keep_finished,
+)
+registry.register(
+    Gauge(
+        "collisions_check_jobs",
+        "Collisions check jobs kept in memory, by status",
+        ("status",),
+        check_job_manager.count_by_status,
+    )
+)
@@ -0,0 +1,175 @@
+"""
+Occupancy of rooms as bitmaps of 5-minute slots of a day.
+
+Every room has a bitmap per weekday for lessons happening every week and a bitmap per date for lessons on specific
+dates (`date_on`) and Outlook bookings. Weekly lessons with `date_from` or `date_except` are kept aside and layered over
+the weekday bitmap when a specific date is asked. A slot is occupied if a lesson starts, goes on or ends in it, so
+lessons touching at the boundary overlap, like in `CollisionChecker.check_times_intersect`.
+"""
+
+import datetime
+import functools
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Self
+
+from src.modules.bookings.client import BookingDTO, RoomDTO
+from src.modules.collisions.schemas import Lesson
+from src.utils import MOSCOW_TZ, WEEKDAYS
+
+SLOT_MINUTES = 5
+"Granularity of the bitmaps"
+NO_WEEKDAY = -1
+"Weekday of weekly lessons without a known weekday, they may only collide with each other"
+
+
+@functools.cache
+def slot_mask(start: datetime.time, end: datetime.time) -> int:
+    """
+    Bitmap of slots from the one containing `start` to the one containing `end` inclusive.
+    """
+    first = (start.hour * 60 + start.minute) // SLOT_MINUTES
+    last = (end.hour * 60 + end.minute) // SLOT_MINUTES
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def lesson_weekdays(lesson: Lesson) -> set[int]:
+    """
+    Weekdays (Monday is 0) on which the lesson may happen: weekdays of `date_on` or the weekday of a weekly lesson.
+    """
+    if lesson.date_on:
+        return {date.weekday() for date in lesson.date_on}
+    if lesson.weekday and lesson.weekday.upper() in WEEKDAYS:
+        return {WEEKDAYS.index(lesson.weekday.upper())}
+    return {NO_WEEKDAY}
+
+
+def lesson_rooms(lesson: Lesson) -> tuple[str, ...]:
+    """
+    Offline rooms of the lesson.
+    """
+    if lesson.room is None:
+        return ()
+    rooms = lesson.room if isinstance(lesson.room, tuple) else (lesson.room,)
+    return tuple(room for room in rooms if room.upper() not in ("ONLINE", "ОНЛАЙН"))
+
+
+class RoomOccupancy:
+    def __init__(self) -> None:
+        self.weekly = [0] * 7
+        "Weekday -> slots occupied every week"
+        self.conditional: list[list[tuple[int, datetime.date | None, frozenset[datetime.date]]]] = [
+            [] for _ in range(7)
+        ]
+        "Weekday -> (slots, date_from, date_except) of weekly lessons that skip some weeks"
+        self.dated: dict[datetime.date, int] = defaultdict(int)
+        "Date -> slots occupied by lessons on specific dates and bookings"
+        self.any_week = [0] * 7
+        "Weekday -> slots occupied by lessons at least on one week"
+
+    def add_lesson(self, lesson: Lesson) -> None:
+        mask = slot_mask(lesson.start_time, lesson.end_time)
+        if lesson.date_on:
+            for date in lesson.date_on:
+                self.dated[date] |= mask
+                self.any_week[date.weekday()] |= mask
+            return
+        for weekday in lesson_weekdays(lesson):
+            if weekday == NO_WEEKDAY:
+                continue
+            if lesson.date_from or lesson.date_except:
+                self.conditional[weekday].append((mask, lesson.date_from, frozenset(lesson.date_except or ())))
+            else:
+                self.weekly[weekday] |= mask
+            self.any_week[weekday] |= mask
+
+    def add_booking(self, booking: BookingDTO) -> None:
+        start = _as_moscow_time(booking.start_time)
+        end = _as_moscow_time(booking.end_time)
+        date = start.date()
+        while date <= end.date():
+            day_start = start.time() if date == start.date() else datetime.time.min
+            day_end = end.time() if date == end.date() else datetime.time.max
+            if day_start < day_end:
+                self.dated[date] |= slot_mask(day_start, day_end)
+            date += datetime.timedelta(days=1)
+
+    def on_date(self, date: datetime.date) -> int:
+        """
+        Slots occupied on the date.
+        """
+        weekday = date.weekday()
+        mask = self.weekly[weekday] | self.dated.get(date, 0)
+        for conditional_mask, date_from, date_except in self.conditional[weekday]:
+            if (date_from is None or date >= date_from) and date not in date_except:
+                mask |= conditional_mask
+        return mask
+
+
+class OccupancyIndex:
+    """
+    Occupancy of rooms built from parsed lessons and Outlook bookings.
+    """
+
+    def __init__(self, rooms: list[RoomDTO]) -> None:
+        self.rooms = {room.id: room for room in rooms}
+        self.occupancy: dict[str, RoomOccupancy] = defaultdict(RoomOccupancy)
+
+    @classmethod
+    def build(cls, lessons: Iterable[Lesson], rooms: list[RoomDTO], bookings: Iterable[BookingDTO] = ()) -> Self:
+        index = cls(rooms)
+        for lesson in lessons:
+            for room in lesson_rooms(lesson):
+                index.occupancy[room].add_lesson(lesson)
+        for booking in bookings:
+            index.occupancy[booking.room_id].add_booking(booking)
+        return index
+
+    def is_free(
+        self,
+        room_id: str,
+        start: datetime.time,
+        end: datetime.time,
+        weekday: int | None = None,
+        dates: Iterable[datetime.date] = (),
+    ) -> bool:
+        """
+        :param weekday: check the weekday of every week (lessons only, bookings are bound to dates)
+        :param dates: check the dates (lessons and bookings)
+        """
+        occupancy = self.occupancy.get(room_id)
+        if occupancy is None:
+            return True
+        mask = slot_mask(start, end)
+        if weekday is not None and occupancy.any_week[weekday] & mask:
+            return False
+        return not any(occupancy.on_date(date) & mask for date in dates)
+
+    def free_rooms(
+        self,
+        start: datetime.time,
+        end: datetime.time,
+        weekday: int | None = None,
+        dates: Iterable[datetime.date] = (),
+        min_capacity: int | None = None,
+    ) -> list[RoomDTO]:
+        """
+        Rooms free during the time, smallest first.
+
+        :param min_capacity: only rooms with known capacity of at least this number of people
+        """
+        dates = list(dates)
+        free = [
+            room
+            for room in self.rooms.values()
+            if (min_capacity is None or (room.capacity is not None and room.capacity >= min_capacity))
+            and self.is_free(room.id, start, end, weekday, dates)
+        ]
+        free.sort(key=lambda room: (room.capacity is None, room.capacity or 0, room.id))
+        return free
+
+
+def _as_moscow_time(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=MOSCOW_TZ)
+    return value.astimezone(MOSCOW_TZ)
@@ -0,0 +1,164 @@
+"""
+Room, teacher and capacity checks of `CollisionChecker` running at the same time.
+
+On free-threaded Python builds the checks run in a thread pool over the same lessons. With the GIL they run in a
+process pool: lessons and data of the checker are pickled once into a read-only snapshot which every worker unpickles,
+and issues are pickled back with lessons referenced by their positions in the snapshot, so that issues hold the original
+lesson objects, as if the checks ran in this process. Workers are started on first use and kept between checks; if a
+worker dies (e.g. killed for memory), the broken pool is replaced and the check is run once more.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import pickle
+import sys
+import threading
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING
+
+from src.logging_ import logger
+from src.modules.collisions.schemas import Issue, Lesson
+
+if TYPE_CHECKING:
+    from src.modules.collisions.collision_checker import CollisionChecker
+
+
+def free_threaded() -> bool:
+    """
+    Whether threads run Python code in parallel: the build is free-threaded and the GIL is not enabled at runtime.
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+class _LessonsPickler(pickle.Pickler):
+    """
+    Pickles lessons of the snapshot as their positions in it.
+    """
+
+    def __init__(self, file: io.BytesIO, lessons: list[Lesson]) -> None:
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.positions = {id(lesson): position for position, lesson in enumerate(lessons)}
+
+    def persistent_id(self, obj: object) -> int | None:
+        if isinstance(obj, Lesson):
+            return self.positions.get(id(obj))
+        return None
+
+
+class _LessonsUnpickler(pickle.Unpickler):
+    """
+    Replaces positions of lessons with the lessons themselves.
+    """
+
+    def __init__(self, file: io.BytesIO, lessons: list[Lesson]) -> None:
+        super().__init__(file)
+        self.lessons = lessons
+
+    def persistent_load(self, pid: int) -> Lesson:
+        return self.lessons[pid]
+
+
+def _run_check_in_worker(snapshot: bytes, method: str) -> bytes:
+    """
+    Run one check in a worker process of `ChecksPool`.
+
+    :param snapshot: pickled class of the checker, its teachers, rooms, very same lessons and lessons to check
+    :param method: name of the check method of the checker
+    :return: pickled issues referencing lessons by positions in the snapshot
+    """
+    checker_class, teachers, rooms, very_same_lessons, lessons = pickle.loads(snapshot)
+    checker = checker_class(token="", teachers=teachers, rooms=rooms, very_same_lessons=very_same_lessons)
+    issues = getattr(checker, method)(lessons)
+    file = io.BytesIO()
+    _LessonsPickler(file, lessons).dump(issues)
+    return file.getvalue()
+
+
+class ChecksPool:
+    """
+    Workers running CPU-bound checks of `CollisionChecker` at the same time.
+    """
+
+    def __init__(self) -> None:
+        self._executor: Executor | None = None
+        self._workers = 0
+        # background check jobs run in their own threads with their own event loops
+        self._lock = threading.Lock()
+
+    def executor(self, workers: int) -> Executor:
+        """
+        Thread pool on free-threaded builds, process pool otherwise; started again if the number of workers changes.
+        Checks already submitted to the previous pool are let to finish.
+        """
+        with self._lock:
+            if self._executor is None or self._workers != workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                if free_threaded():
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="collisions-check")
+                else:
+                    # forkserver: do not fork the API process with its event loop and threads
+                    mp_context = multiprocessing.get_context("forkserver")
+                    self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+                self._workers = workers
+            return self._executor
+
+    async def submit(
+        self, checker: "CollisionChecker", lessons: list[Lesson], methods: Sequence[str], workers: int
+    ) -> list[asyncio.Future[list[Issue]]]:
+        """
+        Start check methods of the checker at once. The snapshot for worker processes is pickled in a thread, so the
+        event loop is not blocked on large semesters.
+
+        :return: issues of every check in the order of `methods`
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor(workers)
+        if isinstance(executor, ThreadPoolExecutor):
+            return [loop.run_in_executor(executor, getattr(checker, method), lessons) for method in methods]
+
+        snapshot = await asyncio.to_thread(
+            pickle.dumps,
+            (type(checker), checker.teachers, checker.rooms, checker.very_same_lessons, lessons),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+
+        async def run(method: str) -> bytes:
+            executor = self.executor(workers)
+            try:
+                return await loop.run_in_executor(executor, _run_check_in_worker, snapshot, method)
+            except BrokenProcessPool:
+                self._discard(executor)
+                raise
+
+        async def issues(method: str) -> list[Issue]:
+            try:
+                result = await run(method)
+            except BrokenProcessPool:
+                logger.warning(f"Workers of collisions checks died, running {method} again in a new pool")
+                result = await run(method)
+            return _LessonsUnpickler(io.BytesIO(result), lessons).load()
+
+        return [asyncio.ensure_future(issues(method)) for method in methods]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _discard(self, executor: Executor) -> None:
+        """
+        Shut down a broken pool, unless another check has already replaced it.
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+checks_pool = ChecksPool()
@@ -1,94 +1,160 @@
-from fastapi import APIRouter
-
-from src.api.dependencies import VerifyTokenDep
-from src.core_courses.config import CoreCoursesConfig
-from src.core_courses.config import Tag as CoreCoursesTag
-from src.custom_pydantic import CustomModel
-from src.electives.config import ElectivesParserConfig
-from src.electives.config import Tag as ElectivesTag
+import datetime
+from collections.abc import AsyncIterable
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.sse import EventSourceResponse, ServerSentEvent
+
+from src.api.dependencies import ProfilingDep, VerifyTokenDep
 from src.logging_ import logger
-from src.modules.bookings.client import booking_client
-from src.modules.collisions.collision_checker import CollisionChecker
-from src.modules.collisions.core_courses_adapter import get_all_core_courses_lessons
-from src.modules.collisions.electives_adapter import get_all_electives_lessons
-from src.modules.collisions.schemas import CheckResults
+from src.modules.bookings.client import RoomDTO
+from src.modules.collisions.check import check_single_flight, get_occupancy_index, run_check_coalesced
+from src.modules.collisions.jobs import JobQueueFullError, check_job_manager
+from src.modules.collisions.schemas import CheckJob, CheckParameters, CheckResults, NormalizedCheckResults
+from src.modules.collisions.single_flight import SingleFlightStats
 from src.modules.options.repository import options_repository
+from src.utils import WEEKDAYS
 
 router = APIRouter(prefix="/collisions", tags=["Collisions"])
 
 
-class CheckParameters(CustomModel):
-    care_about_core_courses: bool = True
-    care_about_electives: bool = True
-
-    check_room_collisions: bool = True
-    check_teacher_collisions: bool = True
-    check_space_collisions: bool = True
-    check_outlook_collisions: bool = True
-
-
 @router.post(
     "/check",
+    dependencies=[ProfilingDep],
     responses={
         200: {"description": "Timetable collisions"},
         401: {"description": "Invalid token OR no credentials provided"},
     },
 )
-async def check_timetable_collisions(user_and_token: VerifyTokenDep, params: CheckParameters) -> CheckResults:
+async def check_timetable_collisions(
+    user_and_token: VerifyTokenDep,
+    params: CheckParameters,
+    output_format: Annotated[
+        Literal["nested", "normalized"],
+        Query(
+            alias="format",
+            description="`nested` - lessons are embedded into issues, `normalized` - lessons and bookings are sent "
+            "once in top-level lists, issues reference them by index",
+        ),
+    ] = "nested",
+) -> CheckResults | NormalizedCheckResults:
     logger.info(f"Checking timetable collisions with options: {params}")
     user, token = user_and_token
+    results = await run_check_coalesced(options_repository.get_all_options(), params, token)
+    if output_format == "normalized":
+        return NormalizedCheckResults.from_check_results(results)
+    return results
+
+
+@router.get(
+    "/check/stats",
+    responses={
+        200: {"description": "How often identical collisions checks were shared"},
+        401: {"description": "Invalid token OR no credentials provided"},
+    },
+)
+async def get_check_stats(user_and_token: VerifyTokenDep) -> SingleFlightStats:
+    return check_single_flight.stats()
+
+
+@router.post(
+    "/jobs",
+    status_code=202,
+    responses={
+        202: {"description": "Collisions check job is queued"},
+        401: {"description": "Invalid token OR no credentials provided"},
+        503: {"description": "Too many collisions checks are waiting already, retry later"},
+    },
+)
+async def submit_check_job(user_and_token: VerifyTokenDep, params: CheckParameters) -> CheckJob:
+    logger.info(f"Submitting timetable collisions check job with options: {params}")
+    user, token = user_and_token
+    try:
+        return check_job_manager.submit(user.innohassle_id, options_repository.get_all_options(), params, token)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+
+def get_own_check_job(job_id: str, user_and_token: VerifyTokenDep) -> CheckJob:
+    user, token = user_and_token
+    job = check_job_manager.get(job_id, user.innohassle_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+OwnCheckJobDep = Annotated[CheckJob, Depends(get_own_check_job)]
+
+
+@router.get(
+    "/jobs/{job_id}",
+    responses={
+        200: {"description": "Collisions check job status, with results when done"},
+        401: {"description": "Invalid token OR no credentials provided"},
+        404: {"description": "Job not found"},
+    },
+)
+async def get_check_job(job: OwnCheckJobDep) -> CheckJob:
+    return job
+
+
+@router.get(
+    "/jobs/{job_id}/events",
+    response_class=EventSourceResponse,
+    responses={
+        200: {
+            "description": "Server-Sent Events of the job: `status` (CheckJob without results), "
+            "`progress` (CheckProgress with issues found by a finished check), `result` (CheckResults)"
+        },
+        401: {"description": "Invalid token OR no credentials provided"},
+        404: {"description": "Job not found"},
+    },
+)
+async def stream_check_job_events(job: OwnCheckJobDep) -> AsyncIterable[ServerSentEvent]:
+    async for i, event, payload in check_job_manager.events(job.id):
+        yield ServerSentEvent(data=payload, event=event, id=str(i))
+
+
+@router.get(
+    "/free-rooms",
+    responses={
+        200: {"description": "Rooms free at the time, smallest first"},
+        401: {"description": "Invalid token OR no credentials provided"},
+        404: {"description": "Semester options are not set"},
+        422: {"description": "Invalid time, weekday or dates"},
+    },
+)
+async def find_free_rooms(
+    user_and_token: VerifyTokenDep,
+    start: Annotated[datetime.time, Query(description="Start of the time, e.g. `10:40`")],
+    end: Annotated[datetime.time, Query(description="End of the time, e.g. `12:10`")],
+    weekday: Annotated[
+        str | None,
+        Query(description="Weekday (e.g. `MONDAY`) to find rooms free every week: only lessons are considered"),
+    ] = None,
+    dates: Annotated[
+        list[datetime.date],
+        Query(description="Dates to find rooms free on all of them: lessons and Outlook bookings are considered"),
+    ] = [],
+    min_capacity: Annotated[
+        int | None, Query(ge=0, description="Only rooms for at least this number of people")
+    ] = None,
+) -> list[RoomDTO]:
+    user, token = user_and_token
+    if start >= end:
+        raise HTTPException(status_code=422, detail="Start has to be less than end")
+    if weekday is None and not dates:
+        raise HTTPException(status_code=422, detail="Weekday or dates are required")
+    weekday_index = None
+    if weekday is not None:
+        if weekday.upper() not in WEEKDAYS:
+            raise HTTPException(status_code=422, detail=f"Weekday must be one of {', '.join(WEEKDAYS)}")
+        weekday_index = WEEKDAYS.index(weekday.upper())
+        if any(date.weekday() != weekday_index for date in dates):
+            raise HTTPException(status_code=422, detail=f"Not all dates are {weekday.upper()}")
 
     semester_options = options_repository.get_semester()
-    if not semester_options or not semester_options.core_courses_spreadsheet_id:
-        raise ValueError("core_courses_spreadsheet_id must be set in semester options")
-    logger.info(f"Semester options: {semester_options}")
-
-    if semester_options.core_courses_spreadsheet_id and params.care_about_core_courses:
-        core_courses_lessons = await get_all_core_courses_lessons(
-            CoreCoursesConfig(
-                targets=semester_options.core_courses_targets,
-                spreadsheet_id=semester_options.core_courses_spreadsheet_id,
-                semester_tag=CoreCoursesTag(alias="", type="", name=""),
-            ),
-        )
-    else:
-        core_courses_lessons = []
-    logger.info(f"Found {len(core_courses_lessons)} core courses lessons")
-
-    if semester_options.electives_spreadsheet_id and params.care_about_electives:
-        electives_lessons = await get_all_electives_lessons(
-            ElectivesParserConfig(
-                targets=semester_options.electives_targets,
-                spreadsheet_id=semester_options.electives_spreadsheet_id,
-                semester_tag=ElectivesTag(alias="", type="", name=""),
-                electives=semester_options.electives,
-            ),
-        )
-    else:
-        electives_lessons = []
-    logger.info(f"Found {len(electives_lessons)} electives lessons")
-
-    teachers_data = options_repository.get_teachers()
-    if teachers_data is None:
-        teachers = []
-    else:
-        teachers = teachers_data.data
-    logger.info(f"Found {len(teachers)} teachers")
-
-    collisions_use_case = CollisionChecker(
-        token=token,
-        rooms=await booking_client.get_rooms(token),
-        teachers=teachers,
-        very_same_lessons=semester_options.very_same_lessons,
-    )
-
-    issues = await collisions_use_case.get_collisions(
-        core_courses_lessons + electives_lessons,
-        targets=[*semester_options.core_courses_targets, *semester_options.electives_targets],
-        check_room_collisions=params.check_room_collisions,
-        check_teacher_collisions=params.check_teacher_collisions,
-        check_space_collisions=params.check_space_collisions,
-        check_outlook_collisions=params.check_outlook_collisions,
-    )
-
-    return CheckResults(issues=issues)
+    if semester_options is None:
+        raise HTTPException(status_code=404, detail="Semester options are not set")
+    index = await get_occupancy_index(semester_options, token)
+    return index.free_rooms(start, end, weekday=weekday_index, dates=dates, min_capacity=min_capacity)
@@ -1,11 +1,15 @@
 import datetime
+from collections.abc import Callable
 from enum import StrEnum
 from typing import Annotated, Literal, Self
 
 from pydantic import Field, model_validator
 
+from src.core_courses.config import CoreCoursesEngine
 from src.custom_pydantic import CustomModel
+from src.electives.config import ElectivesReader
 from src.modules.bookings.client import BookingDTO
+from src.utils import XlsxReaderName
 
 
 class CollisionTypeEnum(StrEnum):
@@ -138,5 +142,222 @@ class TeacherIssue(CustomModel):
 type Issue = Annotated[CapacityIssue | RoomIssue | OutlookIssue | TeacherIssue, Field(discriminator="collision_type")]
 
 
+class CheckParameters(CustomModel):
+    care_about_core_courses: bool = True
+    care_about_electives: bool = True
+
+    check_room_collisions: bool = True
+    check_teacher_collisions: bool = True
+    check_space_collisions: bool = True
+    check_outlook_collisions: bool = True
+
+    core_courses_engine: CoreCoursesEngine = "pandas"
+    "How core courses sheets are read, lessons are the same"
+    core_courses_reader: XlsxReaderName = "openpyxl"
+    "Reader of xlsx files for the grid engine of core courses, the pandas engine reads sheets with pandas"
+    electives_reader: ElectivesReader = "pandas"
+    "How electives sheets are read, lessons are the same"
+
+
 class CheckResults(CustomModel):
     issues: list[Issue]
+
+
+class NormalizedCapacityIssue(CustomModel):
+    """
+    CapacityIssue referencing the lesson by index in `NormalizedCheckResults.lessons`.
+    """
+
+    collision_type: Literal[CollisionTypeEnum.CAPACITY]
+
+    room: str | tuple[str, ...]
+    "Room name"
+    room_capacity: int | None
+    "Assumed capacity of the room"
+    needed_capacity: int
+    "Needed capacity for the lesson (sum of all groups)"
+
+    lesson: int
+    "Index of the lesson"
+
+
+class NormalizedRoomIssue(CustomModel):
+    """
+    RoomIssue referencing lessons by index in `NormalizedCheckResults.lessons`.
+    """
+
+    collision_type: Literal[CollisionTypeEnum.ROOM]
+
+    room: str | tuple[str, ...]
+    "Room name"
+
+    lessons: list[int]
+    "Indexes of lessons in the room at the same time"
+
+
+class NormalizedOutlookIssue(CustomModel):
+    """
+    OutlookIssue referencing lessons and bookings by index in `NormalizedCheckResults.lessons` and `.bookings`.
+    """
+
+    collision_type: Literal[CollisionTypeEnum.OUTLOOK]
+
+    outlook_event_title: str
+    "Title of the Outlook event"
+
+    outlook_info: list[int]
+    "Indexes of the bookings in the same time"
+
+    lessons: list[int]
+    "Indexes of lessons that are in conflict with the Outlook event"
+
+
+class NormalizedTeacherIssue(CustomModel):
+    """
+    TeacherIssue referencing lessons by index in `NormalizedCheckResults.lessons`.
+    """
+
+    collision_type: Literal[CollisionTypeEnum.TEACHER]
+
+    teacher: str
+    "Teacher name"
+
+    teaching_lessons: list[int]
+    "Indexes of lessons of the teacher at the same time"
+    studying_lessons: list[int]
+    "Indexes of lessons of the teacher as a student at the same time"
+
+
+type NormalizedIssue = Annotated[
+    NormalizedCapacityIssue | NormalizedRoomIssue | NormalizedOutlookIssue | NormalizedTeacherIssue,
+    Field(discriminator="collision_type"),
+]
+
+
+class NormalizedCheckResults(CustomModel):
+    """
+    CheckResults where every lesson and booking is sent once, and issues reference them by index.
+    """
+
+    lessons: list[Lesson]
+    "All lessons mentioned in issues"
+    bookings: list[BookingDTO]
+    "All bookings mentioned in Outlook issues"
+    issues: list[NormalizedIssue]
+
+    @classmethod
+    def from_check_results(cls, results: CheckResults) -> Self:
+        lessons: list[Lesson] = []
+        bookings: list[BookingDTO] = []
+        # id(object) -> index, the same lesson and booking objects are shared between issues
+        lesson_indexes: dict[int, int] = {}
+        booking_indexes: dict[int, int] = {}
+
+        def lesson_index(lesson: Lesson) -> int:
+            if id(lesson) not in lesson_indexes:
+                lesson_indexes[id(lesson)] = len(lessons)
+                lessons.append(lesson)
+            return lesson_indexes[id(lesson)]
+
+        def booking_index(booking: BookingDTO) -> int:
+            if id(booking) not in booking_indexes:
+                booking_indexes[id(booking)] = len(bookings)
+                bookings.append(booking)
+            return booking_indexes[id(booking)]
+
+        issues: list[NormalizedIssue] = []
+        for issue in results.issues:
+            match issue:
+                case CapacityIssue():
+                    issues.append(
+                        NormalizedCapacityIssue(
+                            collision_type=issue.collision_type,
+                            room=issue.room,
+                            room_capacity=issue.room_capacity,
+                            needed_capacity=issue.needed_capacity,
+                            lesson=lesson_index(issue.lesson),
+                        )
+                    )
+                case RoomIssue():
+                    issues.append(
+                        NormalizedRoomIssue(
+                            collision_type=issue.collision_type,
+                            room=issue.room,
+                            lessons=[lesson_index(lesson) for lesson in issue.lessons],
+                        )
+                    )
+                case OutlookIssue():
+                    issues.append(
+                        NormalizedOutlookIssue(
+                            collision_type=issue.collision_type,
+                            outlook_event_title=issue.outlook_event_title,
+                            outlook_info=[booking_index(booking) for booking in issue.outlook_info],
+                            lessons=[lesson_index(lesson) for lesson in issue.lessons],
+                        )
+                    )
+                case TeacherIssue():
+                    issues.append(
+                        NormalizedTeacherIssue(
+                            collision_type=issue.collision_type,
+                            teacher=issue.teacher,
+                            teaching_lessons=[lesson_index(lesson) for lesson in issue.teaching_lessons],
+                            studying_lessons=[lesson_index(lesson) for lesson in issue.studying_lessons],
+                        )
+                    )
+        return cls(lessons=lessons, bookings=bookings, issues=issues)
+
+
+class CheckPhaseEnum(StrEnum):
+    DOWNLOAD = "download"
+    PARSE = "parse"
+    CHECK = "check"
+
+
+class CheckProgress(CustomModel):
+    """
+    Progress of a collisions check: emitted when a step of a phase is finished.
+    """
+
+    phase: CheckPhaseEnum
+    "Phase of the check"
+    step: str
+    "Finished step: spreadsheet (`core_courses`, `electives`), `rooms`, sheet name or collision type"
+    lessons_count: int | None = None
+    "Number of lessons parsed from the sheet (for parse phase)"
+    issues: list[Issue] | None = None
+    "Issues found on this step (for check phase)"
+
+
+type ProgressCallback = Callable[[CheckProgress], None]
+
+
+class CheckJobStatusEnum(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class CheckJob(CustomModel):
+    """
+    Collisions check running in background.
+    """
+
+    id: str
+    "Job ID"
+    status: CheckJobStatusEnum
+    "Job status"
+    params: CheckParameters
+    "Parameters of the check"
+    created_at: datetime.datetime
+    "When the job was submitted"
+    started_at: datetime.datetime | None = None
+    "When the check started"
+    finished_at: datetime.datetime | None = None
+    "When the check finished (successfully or not)"
+    last_progress: CheckProgress | None = None
+    "Last reported progress of the check"
+    result: CheckResults | None = None
+    "Results of the check (when done)"
+    error: str | None = None
+    "Error message (when failed)"
@@ -0,0 +1,75 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+
+from src.custom_pydantic import CustomModel
+from src.logging_ import logger
+from src.metrics import cache_lookups
+
+
+class SingleFlightStats(CustomModel):
+    calls: int = 0
+    "Total number of calls"
+    coalesced: int = 0
+    "Calls that joined an already running computation"
+    cache_hits: int = 0
+    "Calls served from recently computed results"
+    in_flight: int = 0
+    "Computations running right now"
+
+
+class SingleFlight[K: Hashable, V]:
+    """
+    Coalesce concurrent calls with the same key into a single computation.
+
+    The first call for a key starts the computation, calls with the same key arriving while it runs await the same
+    result. Results are kept for `ttl` seconds to also serve requests arriving right after completion.
+    Failed computations are not cached: every waiter gets the exception and the next call starts from scratch.
+    """
+
+    def __init__(self, name: str, ttl: float = 0.0) -> None:
+        self.name = name
+        self.ttl = ttl
+        self._in_flight: dict[K, asyncio.Task[V]] = {}
+        self._results: dict[K, tuple[float, V]] = {}
+        self._stats = SingleFlightStats()
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        loop = asyncio.get_running_loop()
+        self._stats.calls += 1
+        self._evict_expired(loop.time())
+
+        if key in self._results:
+            self._stats.cache_hits += 1
+            cache_lookups.labels(self.name, "hit").inc()
+            logger.info(f"{self.name}: served from result computed less than {self.ttl}s ago")
+            return self._results[key][1]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn))
+            # retrieve exception even if every waiter was cancelled, so it is not reported as unhandled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._in_flight[key] = task
+            cache_lookups.labels(self.name, "miss").inc()
+        else:
+            self._stats.coalesced += 1
+            cache_lookups.labels(self.name, "coalesced").inc()
+            logger.info(f"{self.name}: joined identical computation in flight")
+        # cancellation of one waiter (e.g. client disconnected) must not cancel the computation for the others
+        return await asyncio.shield(task)
+
+    async def _run(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        try:
+            value = await fn()
+            if self.ttl > 0:
+                self._results[key] = (asyncio.get_running_loop().time() + self.ttl, value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    def _evict_expired(self, now: float) -> None:
+        for key in [key for key, (expires_at, _) in self._results.items() if expires_at <= now]:
+            del self._results[key]
+
+    def stats(self) -> SingleFlightStats:
+        return self._stats.model_copy(update={"in_flight": len(self._in_flight)})
@@ -1,12 +1,20 @@
 # This file should be synced with:
 # https://github.com/one-zero-eight/accounts/blob/main/inh_accounts_sdk.py
+#
+# Intentional divergence from upstream, keep it when syncing: `InNoHassleAccounts` caches imported keys by kid and
+# verified tokens (`decode_token`), refreshes the key set in background (`refresh_key_set_periodically`,
+# `request_key_set_refresh`) and picks the key by the `kid` header of a token (`get_public_key`).
 
+import asyncio
 import datetime
+import hashlib
 import logging
+import time
+from collections import OrderedDict
 from typing import Any
 
 import httpx
-from joserfc import jwt
+from joserfc import jws, jwt
 from joserfc.errors import JoseError
 from joserfc.jwk import RSAKey
 from joserfc.jwt import JWTClaimsRegistry
@@ -54,6 +62,10 @@ class InNoHassleAccounts:
     api_jwt_token: str | None
     PUBLIC_KID = "public"
     key_set: dict[str, Any] | None = None
+    TOKEN_CACHE_SIZE = 1024
+    "Number of verified tokens to remember"
+    KEY_SET_REFRESH_COOLDOWN = 60
+    "Minimal seconds between key set refreshes triggered by tokens with unknown kid"
 
     def __init__(
         self,
@@ -66,17 +78,67 @@ class InNoHassleAccounts:
             logging.warning(
                 "API JWT token is not set, you will not be able to call service endpoints that require authorization"
             )
+        self._keys: dict[str, RSAKey] = {}
+        # sha256(token) -> (user data, expiration timestamp or None)
+        self._verified_tokens: OrderedDict[bytes, tuple[UserTokenData, float | None]] = OrderedDict()
+        self._key_set_refresh: asyncio.Task | None = None
+        self._key_set_refreshed_at = 0.0
 
     async def update_key_set(self):
-        self.key_set = await self.get_key_set()
+        key_set = await self.get_key_set()
+        keys = {
+            key["kid"]: RSAKey.import_key(key)
+            for key in key_set.get("keys", [])
+            if key.get("kid") and key.get("kty") == "RSA"
+        }
+        if keys != self._keys:
+            # tokens signed by removed keys must be verified again
+            self._verified_tokens.clear()
+        self.key_set, self._keys = key_set, keys
+        self._key_set_refreshed_at = time.monotonic()
+
+    async def refresh_key_set_periodically(self, interval: float) -> None:
+        """
+        Refresh key set every `interval` seconds, keeping the previous one if Accounts API is unavailable.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            await self._try_update_key_set()
+
+    async def _try_update_key_set(self) -> None:
+        # any error (Accounts API is unavailable, malformed JWKS) must not stop refreshing
+        try:
+            await self.update_key_set()
+        except Exception:
+            logging.warning("Failed to refresh JWKS, keeping the previous one", exc_info=True)
+
+    def request_key_set_refresh(self) -> None:
+        """
+        Refresh key set in background, unless it is being refreshed or was refreshed recently.
+        """
+        if self._key_set_refresh is not None and not self._key_set_refresh.done():
+            return
+        if time.monotonic() - self._key_set_refreshed_at < self.KEY_SET_REFRESH_COOLDOWN:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._key_set_refreshed_at = time.monotonic()
+        self._key_set_refresh = loop.create_task(self._try_update_key_set())
 
-    def get_public_key(self) -> RSAKey:
+    def get_public_key(self, kid: str | None = None) -> RSAKey:
         if self.key_set is None:
             raise RuntimeError("Key set should be initialized by `update_key_set`")
-        key_data = next((key for key in self.key_set.get("keys", []) if key.get("kid") == self.PUBLIC_KID), None)
-        if key_data is None:
+        if kid is not None and kid in self._keys:
+            return self._keys[kid]
+        if kid is not None:
+            logging.warning(f"Unknown kid={kid!r} in token, verifying with kid={self.PUBLIC_KID!r}")
+            self.request_key_set_refresh()
+        key = self._keys.get(self.PUBLIC_KID)
+        if key is None:
             raise RuntimeError(f"Public key with kid={self.PUBLIC_KID!r} is missing in JWKS")
-        return RSAKey.import_key(key_data)
+        return key
 
     async def get_key_set(self) -> dict[str, Any]:
         async with httpx.AsyncClient() as client:
@@ -88,7 +150,18 @@ class InNoHassleAccounts:
         """
         Decode generated by InnoHassle Accounts user JWT token and return user data.
         If token is invalid, return None.
+
+        Verified tokens are remembered until they expire, so reused tokens are not verified again.
         """
+        digest = hashlib.sha256(token.encode()).digest()
+        cached = self._verified_tokens.get(digest)
+        if cached is not None:
+            token_data, expires_at = cached
+            if expires_at is None or time.time() < expires_at:
+                self._verified_tokens.move_to_end(digest)
+                return token_data
+            del self._verified_tokens[digest]
+
         try:
             payload = self._get_jwt_claims(token)
             innohassle_id: str | None = payload.get("uid")
@@ -96,11 +169,16 @@ class InNoHassleAccounts:
             telegram_id: int | None = payload.get("telegram_id")
             if innohassle_id is None or email is None:
                 raise JoseError("Missing required claims: uid/email")
-            return UserTokenData(
+            token_data = UserTokenData(
                 innohassle_id=innohassle_id,
                 email=email,
                 telegram_id=telegram_id,
             )
+            exp = payload.get("exp")
+            self._verified_tokens[digest] = (token_data, float(exp) if exp is not None else None)
+            if len(self._verified_tokens) > self.TOKEN_CACHE_SIZE:
+                self._verified_tokens.popitem(last=False)
+            return token_data
         except JoseError:
             logging.warning("Invalid token", exc_info=True)
             return None
@@ -114,7 +192,10 @@ class InNoHassleAccounts:
         )
 
     def _get_jwt_claims(self, token: str) -> dict[str, Any]:
-        pub_key = self.get_public_key()
+        kid = jws.extract_compact(token.encode()).headers().get("kid")
+        if not isinstance(kid, str):
+            kid = None
+        pub_key = self.get_public_key(kid)
         payload = jwt.decode(token, pub_key)
         claims = payload.claims
         JWTClaimsRegistry().validate(claims)
@@ -0,0 +1,127 @@
+"""
+Secondary indexes over parsed lessons for queries by group, teacher, room, weekday and time.
+
+Lessons are indexed sheet by sheet: when lessons are parsed again, only sheets whose lessons have changed are indexed
+again, the others keep their indexes.
+"""
+
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+
+from src.modules.collisions.occupancy import lesson_rooms, lesson_weekdays
+from src.modules.collisions.schemas import Lesson
+from src.modules.lessons.schemas import LessonsQuery
+
+type SheetKey = tuple[str, str]
+"(spreadsheet id, sheet name)"
+
+
+def normalize(value: str) -> str:
+    """
+    Case-insensitive key with collapsed whitespace, so that "Ivan  Ivanov" and "ivan ivanov" match.
+    """
+    return " ".join(value.split()).casefold()
+
+
+def _lesson_groups(lesson: Lesson) -> tuple[str, ...]:
+    if lesson.group_name is None:
+        return ()
+    return lesson.group_name if isinstance(lesson.group_name, tuple) else (lesson.group_name,)
+
+
+class SheetIndex:
+    """
+    Indexes of lessons of one sheet: key -> positions of lessons in `lessons`.
+    """
+
+    def __init__(self, lessons: list[Lesson]) -> None:
+        self.lessons = lessons
+        self.by_group: dict[str, list[int]] = defaultdict(list)
+        self.by_teacher: dict[str, list[int]] = defaultdict(list)
+        self.by_room: dict[str, list[int]] = defaultdict(list)
+        self.by_weekday_hour: dict[tuple[int, int], list[int]] = defaultdict(list)
+        "(weekday, hour) -> lessons going on during the hour"
+        for position, lesson in enumerate(lessons):
+            for group in _lesson_groups(lesson):
+                self.by_group[normalize(group)].append(position)
+            if lesson.teacher:
+                self.by_teacher[normalize(lesson.teacher)].append(position)
+            for room in lesson_rooms(lesson):
+                self.by_room[normalize(room)].append(position)
+            for weekday in lesson_weekdays(lesson):
+                for hour in range(lesson.start_time.hour, lesson.end_time.hour + 1):
+                    self.by_weekday_hour[(weekday, hour)].append(position)
+
+    def query(self, query: LessonsQuery) -> Iterator[Lesson]:
+        candidates: set[int] | None = None
+
+        def narrow(positions: Iterable[int]) -> None:
+            nonlocal candidates
+            candidates = set(positions) if candidates is None else candidates.intersection(positions)
+
+        if query.group is not None:
+            narrow(self.by_group.get(normalize(query.group), ()))
+        if query.teacher is not None:
+            narrow(self.by_teacher.get(normalize(query.teacher), ()))
+        if query.room is not None:
+            narrow(self.by_room.get(normalize(query.room), ()))
+        if query.weekday is not None:
+            first_hour = query.start.hour if query.start else 0
+            last_hour = query.end.hour if query.end else 23
+            narrow(
+                position
+                for hour in range(first_hour, last_hour + 1)
+                for position in self.by_weekday_hour.get((query.weekday, hour), ())
+            )
+
+        positions = range(len(self.lessons)) if candidates is None else sorted(candidates)
+        for position in positions:
+            lesson = self.lessons[position]
+            if query.start is not None and lesson.end_time <= query.start:
+                continue
+            if query.end is not None and lesson.start_time >= query.end:
+                continue
+            yield lesson
+
+
+class LessonIndex:
+    """
+    Indexes of the latest parsed lessons of all sheets.
+    """
+
+    def __init__(self) -> None:
+        self.sheets: dict[SheetKey, SheetIndex] = {}
+        self.version = 0
+        "Incremented on every update that changed lessons of some sheet"
+
+    def update(self, lessons: Iterable[Lesson]) -> None:
+        """
+        Replace indexed lessons with the new ones. Sheets with the same lessons as before are not indexed again,
+        sheets without lessons are removed.
+        """
+        by_sheet: dict[SheetKey, list[Lesson]] = defaultdict(list)
+        for lesson in lessons:
+            by_sheet[(lesson.spreadsheet_id, lesson.google_sheet_name)].append(lesson)
+
+        sheets: dict[SheetKey, SheetIndex] = {}
+        changed = by_sheet.keys() != self.sheets.keys()
+        for key, sheet_lessons in by_sheet.items():
+            sheet_index = self.sheets.get(key)
+            if sheet_index is None or sheet_index.lessons != sheet_lessons:
+                sheet_index = SheetIndex(sheet_lessons)
+                changed = True
+            sheets[key] = sheet_index
+        if changed:
+            # replaced at once, so that queries running in between see either old or new lessons
+            self.sheets = sheets
+            self.version += 1
+
+    def query(self, query: LessonsQuery) -> Iterator[Lesson]:
+        """
+        Lessons matching all given filters, sheet by sheet in the order of parsing.
+        """
+        for sheet_index in self.sheets.values():
+            yield from sheet_index.query(query)
+
+
+lesson_index = LessonIndex()
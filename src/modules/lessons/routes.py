@@ -0,0 +1,52 @@
+import datetime
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query
+
+from src.api.dependencies import VerifyTokenDep
+from src.modules.collisions.check import get_semester_lessons
+from src.modules.lessons.index import lesson_index
+from src.modules.lessons.schemas import LessonsPage, LessonsQuery
+from src.modules.options.repository import options_repository
+from src.utils import WEEKDAYS
+
+router = APIRouter(prefix="/lessons", tags=["Lessons"])
+
+
+@router.get(
+    "/",
+    responses={
+        200: {"description": "Lessons of the semester matching all given filters"},
+        401: {"description": "Invalid token OR no credentials provided"},
+        404: {"description": "Semester options are not set"},
+        422: {"description": "Invalid weekday or time"},
+    },
+)
+async def query_lessons(
+    _user_and_token: VerifyTokenDep,
+    group: Annotated[str | None, Query(description="Group name, e.g. `B25-CSE-01`, case-insensitive")] = None,
+    teacher: Annotated[str | None, Query(description="Teacher name, case-insensitive")] = None,
+    room: Annotated[str | None, Query(description="Room, e.g. `301`")] = None,
+    weekday: Annotated[str | None, Query(description="Weekday, e.g. `TUESDAY`")] = None,
+    start: Annotated[datetime.time | None, Query(description="Only lessons ending after this time")] = None,
+    end: Annotated[datetime.time | None, Query(description="Only lessons starting before this time")] = None,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+) -> LessonsPage:
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=422, detail="Start has to be less than end")
+    weekday_index = None
+    if weekday is not None:
+        if weekday.upper() not in WEEKDAYS:
+            raise HTTPException(status_code=422, detail=f"Weekday must be one of {', '.join(WEEKDAYS)}")
+        weekday_index = WEEKDAYS.index(weekday.upper())
+
+    semester_options = options_repository.get_semester()
+    if semester_options is None:
+        raise HTTPException(status_code=404, detail="Semester options are not set")
+    # parses spreadsheets and updates the index if lessons are older than `settings.collisions.lessons_ttl`
+    await get_semester_lessons(semester_options)
+
+    query = LessonsQuery(group=group, teacher=teacher, room=room, weekday=weekday_index, start=start, end=end)
+    lessons = list(lesson_index.query(query))
+    return LessonsPage(total=len(lessons), offset=offset, lessons=lessons[offset : offset + limit])
@@ -0,0 +1,28 @@
+import datetime
+
+from src.custom_pydantic import CustomModel
+from src.modules.collisions.schemas import Lesson
+
+
+class LessonsQuery(CustomModel):
+    group: str | None = None
+    "Lessons of the group (also merged lessons of several groups)"
+    teacher: str | None = None
+    "Lessons of the teacher"
+    room: str | None = None
+    "Lessons in the room (also lessons in several rooms)"
+    weekday: int | None = None
+    "Lessons on the weekday (Monday is 0), weekly or on specific dates"
+    start: datetime.time | None = None
+    "Lessons ending after this time"
+    end: datetime.time | None = None
+    "Lessons starting before this time"
+
+
+class LessonsPage(CustomModel):
+    total: int
+    "Number of lessons matching the filters"
+    offset: int
+    "Number of matching lessons skipped"
+    lessons: list[Lesson]
+    "Matching lessons, sheet by sheet in the order of parsing"
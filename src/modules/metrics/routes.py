@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from src.api.dependencies import VerifyTokenDep
+from src.config import settings
+from src.custom_pydantic import CustomModel
+from src.metrics import endpoint_latency, registry
+from src.profiling import list_profiles
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+class EndpointLatency(CustomModel):
+    path: str
+    "Route path"
+    handler: str
+    "Name of the endpoint function"
+    count: int
+    "Number of calls"
+    mean: float
+    "Mean duration, seconds"
+    p50: float | None
+    "Median duration (estimated from histogram buckets), seconds"
+    p95: float | None
+    "95th percentile of duration (estimated from histogram buckets), seconds"
+    p99: float | None
+    "99th percentile of duration (estimated from histogram buckets), seconds"
+    max: float
+    "Maximum duration, seconds"
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    All metrics of this worker process in Prometheus text exposition format.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/latency")
+async def get_endpoints_latency() -> list[EndpointLatency]:
+    """
+    Durations of endpoint functions since start of this worker process, slowest (by p95) first.
+    """
+    result = [
+        EndpointLatency(
+            path=labels["path"],
+            handler=labels["handler"],
+            count=histogram.count,
+            mean=histogram.sum / histogram.count,
+            p50=histogram.quantile(0.5),
+            p95=histogram.quantile(0.95),
+            p99=histogram.quantile(0.99),
+            max=histogram.max,
+        )
+        for labels, histogram in endpoint_latency.items()
+        if histogram.count
+    ]
+    result.sort(key=lambda x: x.p95 or 0, reverse=True)
+    return result
+
+
+@router.get("/profiles")
+async def get_profiles(_user_and_token: VerifyTokenDep) -> list[str]:
+    """
+    Names of stored profiles of requests sent with `X-Profile: true` header, newest first.
+    """
+    return list_profiles()
+
+
+@router.get("/profiles/{name}", responses={404: {"description": "No such profile"}})
+async def get_profile(_user_and_token: VerifyTokenDep, name: str) -> FileResponse:
+    """
+    Download a stored profile: `.folded` stacks (open with https://www.speedscope.app) or `.allocations.txt`.
+    """
+    if name not in list_profiles():
+        raise HTTPException(status_code=404, detail="No such profile")
+    return FileResponse(settings.profiling.directory / name, media_type="text/plain")
@@ -1,18 +1,25 @@
 import json
+import os
+import stat
+import tempfile
 from pathlib import Path
 from typing import Literal
 
 import numpy as np
 import pandas as pd
+from pydantic import ConfigDict
 
 from src.core_courses.config import Target
 from src.custom_pydantic import CustomModel
 from src.electives.config import Elective
 from src.electives.config import Target as ElectiveTarget
 from src.logging_ import logger
+from src.metrics import cache_lookups
 
 
 class VerySameLessonId(CustomModel):
+    model_config = ConfigDict(frozen=True)
+
     type: Literal["core_course", "elective"] | None = None
     "Source type of the lesson"
     title: str
@@ -24,6 +31,8 @@ class VerySameLessonId(CustomModel):
 
 
 class SemesterOptions(CustomModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     core_courses_spreadsheet_id: str | None = None
     core_courses_targets: list[Target] = []
@@ -37,6 +46,8 @@ class SemesterOptions(CustomModel):
 
 
 class Teacher(CustomModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     russian_name: str | None = None
     email: str | None = None
@@ -45,34 +56,80 @@ class Teacher(CustomModel):
 
 
 class TeachersData(CustomModel):
+    model_config = ConfigDict(frozen=True)
+
     data: list[Teacher] = []
 
 
 class OptionsData(CustomModel):
+    model_config = ConfigDict(frozen=True)
+
     semester: SemesterOptions | None = None
     teachers: TeachersData | None = None
 
 
 class OptionsRepository:
+    """
+    Options stored in a JSON file.
+
+    Validated options are cached in memory and reloaded only when the file changes (by mtime, size or inode), so
+    changes made by other workers are picked up. Returned models are frozen, they are shared between callers.
+    """
+
     def __init__(self, file_path: str = "data/options.json"):
         self.file_path = Path(file_path)
+        self.version = 0
+        "Incremented on every load of changed file and on every write"
+        self._cached: OptionsData | None = None
+        self._cached_signature: tuple[int, int, int] | None = None
 
     def _ensure_file_exists(self) -> None:
         if not self.file_path.exists():
             self._save_data(OptionsData())
 
+    def _file_signature(self) -> tuple[int, int, int]:
+        file_stat = self.file_path.stat()
+        return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
     def _load_data(self) -> OptionsData:
         self._ensure_file_exists()
-        with open(self.file_path) as f:
-            data = json.load(f)
-        return OptionsData.model_validate(data)
+        signature = self._file_signature()
+        if self._cached is not None and signature == self._cached_signature:
+            cache_lookups.labels("options", "hit").inc()
+            return self._cached
+        cache_lookups.labels("options", "miss").inc()
+        with open(self.file_path, "rb") as f:
+            self._cached = OptionsData.model_validate_json(f.read())
+        # if the file was replaced in between, signature does not match on the next call and it is loaded again
+        self._cached_signature = signature
+        self.version += 1
+        return self._cached
 
     def _save_data(self, data: OptionsData) -> None:
-        with open(
-            self.file_path,
-            "w",
+        # write to a temporary file and rename it, so that readers never see a half-written file
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.file_path.parent, prefix=f".{self.file_path.name}.", suffix=".tmp", delete=False
         ) as f:
-            json.dump(data.model_dump(mode="json"), f, indent=2, ensure_ascii=False)
+            try:
+                json.dump(data.model_dump(mode="json"), f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+                # temporary files are created with 0600, keep permissions of the replaced file
+                os.fchmod(f.fileno(), self._file_mode())
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, self.file_path)
+        self._cached = data
+        self._cached_signature = self._file_signature()
+        self.version += 1
+
+    def _file_mode(self) -> int:
+        try:
+            return stat.S_IMODE(os.stat(self.file_path).st_mode)
+        except FileNotFoundError:
+            return 0o644
 
     def get_semester(self) -> SemesterOptions | None:
         data = self._load_data()
@@ -80,8 +137,7 @@ class OptionsRepository:
 
     def set_semester(self, semester: SemesterOptions) -> None:
         data = self._load_data()
-        data.semester = semester
-        self._save_data(data)
+        self._save_data(data.model_copy(update={"semester": semester}))
 
     def get_all_options(self) -> OptionsData:
         return self._load_data()
@@ -146,8 +202,7 @@ class OptionsRepository:
         teachers_data = TeachersData(data=teachers_data)
 
         data = self._load_data()
-        data.teachers = teachers_data
-        self._save_data(data)
+        self._save_data(data.model_copy(update={"teachers": teachers_data}))
 
         return teachers_data
 
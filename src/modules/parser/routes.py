@@ -1,16 +1,21 @@
+import datetime
 import json
+from collections.abc import AsyncGenerator, AsyncIterator
+from typing import Annotated, Literal
 
 import yaml
-from fastapi import APIRouter, Body, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, ValidationError
 
-from src.api.dependencies import VerifyTokenDep
-from src.core_courses.config import CoreCoursesConfig
+from src.api.dependencies import ProfilingDep, VerifyTokenDep
+from src.core_courses.config import CoreCoursesConfig, CoreCoursesEngine
 from src.core_courses.location_parser import Item, parse_location_string
-from src.electives.config import ElectivesParserConfig
-from src.modules.collisions.core_courses_adapter import get_all_core_courses_lessons
-from src.modules.collisions.electives_adapter import get_all_electives_lessons
+from src.electives.config import ElectivesParserConfig, ElectivesReader
+from src.modules.collisions.core_courses_adapter import get_all_core_courses_lessons, iter_core_courses_lessons
+from src.modules.collisions.electives_adapter import get_all_electives_lessons, iter_electives_lessons
+from src.modules.collisions.schemas import Lesson
+from src.utils import XlsxReaderName
 
 router = APIRouter(prefix="/parser", tags=["Parser"])
 
@@ -20,6 +25,76 @@ class ParseLocationStringResponse(BaseModel):
     description: str
 
 
+class CoreCourseLessonWithDates(Lesson):
+    start_date: datetime.date
+    "Start date of the target sheet"
+    end_date: datetime.date
+    "End date of the target sheet"
+
+
+OutputFormatQuery = Annotated[
+    Literal["json", "ndjson"],
+    Query(
+        alias="format",
+        description="`json` - array of lessons in one file, `ndjson` - stream of lessons, one JSON per line, "
+        "sheet by sheet (lessons are sorted within a sheet)",
+    ),
+]
+
+
+CoreCoursesEngineQuery = Annotated[
+    CoreCoursesEngine,
+    Query(
+        description="`pandas` - sheets are read into dataframes, `grid` - sheets are read into arrays from a read-only "
+        "stream of rows, faster, lessons are the same",
+    ),
+]
+
+
+CoreCoursesReaderQuery = Annotated[
+    XlsxReaderName,
+    Query(
+        description="Reader of the xlsx file for the `grid` engine: `openpyxl` - sheets are streamed by openpyxl in "
+        "read-only mode, `iterparse` - sheet XML is parsed straight from the xlsx archive, faster; the `pandas` engine "
+        "reads sheets with pandas; lessons are the same",
+    ),
+]
+
+
+ElectivesReaderQuery = Annotated[
+    ElectivesReader,
+    Query(
+        description="`pandas` - sheets are read into dataframes, `openpyxl` - sheets are streamed by openpyxl in "
+        "read-only mode, `iterparse` - sheet XML is parsed straight from the xlsx archive, faster; lessons are the same",
+    ),
+]
+
+
+async def ndjson_response(batches: AsyncIterator[list[BaseModel]], filename: str) -> StreamingResponse:
+    """
+    Stream batches of models as newline-delimited JSON, one model per line.
+
+    The first batch is awaited before responding, so that download or parsing errors are still reported with an error
+    status instead of a broken stream.
+    """
+    first_batch = await anext(batches, [])
+
+    async def content() -> AsyncGenerator[bytes]:
+        yield _to_ndjson(first_batch)
+        async for batch in batches:
+            yield _to_ndjson(batch)
+
+    return StreamingResponse(
+        content(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _to_ndjson(batch: list[BaseModel]) -> bytes:
+    return b"".join(model.__pydantic_serializer__.to_json(model) + b"\n" for model in batch)
+
+
 @router.post("/parse-location-string")
 async def parse_location_string_route(
     _user_and_token: VerifyTokenDep, location_string: str
@@ -33,9 +108,13 @@ async def parse_location_string_route(
     )
 
 
-@router.post("/parse-core-courses")
+@router.post("/parse-core-courses", dependencies=[ProfilingDep])
 async def parse_core_courses_route(
-    _user_and_token: VerifyTokenDep, input: str = Body(media_type="text/yaml")
+    _user_and_token: VerifyTokenDep,
+    input: str = Body(media_type="text/yaml"),
+    output_format: OutputFormatQuery = "json",
+    engine: CoreCoursesEngineQuery = "pandas",
+    reader: CoreCoursesReaderQuery = "openpyxl",
 ) -> Response:
     try:
         payload = yaml.safe_load(input) or {}
@@ -47,7 +126,20 @@ async def parse_core_courses_route(
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors()) from e
 
-    lessons = await get_all_core_courses_lessons(parser_config)
+    if output_format == "ndjson":
+
+        async def batches() -> AsyncGenerator[list[BaseModel]]:
+            async for target, lessons in iter_core_courses_lessons(parser_config, engine=engine, reader=reader):
+                yield [
+                    CoreCourseLessonWithDates.model_construct(
+                        **dict(lesson), start_date=target.start_date, end_date=target.end_date
+                    )
+                    for lesson in lessons
+                ]
+
+        return await ndjson_response(batches(), "core-courses-lessons.ndjson")
+
+    lessons = await get_all_core_courses_lessons(parser_config, engine=engine, reader=reader)
     as_json = [lesson.model_dump(mode="json") for lesson in lessons]
     targets = {t.sheet_name: t for t in parser_config.targets}
     for lesson in as_json:
@@ -63,8 +155,13 @@ async def parse_core_courses_route(
     )
 
 
-@router.post("/parse-electives")
-async def parse_electives_route(_user_and_token: VerifyTokenDep, input: str = Body(media_type="text/yaml")) -> Response:
+@router.post("/parse-electives", dependencies=[ProfilingDep])
+async def parse_electives_route(
+    _user_and_token: VerifyTokenDep,
+    input: str = Body(media_type="text/yaml"),
+    output_format: OutputFormatQuery = "json",
+    reader: ElectivesReaderQuery = "pandas",
+) -> Response:
     try:
         payload = yaml.safe_load(input) or {}
     except yaml.YAMLError as e:
@@ -75,7 +172,15 @@ async def parse_electives_route(_user_and_token: VerifyTokenDep, input: str = Bo
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors()) from e
 
-    lessons = await get_all_electives_lessons(parser_config)
+    if output_format == "ndjson":
+
+        async def batches() -> AsyncGenerator[list[BaseModel]]:
+            async for _, lessons in iter_electives_lessons(parser_config, reader=reader):
+                yield lessons
+
+        return await ndjson_response(batches(), "electives-lessons.ndjson")
+
+    lessons = await get_all_electives_lessons(parser_config, reader=reader)
     as_json = [lesson.model_dump(mode="json") for lesson in lessons]
 
     content = json.dumps(as_json, indent=2, ensure_ascii=False)
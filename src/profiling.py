@@ -0,0 +1,162 @@
+"""
+On-demand profiling of endpoint functions.
+
+A request is profiled when it is sent with `X-Profile: true` to a route that has `ProfilingDep` and profiling is
+enabled in settings. `src.logging_.run_endpoint_function` then wraps the endpoint function in `RequestProfiler`, which
+stores under `settings.profiling.directory`:
+
+- `<name>.folded`: stack samples of the endpoint thread in folded format, open with https://www.speedscope.app or
+  `flamegraph.pl`. Samples are taken by wall clock, so time spent waiting for I/O is visible as event loop frames;
+- `<name>.allocations.txt`: peak of traced memory and source lines with the largest allocations still alive when the
+  endpoint function returns (tracemalloc).
+
+When a request is not profiled, the only cost is a lookup of `profiling_requested`.
+"""
+
+import datetime
+import functools
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from types import CodeType, FrameType
+
+from src.config import settings
+
+profiling_requested: ContextVar[bool] = ContextVar("profiling_requested", default=False)
+"Set by `ProfilingDep` for the request being handled"
+
+_profiling_lock = threading.Lock()
+# tracemalloc and the sampler are process-wide, so only one request is profiled at a time
+
+
+@functools.cache
+def _frame_label(code: CodeType) -> str:
+    return f"{code.co_qualname} ({os.path.relpath(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _fold(frame: FrameType | None) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Samples stack of one thread every `interval` seconds from a background thread.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        "Folded stack (root first, separated by `;`) -> number of samples"
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+
+
+class RequestProfiler:
+    """
+    Profiles the current thread between `start()` and `stop()`.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._sampler: StackSampler | None = None
+        self._started_tracemalloc = False
+
+    def start(self) -> bool:
+        """
+        :return: False if another request is being profiled right now, so this one is not
+        """
+        if not _profiling_lock.acquire(blocking=False):
+            return False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._sampler = StackSampler(threading.get_ident(), settings.profiling.sampling_interval)
+        self._sampler.start()
+        return True
+
+    def stop(self) -> list[Path]:
+        """
+        Stop profiling and write the profile files.
+
+        :return: paths of the written files
+        """
+        assert self._sampler is not None, "profiler is not started"
+        try:
+            stacks = self._sampler.stop()
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                ]
+            )
+            _, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        finally:
+            _profiling_lock.release()
+        return self._write(stacks, snapshot, peak)
+
+    def _write(self, stacks: Counter[str], snapshot: tracemalloc.Snapshot, peak: int) -> list[Path]:
+        directory = settings.profiling.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base = directory / f"{timestamp}-{self.name}-{os.getpid()}"
+
+        folded_path = base.with_name(base.name + ".folded")
+        with open(folded_path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        allocations_path = base.with_name(base.name + ".allocations.txt")
+        top = snapshot.statistics("lineno")[: settings.profiling.top_allocations]
+        with open(allocations_path, "w", encoding="utf-8") as f:
+            f.write(f"Peak traced memory: {peak / 2**20:.1f} MiB\n")
+            f.write(f"Top {len(top)} lines by size of allocations alive at the end:\n")
+            for stat in top:
+                frame = stat.traceback[0]
+                f.write(
+                    f"{stat.size / 2**10:10.1f} KiB {stat.count:8d} blocks  {os.path.relpath(frame.filename)}:{frame.lineno}\n"
+                )
+
+        _remove_old_profiles(directory, settings.profiling.keep)
+        return [folded_path, allocations_path]
+
+
+def list_profiles() -> list[str]:
+    """
+    :return: names of stored profile files, newest first
+    """
+    directory = settings.profiling.directory
+    if not directory.is_dir():
+        return []
+    return sorted((path.name for path in directory.iterdir() if path.is_file()), reverse=True)
+
+
+def _remove_old_profiles(directory: Path, keep: int) -> None:
+    # every profile is a pair of files with the same timestamp prefix
+    for name in list_profiles()[keep * 2 :]:
+        (directory / name).unlink(missing_ok=True)
@@ -16,18 +16,28 @@ __all__ = [
     "set_one_space_around_brackets_and_remove_repeating_brackets",
     "set_one_space_after_comma_and_remove_repeating_commas",
     "prettify_string",
+    "parse_time",
+    "parse_time_range",
+    "parse_month_day",
 ]
 
 import datetime
+import functools
 import io
 import re
 from enum import StrEnum
+from typing import Literal
 
 import httpx
 
 TIMEZONE = "Europe/Moscow"
 MOSCOW_TZ = datetime.timezone(datetime.timedelta(hours=3), name="Europe/Moscow")
 WEEKDAYS = ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+TIME_RANGE_PATTERN = re.compile(r"\d{1,2}:\d{2}-\d{1,2}:\d{2}")
+MONTH_DAY_PATTERN = re.compile(r"\w+ \d+")
+
+XlsxReaderName = Literal["openpyxl", "iterparse"]
+"Reader of xlsx files, see `src.xlsx.XLSX_READERS`"
 
 
 async def fetch_xlsx_spreadsheet(spreadsheet_id: str) -> io.BytesIO:
@@ -265,3 +275,36 @@ def prettify_string(string: str | None) -> str | None:
         # remove repeating spaces and trailing spaces
         string = remove_repeating_spaces_and_trailing_spaces(string)
     return string
+
+
+# Times and dates repeat in every sheet ("9:00-10:30", "September 1"), so parsing is memoized; caches are bounded, as
+# keys come from arbitrary spreadsheet strings and the process is long-lived
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_time(string: str) -> datetime.time:
+    """
+    "9:00" -> datetime.time(9, 0)
+    """
+    return datetime.datetime.strptime(string, "%H:%M").time()
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_time_range(string: str) -> tuple[datetime.time, datetime.time] | None:
+    """
+    "9:00-10:30" -> (datetime.time(9, 0), datetime.time(10, 30)), None if string does not start with time range
+    """
+    if not TIME_RANGE_PATTERN.match(string):
+        return None
+    start, end = string.split("-")
+    return parse_time(start), parse_time(end)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_month_day(string: str, year: int) -> datetime.date | None:
+    """
+    "June 7" -> datetime.date(year, 6, 7), None if string does not start with month and day
+    """
+    if not MONTH_DAY_PATTERN.match(string):
+        return None
+    return datetime.datetime.strptime(f"{string} {year}", "%B %d %Y").date()
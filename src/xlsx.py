@@ -0,0 +1,404 @@
+"""
+Readers of xlsx files: sheets as grids of values with merged ranges, dimensions and borders of the first row.
+
+Parsers do not depend on how a workbook is read, any reader gives the same grids:
+- `openpyxl` - openpyxl in read-only mode, rows are streamed by openpyxl;
+- `iterparse` - worksheet XML, shared strings and styles are parsed straight from the zip archive with iterparse, no
+  openpyxl objects are made for cells.
+
+Values are converted the same way as pandas does when reading xlsx: empty cells and "N/A"-like strings are NaN,
+integral floats are ints.
+"""
+
+import abc
+import datetime
+import io
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+from collections.abc import Iterable
+
+import numpy as np
+import openpyxl
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+from openpyxl.utils import coordinate_to_tuple
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+from openpyxl.worksheet.cell_range import MultiCellRange
+from openpyxl.xml.constants import PKG_REL_NS, REL_NS, SHEET_MAIN_NS
+
+from src.utils import XlsxReaderName
+
+NA_STRINGS = frozenset(
+    {
+        "",
+        "#N/A",
+        "#N/A N/A",
+        "#NA",
+        "-1.#IND",
+        "-1.#QNAN",
+        "-NaN",
+        "-nan",
+        "1.#IND",
+        "1.#QNAN",
+        "<NA>",
+        "N/A",
+        "NA",
+        "NULL",
+        "NaN",
+        "None",
+        "n/a",
+        "nan",
+        "null",
+    }
+    | set(ERROR_CODES)
+)
+"Strings read as missing values, same as pandas does (and Excel errors)"
+BORDER_SIDES = ("left", "right", "top", "bottom")
+
+ROW_TAG = f"{{{SHEET_MAIN_NS}}}row"
+CELL_TAG = f"{{{SHEET_MAIN_NS}}}c"
+VALUE_TAG = f"{{{SHEET_MAIN_NS}}}v"
+INLINE_STRING_TAG = f"{{{SHEET_MAIN_NS}}}is"
+TEXT_TAG = f"{{{SHEET_MAIN_NS}}}t"
+RUN_TAG = f"{{{SHEET_MAIN_NS}}}r"
+MERGE_CELL_TAG = f"{{{SHEET_MAIN_NS}}}mergeCell"
+
+
+def _tag(name: str) -> str:
+    return f"{{{SHEET_MAIN_NS}}}{name}"
+
+
+class SheetGrid:
+    """
+    Raw sheet as read from xlsx: values, borders of the first row, merged ranges and dimensions.
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        header_borders: list[frozenset[str]],
+        merged_ranges: MultiCellRange,
+        max_row: int,
+        max_column: int,
+    ):
+        self.values = values
+        "Values of the sheet, NaN for empty cells; trailing empty rows and columns are trimmed"
+        self.header_borders = header_borders
+        "Sides with a border style (left, right, top, bottom) of cells of the first row"
+        self.merged_ranges = merged_ranges
+        "Merged ranges in the same order as openpyxl gives them when the whole workbook is loaded"
+        self.max_row = max_row
+        "Last row (1-based) with cells, also with empty cells that only have formatting"
+        self.max_column = max_column
+        "Last column (1-based) with cells, also with empty cells that only have formatting"
+
+
+class XlsxReader(abc.ABC):
+    """
+    Reads target sheets of xlsx file into `SheetGrid`s.
+    """
+
+    @abc.abstractmethod
+    def sheet_names(self, xlsx_file: io.BytesIO) -> list[str]:
+        """
+        Names of all sheets of the workbook in order.
+        """
+
+    @abc.abstractmethod
+    def read_sheets(self, xlsx_file: io.BytesIO, target_sheet_names: Iterable[str]) -> dict[str, SheetGrid]:
+        """
+        Read target sheets, sheets that are not found are skipped.
+        """
+
+
+class OpenpyxlReader(XlsxReader):
+    def sheet_names(self, xlsx_file: io.BytesIO) -> list[str]:
+        xlsx_file.seek(0)
+        wb = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True, keep_links=False)
+        try:
+            return wb.sheetnames
+        finally:
+            wb.close()
+
+    def read_sheets(self, xlsx_file: io.BytesIO, target_sheet_names: Iterable[str]) -> dict[str, SheetGrid]:
+        target_sheet_names = list(target_sheet_names)
+        # read-only worksheets do not parse merged cells, they are read from the sheet xml in the archive
+        xlsx_file.seek(0)
+        with zipfile.ZipFile(xlsx_file) as archive:
+            sheet_paths = _read_workbook(archive)[1]
+            merged_cell_refs = {}
+            for sheet_name in target_sheet_names:
+                if sheet_name in sheet_paths:
+                    with archive.open(sheet_paths[sheet_name]) as source:
+                        merged_cell_refs[sheet_name] = _merged_cell_refs(source)
+
+        xlsx_file.seek(0)
+        wb = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True, keep_links=False)
+        try:
+            grids = {}
+            for sheet_name in target_sheet_names:
+                if sheet_name not in wb.sheetnames:
+                    continue
+                ws = wb[sheet_name]
+                assert isinstance(ws, ReadOnlyWorksheet)
+                grids[sheet_name] = self._read_sheet(ws, merged_cell_refs.get(sheet_name, []))
+            return grids
+        finally:
+            wb.close()
+
+    def _read_sheet(self, ws: ReadOnlyWorksheet, merged_cell_refs: list[str]) -> SheetGrid:
+        # rows have their own width, not the one from the dimension of the sheet (may be wrong)
+        ws.reset_dimensions()
+        builder = _GridBuilder()
+        for row, values in enumerate(ws.iter_rows(values_only=True), start=1):
+            for column, value in enumerate(values, start=1):
+                builder.add(row, column, value)
+        header_borders = [
+            frozenset(side for side in BORDER_SIDES if _has_style(getattr(getattr(cell, "border", None), side, None)))
+            for cell in next(ws.iter_rows(max_row=1), ())
+        ]
+        return builder.build(header_borders, MultiCellRange(merged_cell_refs))
+
+
+def _has_style(side) -> bool:
+    return side is not None and side.style is not None
+
+
+class IterparseReader(XlsxReader):
+    def sheet_names(self, xlsx_file: io.BytesIO) -> list[str]:
+        xlsx_file.seek(0)
+        with zipfile.ZipFile(xlsx_file) as archive:
+            return list(_Workbook(archive).sheet_paths)
+
+    def read_sheets(self, xlsx_file: io.BytesIO, target_sheet_names: Iterable[str]) -> dict[str, SheetGrid]:
+        xlsx_file.seek(0)
+        with zipfile.ZipFile(xlsx_file) as archive:
+            workbook = _Workbook(archive)
+            grids = {}
+            for sheet_name in target_sheet_names:
+                path = workbook.sheet_paths.get(sheet_name)
+                if path is None:
+                    continue
+                with archive.open(path) as source:
+                    grids[sheet_name] = workbook.read_sheet(source)
+            return grids
+
+
+class _Workbook:
+    """
+    Parts of the workbook shared by its sheets, read from the zip archive.
+    """
+
+    def __init__(self, archive: zipfile.ZipFile):
+        self.archive = archive
+        parts, self.sheet_paths, self.epoch = _read_workbook(archive)
+        self._shared_strings_path = next(iter(parts.get("sharedStrings", [])), None)
+        self._shared_strings: list[str] | None = None
+        self.border_sides: list[frozenset[str]] = []
+        "Style id -> sides with a border style"
+        self.date_styles: set[int] = set()
+        self.timedelta_styles: set[int] = set()
+        styles_path = next(iter(parts.get("styles", [])), None)
+        if styles_path is not None:
+            self._read_styles(styles_path)
+
+    @property
+    def shared_strings(self) -> list[str]:
+        if self._shared_strings is None:
+            self._shared_strings = []
+            if self._shared_strings_path is not None:
+                with self.archive.open(self._shared_strings_path) as source:
+                    for _, element in ET.iterparse(source):
+                        if element.tag == _tag("si"):
+                            # plain text and text of rich text runs, like openpyxl does (no phonetic runs)
+                            text = (element.findtext(TEXT_TAG) or "") + "".join(
+                                run.findtext(TEXT_TAG) or "" for run in element.iterfind(RUN_TAG)
+                            )
+                            self._shared_strings.append(text.replace("x005F_", ""))
+                            element.clear()
+        return self._shared_strings
+
+    def _read_styles(self, path: str) -> None:
+        with self.archive.open(path) as source:
+            root = ET.parse(source).getroot()
+        custom_formats = {
+            int(num_fmt.get("numFmtId", 0)): num_fmt.get("formatCode")
+            for num_fmt in root.iterfind(f"{_tag('numFmts')}/{_tag('numFmt')}")
+        }
+        borders = [
+            frozenset(
+                side
+                for side in BORDER_SIDES
+                if (element := border.find(_tag(side))) is not None and element.get("style")
+            )
+            for border in root.iterfind(f"{_tag('borders')}/{_tag('border')}")
+        ]
+        for style_id, xf in enumerate(root.iterfind(f"{_tag('cellXfs')}/{_tag('xf')}")):
+            num_fmt_id = int(xf.get("numFmtId", 0))
+            fmt = custom_formats[num_fmt_id] if num_fmt_id in custom_formats else builtin_format_code(num_fmt_id)
+            if is_date_format(fmt):
+                self.date_styles.add(style_id)
+            if is_timedelta_format(fmt):
+                self.timedelta_styles.add(style_id)
+            border_id = int(xf.get("borderId", 0))
+            self.border_sides.append(borders[border_id] if border_id < len(borders) else frozenset())
+
+    def read_sheet(self, source) -> SheetGrid:
+        builder = _GridBuilder()
+        header_borders: list[frozenset[str]] = []
+        refs = []
+        row = column = 0
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            tag = element.tag
+            if event == "start":
+                if tag == ROW_TAG:
+                    row = int(element.get("r", row + 1))
+                    column = 0
+                continue
+            if tag == CELL_TAG:
+                coordinate = element.get("r")
+                column = coordinate_to_tuple(coordinate)[1] if coordinate else column + 1
+                style_id = int(element.get("s", 0))
+                builder.add(row, column, self._cell_value(element, style_id))
+                if row == 1:
+                    header_borders.extend([frozenset()] * (column - len(header_borders)))
+                    header_borders[column - 1] = (
+                        self.border_sides[style_id] if style_id < len(self.border_sides) else frozenset()
+                    )
+            elif tag == ROW_TAG:
+                element.clear()
+            elif tag == MERGE_CELL_TAG:
+                refs.append(element.get("ref"))
+        return builder.build(header_borders, MultiCellRange(refs))
+
+    def _cell_value(self, element: ET.Element, style_id: int):
+        # same conversions as openpyxl does for read-only worksheets with `data_only`
+        data_type = element.get("t", "n")
+        if data_type == "inlineStr":
+            inline = element.find(INLINE_STRING_TAG)
+            if inline is None:
+                return None
+            return (inline.findtext(TEXT_TAG) or "") + "".join(
+                run.findtext(TEXT_TAG) or "" for run in inline.iterfind(RUN_TAG)
+            )
+        value = element.findtext(VALUE_TAG) or None
+        if value is None:
+            return None
+        if data_type == "n":
+            number = float(value) if "." in value or "E" in value or "e" in value else int(value)
+            if style_id in self.date_styles:
+                try:
+                    return from_excel(number, self.epoch, timedelta=style_id in self.timedelta_styles)
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return number
+        if data_type == "s":
+            return self.shared_strings[int(value)]
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_ISO8601(value)
+        return value  # "str" and "e"
+
+
+def _read_workbook(archive: zipfile.ZipFile) -> tuple[dict[str, list[str]], dict[str, str], datetime.datetime]:
+    """
+    :return: paths of parts of the workbook (see `_relationships`), sheet name -> path of the sheet xml in the archive
+        in the order of sheets, and epoch of dates
+    """
+    workbook_path = _relationships(archive, "_rels/.rels", "")["officeDocument"][0]
+    parts = _relationships(archive, _rels_path(workbook_path), posixpath.dirname(workbook_path))
+    sheet_paths_by_id = dict(zip(parts.get("worksheet-ids", []), parts.get("worksheet", [])))
+    sheet_paths: dict[str, str] = {}
+    epoch = CALENDAR_WINDOWS_1900
+    with archive.open(workbook_path) as source:
+        for _, element in ET.iterparse(source):
+            if element.tag == _tag("sheet"):
+                path = sheet_paths_by_id.get(element.get(f"{{{REL_NS}}}id"))
+                if path is not None:
+                    sheet_paths[element.get("name", "")] = path
+            elif element.tag == _tag("workbookPr") and element.get("date1904") in ("1", "true"):
+                epoch = CALENDAR_MAC_1904
+    return parts, sheet_paths, epoch
+
+
+def _merged_cell_refs(source) -> list[str]:
+    """
+    Refs of merged cells of the sheet xml, they follow rows of the sheet.
+    """
+    refs = []
+    for _, element in ET.iterparse(source):
+        if element.tag == MERGE_CELL_TAG:
+            refs.append(element.get("ref"))
+        elif element.tag == ROW_TAG:
+            element.clear()
+    return refs
+
+
+def _rels_path(path: str) -> str:
+    directory, name = posixpath.split(path)
+    return posixpath.join(directory, "_rels", f"{name}.rels")
+
+
+def _relationships(archive: zipfile.ZipFile, rels_path: str, base: str) -> dict[str, list[str]]:
+    """
+    Targets of relationships by the last part of their type, ids of worksheet relationships are under "worksheet-ids".
+    """
+    relationships: dict[str, list[str]] = {}
+    with archive.open(rels_path) as source:
+        for relationship in ET.parse(source).getroot().iterfind(f"{{{PKG_REL_NS}}}Relationship"):
+            target = relationship.get("Target", "")
+            target = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+            kind = relationship.get("Type", "").rsplit("/", 1)[-1]
+            relationships.setdefault(kind, []).append(target)
+            if kind == "worksheet":
+                relationships.setdefault("worksheet-ids", []).append(relationship.get("Id", ""))
+    return relationships
+
+
+class _GridBuilder:
+    """
+    Collects cells of a sheet into an array of values, cells may come in any order.
+    """
+
+    def __init__(self):
+        self.cells: list[tuple[int, int, object]] = []
+        self.max_row = 0
+        self.max_column = 0
+
+    def add(self, row: int, column: int, value) -> None:
+        """
+        :param row: 1-based row
+        :param column: 1-based column
+        :param value: value as read from xlsx, None for an empty cell
+        """
+        self.max_row = max(self.max_row, row)
+        self.max_column = max(self.max_column, column)
+        value = _convert_value(value)
+        if value is not None:
+            self.cells.append((row - 1, column - 1, value))
+
+    def build(self, header_borders: list[frozenset[str]], merged_ranges: MultiCellRange) -> SheetGrid:
+        # empty cells at the end of rows and columns are trimmed, missing values (NaN) are not
+        n_rows = max((row for row, _, _ in self.cells), default=-1) + 1
+        n_columns = max((column for _, column, _ in self.cells), default=-1) + 1
+        values = np.full((n_rows, n_columns), np.nan, dtype=object)
+        for row, column, value in self.cells:
+            values[row, column] = value
+        return SheetGrid(values, header_borders, merged_ranges, self.max_row, self.max_column)
+
+
+def _convert_value(value):
+    # None is an empty cell, which is trimmed at the end of a row, NaN is a missing value which is not
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return np.nan if value in NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+XLSX_READERS: dict[XlsxReaderName, XlsxReader] = {"openpyxl": OpenpyxlReader(), "iterparse": IterparseReader()}
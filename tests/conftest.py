@@ -88,6 +88,6 @@ def mock_booking_client():
         patch("src.modules.bookings.client.booking_client", mock_client),
         patch("src.modules.bookings.routes.booking_client", mock_client),
         patch("src.modules.collisions.collision_checker.booking_client", mock_client),
-        patch("src.modules.collisions.routes.booking_client", mock_client),
+        patch("src.modules.collisions.check.booking_client", mock_client),
     ):
         yield mock_client
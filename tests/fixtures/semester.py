@@ -0,0 +1,194 @@
+"""
+Synthetic semester: lessons, rooms, teachers and Outlook bookings for the collisions checker.
+
+Used by tests and by the benchmarks in `scripts/`, so that checks can be measured at any scale without spreadsheets
+and InNoHassle Booking.
+"""
+
+import dataclasses
+import datetime
+import random
+
+from openpyxl.utils import get_column_letter
+
+from src.core_courses.config import Target
+from src.modules.bookings.client import BookingDTO, RoomDTO
+from src.modules.collisions.schemas import Lesson
+from src.modules.options.repository import Teacher
+from src.utils import MOSCOW_TZ, WEEKDAYS
+from tests.fixtures.xlsx import CLASS_TYPES, SUBJECTS, TIMESLOTS
+
+BOOKING_TITLES = ["Meeting", "Exam", "Workshop", "Defense", "Seminar", "Lectures", "Schedule Assistant IU"]
+SPREADSHEET_ID = "synthetic-semester"
+START_DATE = datetime.date(2100, 1, 4)
+"Monday, far in the future, so that the bookings are not skipped by the Outlook check as past ones"
+
+
+@dataclasses.dataclass
+class SyntheticSemester:
+    lessons: list[Lesson]
+    "Core courses lessons followed by electives lessons"
+    rooms: list[RoomDTO]
+    teachers: list[Teacher]
+    "Teachers from the options, some of them study in one of the groups"
+    bookings: list[BookingDTO]
+    "Outlook bookings of the rooms during the semester"
+    targets: list[Target]
+    "One target (sheet) per course"
+
+
+def generate_semester(
+    courses: int = 4,
+    groups_per_course: int = 6,
+    subjects_per_course: int = 5,
+    electives: int = 10,
+    rooms: int = 30,
+    teachers: int = 40,
+    bookings_per_room: int = 10,
+    weeks: int = 8,
+    start_date: datetime.date = START_DATE,
+    seed: int = 0,
+) -> SyntheticSemester:
+    """
+    Generate a semester the way it looks after parsing: every subject of a course has a weekly lecture for all groups
+    of the course (merged groups) and a weekly tutorial or lab for every group. Some lessons have `date_except`,
+    `date_from` or only happen on some dates (`date_on`), some are online or take several rooms. Electives happen on
+    specific dates. Rooms, teachers and weekday/time slots are picked at random, so collisions of all kinds appear and
+    their number grows with scale.
+
+    :param start_date: first day of the semester, fixed by default, so that the same seed gives the same semester
+        on any day
+    """
+    rng = random.Random(seed)
+    end_date = start_date + datetime.timedelta(weeks=weeks) - datetime.timedelta(days=1)
+    timeslots = [_parse_timeslot(timeslot) for timeslot in TIMESLOTS]
+
+    room_list = [
+        RoomDTO(id=str(101 + i), title=f"Room {101 + i}", capacity=rng.choice([20, 30, 60, 120, 240]))
+        for i in range(rooms)
+    ]
+    big_rooms = [room.id for room in room_list if (room.capacity or 0) >= 60] or [room_list[0].id]
+    teacher_names = [f"Teacher {i:03d}" for i in range(teachers)]
+
+    lessons: list[Lesson] = []
+    targets: list[Target] = []
+    all_groups: list[str] = []
+    for course_index in range(courses):
+        sheet_name = f"BS - Year {course_index + 1}"
+        course = f"B{25 - course_index % 4} - Course {course_index + 1}"
+        targets.append(Target(sheet_name=sheet_name, start_date=start_date, end_date=end_date, override=[]))
+        groups = {
+            f"B{25 - course_index % 4}-{course_index + 1:02d}-{i + 1:02d}": rng.randint(15, 35)
+            for i in range(groups_per_course)
+        }
+        all_groups.extend(groups)
+
+        for subject in rng.sample(SUBJECTS, min(subjects_per_course, len(SUBJECTS))):
+            classes = [("lec", tuple(groups), sum(groups.values()), rng.choice(big_rooms))]
+            for group, students in groups.items():
+                classes.append((rng.choice(CLASS_TYPES[1:]), group, students, rng.choice(room_list).id))
+            for class_type, group, students, room in classes:
+                lessons.append(
+                    _weekly_lesson(
+                        rng,
+                        start_date,
+                        weeks,
+                        rng.choice(timeslots),
+                        room if rng.random() > 0.08 else rng.choice(["ONLINE", (room, rng.choice(room_list).id)]),
+                        lesson_name=f"{subject} ({class_type})",
+                        lesson_class_type=class_type,
+                        source_type="core_course",
+                        teacher=rng.choice(teacher_names),
+                        course_name=course,
+                        group_name=group,
+                        students_number=students,
+                        spreadsheet_id=SPREADSHEET_ID,
+                        google_sheet_gid=str(1000 + course_index),
+                        google_sheet_name=sheet_name,
+                        a1_range=f"{get_column_letter(len(lessons) % 50 + 1)}{len(lessons) // 50 + 3}",
+                    )
+                )
+
+    for elective_index in range(electives):
+        teacher = rng.choice(teacher_names)
+        room = rng.choice(room_list).id
+        weekday = rng.randrange(6)
+        start_time, end_time = rng.choice(timeslots)
+        for week in range(weeks):
+            date = start_date + datetime.timedelta(weeks=week, days=weekday)
+            lessons.append(
+                Lesson(
+                    lesson_name=f"Elective {elective_index + 1}",
+                    source_type="elective",
+                    weekday=WEEKDAYS[weekday],
+                    start_time=start_time,
+                    end_time=end_time,
+                    room=room,
+                    teacher=teacher,
+                    course_name=f"E{elective_index + 1}",
+                    group_name=rng.choice([None, f"E{elective_index + 1}-1", f"E{elective_index + 1}-2"]),
+                    date_on=[date],
+                    spreadsheet_id=SPREADSHEET_ID,
+                    google_sheet_gid="2000",
+                    google_sheet_name="Electives",
+                    a1_range=f"{get_column_letter(elective_index + 1)}{week + 3}",
+                )
+            )
+
+    teacher_list = [
+        Teacher(name=name, student_group=rng.choice(all_groups) if all_groups and rng.random() < 0.1 else None)
+        for name in teacher_names
+    ]
+
+    bookings = []
+    for room in room_list:
+        for _ in range(bookings_per_room):
+            date = start_date + datetime.timedelta(days=rng.randrange(weeks * 7))
+            start_time, end_time = rng.choice(timeslots)
+            bookings.append(
+                BookingDTO.model_validate(
+                    {
+                        "room_id": room.id,
+                        "title": rng.choice(BOOKING_TITLES),
+                        "start": datetime.datetime.combine(date, start_time, tzinfo=MOSCOW_TZ),
+                        "end": datetime.datetime.combine(date, end_time, tzinfo=MOSCOW_TZ),
+                    }
+                )
+            )
+
+    return SyntheticSemester(
+        lessons=lessons, rooms=room_list, teachers=teacher_list, bookings=bookings, targets=targets
+    )
+
+
+def _parse_timeslot(timeslot: str) -> tuple[datetime.time, datetime.time]:
+    start, end = timeslot.split("-")
+    return datetime.datetime.strptime(start, "%H:%M").time(), datetime.datetime.strptime(end, "%H:%M").time()
+
+
+def _weekly_lesson(
+    rng: random.Random,
+    start_date: datetime.date,
+    weeks: int,
+    timeslot: tuple[datetime.time, datetime.time],
+    room: str | tuple[str, ...],
+    **fields,
+) -> Lesson:
+    weekday = rng.randrange(6)
+    roll = rng.random()
+    if roll < 0.1:
+        # "EXCEPT": some dates are skipped
+        fields["date_except"] = sorted(
+            {start_date + datetime.timedelta(weeks=rng.randrange(weeks), days=weekday) for _ in range(2)}
+        )
+    elif roll < 0.15:
+        # "ON": only on some dates
+        fields["date_on"] = sorted(
+            {start_date + datetime.timedelta(weeks=rng.randrange(weeks), days=weekday) for _ in range(3)}
+        )
+    elif roll < 0.2:
+        # "FROM": starts later than the semester
+        fields["date_from"] = start_date + datetime.timedelta(weeks=rng.randrange(1, max(weeks, 2)))
+    if isinstance(room, tuple):
+        room = tuple(sorted(set(room))) if len(set(room)) > 1 else room[0]
+    return Lesson(weekday=WEEKDAYS[weekday], start_time=timeslot[0], end_time=timeslot[1], room=room, **fields)
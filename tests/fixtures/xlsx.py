@@ -0,0 +1,250 @@
+"""
+Synthetic spreadsheets in the layouts expected by the parsers.
+
+Used by tests and by the benchmarks in `scripts/`, so that parsing can be exercised without Google Sheets.
+"""
+
+import datetime
+import io
+import random
+
+import openpyxl
+from openpyxl.styles import Border, Side
+
+from src.core_courses.config import CoreCoursesConfig, Tag, Target
+from src.electives.config import Elective, ElectivesParserConfig
+from src.electives.config import Tag as ElectivesTag
+from src.electives.config import Target as ElectivesTarget
+from src.utils import WEEKDAYS, nearest_weekday
+
+SUBJECTS = [
+    "Mathematical Analysis I",
+    "Analytical Geometry and Linear Algebra I",
+    "Introduction to Programming",
+    "Computer Architecture",
+    "Philosophy II (Introduction to AI)",
+    "Theoretical Mechanics",
+    "Data Structures and Algorithms",
+    "Probability and Statistics",
+    "Software Project",
+    "Networks",
+]
+TEACHERS = [
+    "Ivan Ivanov",
+    "Maria Razmazina/David Orok",
+    "M. Reza Bahrami",
+    "Georgiy Gelvanovsky,Rabab Marouf",
+    "Petr Petrov",
+    "Alexandr Maloletov",
+]
+LOCATIONS = [
+    "301",
+    "313",
+    "105",
+    "106",
+    "ONLINE",
+    "105 ON 15/10, 106 ON 29/10",
+    "460 EXCEPT 28/11",
+    "108 (STARTS AT 9:00)",
+]
+TIMESLOTS = [
+    "9:00-10:30",
+    "10:40-12:10",
+    "12:40-14:10",
+    "14:20-15:50",
+    "16:00-17:30",
+    "17:40-19:10",
+    "19:20-20:50",
+]
+CLASS_TYPES = ["lec", "tut", "lab"]
+
+_THIN = Side(style="thin")
+_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+
+
+def core_courses_sheet_names(sheets: int) -> list[str]:
+    return [f"BS - Year {i + 1}" for i in range(sheets)]
+
+
+def build_core_courses_workbook(
+    sheets: int = 1,
+    courses_per_sheet: int = 2,
+    groups_per_course: int = 4,
+    timeslots_per_day: int = 5,
+    fill_ratio: float = 0.6,
+    seed: int = 0,
+) -> io.BytesIO:
+    """
+    Build a core courses workbook: every sheet has `courses_per_sheet` blocks, each block is a time column followed by
+    group columns. Header rows hold course (merged over its groups) and group names, then for every weekday there is a
+    weekday row and 3-row timeslots (subject, teacher, location) with the time cell merged over them.
+    Lectures are merged horizontally over all groups of the course.
+
+    :return: xlsx file as BytesIO object
+    """
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+
+    for sheet_index, sheet_name in enumerate(core_courses_sheet_names(sheets)):
+        ws = wb.create_sheet(sheet_name)
+        col = 1
+        for course_index in range(courses_per_sheet):
+            course = f"B{25 - sheet_index} - Course {course_index + 1}"
+            time_col = col
+            first_group_col = time_col + 1
+            last_group_col = time_col + groups_per_course
+            # ---- Header: course and group rows ----
+            ws.cell(row=1, column=first_group_col, value=course)
+            if groups_per_course > 1:
+                ws.merge_cells(start_row=1, start_column=first_group_col, end_row=1, end_column=last_group_col)
+            for group_index in range(groups_per_course):
+                group_col = first_group_col + group_index
+                ws.cell(row=1, column=group_col).border = _BORDER
+                students = rng.randint(15, 35)
+                group = f"B{25 - sheet_index}-C{course_index + 1}-{group_index + 1:02d} ({students})"
+                ws.cell(row=2, column=group_col, value=group)
+            ws.cell(row=1, column=time_col).border = _BORDER
+            # ---- Body: weekdays and timeslots ----
+            row = 3
+            for weekday in WEEKDAYS[:-1]:
+                ws.cell(row=row, column=time_col, value=weekday)
+                row += 1
+                for timeslot in TIMESLOTS[:timeslots_per_day]:
+                    ws.cell(row=row, column=time_col, value=timeslot)
+                    ws.merge_cells(start_row=row, start_column=time_col, end_row=row + 2, end_column=time_col)
+                    if rng.random() < fill_ratio / 3:
+                        # Lecture for the whole course
+                        _write_lesson(ws, rng, row, first_group_col, "lec")
+                        if groups_per_course > 1:
+                            for offset in range(3):
+                                ws.merge_cells(
+                                    start_row=row + offset,
+                                    start_column=first_group_col,
+                                    end_row=row + offset,
+                                    end_column=last_group_col,
+                                )
+                    else:
+                        for group_col in range(first_group_col, last_group_col + 1):
+                            if rng.random() < fill_ratio:
+                                _write_lesson(ws, rng, row, group_col, rng.choice(CLASS_TYPES[1:]))
+                    row += 3
+            col = last_group_col + 1
+    xlsx = io.BytesIO()
+    wb.save(xlsx)
+    xlsx.seek(0)
+    return xlsx
+
+
+def _write_lesson(ws, rng: random.Random, row: int, col: int, class_type: str) -> None:
+    ws.cell(row=row, column=col, value=f"{rng.choice(SUBJECTS)} ({class_type})")
+    ws.cell(row=row + 1, column=col, value=rng.choice(TEACHERS))
+    location = rng.choice(LOCATIONS)
+    ws.cell(row=row + 2, column=col, value=int(location) if location.isdigit() else location)
+
+
+def core_courses_config(sheets: int, spreadsheet_id: str = "synthetic-core-courses") -> CoreCoursesConfig:
+    return CoreCoursesConfig(
+        targets=[
+            Target(
+                sheet_name=sheet_name,
+                start_date=datetime.date(2025, 8, 25),
+                end_date=datetime.date(2025, 12, 23),
+                override=[],
+            )
+            for sheet_name in core_courses_sheet_names(sheets)
+        ],
+        semester_tag=Tag(alias="fall25", type="semester", name="Fall 25"),
+        spreadsheet_id=spreadsheet_id,
+    )
+
+
+def sheet_gids(sheet_names: list[str]) -> dict[str, str]:
+    return {sheet_name: str(1000 + i) for i, sheet_name in enumerate(sheet_names)}
+
+
+ELECTIVE_SHORT_NAMES = ["GAI", "PHL", "PMBA", "GDU", "OMML", "PGA", "IQC", "SMP", "ASEM", "CSF", "TEC", "DMA"]
+ELECTIVE_LINE_SUFFIXES = [
+    "(lec) 301",
+    "(lab) (G1) 313",
+    "(lab) (G2) 314",
+    "105",
+    "online",
+    "(18:10-19:50) 312",
+]
+
+
+def electives_sheet_names(sheets: int) -> list[str]:
+    return [f"Electives BS{i + 1}" for i in range(sheets)]
+
+
+def electives_start_date() -> datetime.date:
+    # the parser reads dates as "September 1" and assumes the current year
+    return nearest_weekday(datetime.date(datetime.date.today().year, 9, 1), 0)
+
+
+def electives_list(electives: int) -> list[Elective]:
+    short_names = ELECTIVE_SHORT_NAMES[:electives] + [f"E{i:02d}" for i in range(len(ELECTIVE_SHORT_NAMES), electives)]
+    return [
+        Elective(alias=short_name.lower(), short_name=short_name, name=f"Elective {short_name}", instructor=teacher)
+        for short_name, teacher in zip(short_names, TEACHERS * (electives // len(TEACHERS) + 1))
+    ]
+
+
+def build_electives_workbook(
+    sheets: int = 1,
+    weeks: int = 4,
+    electives: int = 8,
+    timeslots_per_day: int = 5,
+    fill_ratio: float = 0.4,
+    seed: int = 0,
+) -> io.BytesIO:
+    """
+    Build an electives workbook: the first row holds weekday names over the day columns, then for every week there is
+    a "Week N" row with dates of the week ("September 1") followed by timeslot rows. A cell lists electives of the
+    timeslot one per line: short name, optionally class type, group or time, and location.
+
+    :return: xlsx file as BytesIO object
+    """
+    rng = random.Random(seed)
+    short_names = [elective.short_name for elective in electives_list(electives)]
+    start_date = electives_start_date()
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+
+    for sheet_name in electives_sheet_names(sheets):
+        ws = wb.create_sheet(sheet_name)
+        for day, weekday in enumerate(WEEKDAYS):
+            ws.cell(row=1, column=day + 2, value=weekday)
+        row = 2
+        for week in range(weeks):
+            ws.cell(row=row, column=1, value=f"Week {week + 1}")
+            for day in range(len(WEEKDAYS)):
+                date = start_date + datetime.timedelta(weeks=week, days=day)
+                ws.cell(row=row, column=day + 2, value=f"{date:%B} {date.day}")
+            row += 1
+            for timeslot in TIMESLOTS[:timeslots_per_day]:
+                ws.cell(row=row, column=1, value=timeslot)
+                for day in range(len(WEEKDAYS) - 1):
+                    if rng.random() < fill_ratio:
+                        lines = [
+                            f"{short_name} {rng.choice(ELECTIVE_LINE_SUFFIXES)}"
+                            for short_name in rng.sample(short_names, rng.randint(1, min(3, len(short_names))))
+                        ]
+                        ws.cell(row=row, column=day + 2, value="\n".join(lines))
+                row += 1
+    xlsx = io.BytesIO()
+    wb.save(xlsx)
+    xlsx.seek(0)
+    return xlsx
+
+
+def electives_config(
+    sheets: int, electives: int = 8, spreadsheet_id: str = "synthetic-electives"
+) -> ElectivesParserConfig:
+    return ElectivesParserConfig(
+        targets=[ElectivesTarget(sheet_name=sheet_name) for sheet_name in electives_sheet_names(sheets)],
+        semester_tag=ElectivesTag(alias="fall25", type="semester", name="Fall 25"),
+        spreadsheet_id=spreadsheet_id,
+        electives=electives_list(electives),
+    )
@@ -1,6 +1,14 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
 import pytest
 from httpx import AsyncClient
 
+from src.modules.collisions.jobs import CheckJobManager
+from src.modules.collisions.schemas import CheckPhaseEnum, CheckProgress, CheckResults, Lesson
+from src.modules.options.repository import SemesterOptions
+
 
 @pytest.mark.asyncio
 async def test_app_is_running(fastapi_test_client: AsyncClient) -> None:
@@ -71,3 +79,104 @@ async def test_get_bookings_with_mock(
     assert data[0]["title"] == "Test Booking 1"
 
     mock_booking_client.get_all_bookings.assert_called_once()
+
+
+async def _fake_run_check(options, params, token, on_progress=None) -> CheckResults:
+    on_progress(CheckProgress(phase=CheckPhaseEnum.PARSE, step="BS - Year 1", lessons_count=10))
+    await asyncio.sleep(0.01)
+    on_progress(CheckProgress(phase=CheckPhaseEnum.CHECK, step="room", issues=[]))
+    return CheckResults(issues=[])
+
+
+def _parse_sse(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_check_job_lifecycle(authenticated_client: AsyncClient) -> None:
+    with patch("src.modules.collisions.jobs.run_check", _fake_run_check):
+        response = await authenticated_client.post("/collisions/jobs", json={"check_outlook_collisions": False})
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] == "queued"
+
+        response = await authenticated_client.get(f"/collisions/jobs/{job['id']}/events")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _parse_sse(response.text)
+        assert [event for event, _ in events] == ["status", "status", "progress", "progress", "status", "result"]
+        assert [data["status"] for event, data in events if event == "status"] == ["queued", "running", "done"]
+        assert events[2][1]["lessons_count"] == 10
+        assert events[-1][1] == {"issues": []}
+
+        response = await authenticated_client.get(f"/collisions/jobs/{job['id']}")
+        assert response.status_code == 200
+        assert response.json()["status"] == "done"
+        assert response.json()["result"] == {"issues": []}
+        assert response.json()["params"]["check_outlook_collisions"] is False
+
+
+@pytest.mark.asyncio
+async def test_check_job_not_found(authenticated_client: AsyncClient) -> None:
+    assert (await authenticated_client.get("/collisions/jobs/unknown")).status_code == 404
+    assert (await authenticated_client.get("/collisions/jobs/unknown/events")).status_code == 404
+    # evicted between the lookup of the route and the start of the stream
+    assert [event async for event in CheckJobManager(workers=1, max_queued=1, keep_finished=0).events("unknown")] == []
+
+
+@pytest.mark.asyncio
+async def test_check_job_queue_is_bounded(authenticated_client: AsyncClient) -> None:
+    async def slow_run_check(options, params, token, on_progress=None) -> CheckResults:
+        await asyncio.sleep(0.2)
+        return CheckResults(issues=[])
+
+    manager = CheckJobManager(workers=1, max_queued=1, keep_finished=10)
+    with (
+        patch("src.modules.collisions.jobs.run_check", slow_run_check),
+        patch("src.modules.collisions.routes.check_job_manager", manager),
+    ):
+        statuses = []
+        for _ in range(3):
+            statuses.append((await authenticated_client.post("/collisions/jobs", json={})).status_code)
+            await asyncio.sleep(0.01)  # let the worker take the first job
+        assert statuses == [202, 202, 503]
+
+
+@pytest.mark.asyncio
+async def test_find_free_rooms(authenticated_client: AsyncClient, mock_booking_client) -> None:
+    lesson = Lesson(
+        lesson_name="Lesson",
+        weekday="WEDNESDAY",
+        start_time="09:00",
+        end_time="10:30",
+        room="test_room_1",
+        spreadsheet_id="spreadsheet",
+        google_sheet_gid="0",
+        google_sheet_name="Sheet",
+    )
+    with (
+        patch("src.modules.collisions.routes.options_repository.get_semester", return_value=SemesterOptions(name="x")),
+        patch("src.modules.collisions.check.fetch_lessons", AsyncMock(return_value=[lesson])) as fetch_lessons,
+    ):
+        response = await authenticated_client.get(
+            "/collisions/free-rooms", params={"start": "10:00", "end": "11:00", "weekday": "wednesday"}
+        )
+        assert response.status_code == 200
+        assert [room["id"] for room in response.json()] == ["test_room_2"]
+
+        # test_room_2 is booked on 2025-01-01 from 14:00 to 15:00 Moscow time
+        params = {"start": "14:30", "end": "15:00", "dates": ["2025-01-01"]}
+        response = await authenticated_client.get("/collisions/free-rooms", params=params)
+        assert [room["id"] for room in response.json()] == ["test_room_1"]
+        response = await authenticated_client.get("/collisions/free-rooms", params={**params, "min_capacity": 30})
+        assert response.json() == []
+
+        response = await authenticated_client.get("/collisions/free-rooms", params={"start": "10:00", "end": "11:00"})
+        assert response.status_code == 422
+    # the index is built once and reused
+    fetch_lessons.assert_called_once()
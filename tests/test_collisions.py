@@ -1,12 +1,43 @@
-from datetime import date, time
+import asyncio
+import gc
+import os
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, time, timedelta
+from time import sleep
+from unittest.mock import AsyncMock, patch
 
 import pytest
 import yaml
 
-from src.modules.bookings.client import RoomDTO
+from src.cli.check import build_parser, check
+from src.modules.bookings.client import BookingDTO, RoomDTO
+from src.modules.collisions.check import CheckTimings, get_occupancy_index, run_check, run_check_coalesced
 from src.modules.collisions.collision_checker import CollisionChecker
-from src.modules.collisions.schemas import CapacityIssue, Lesson, RoomIssue, TeacherIssue
-from src.modules.options.repository import Teacher, VerySameLessonId
+from src.modules.collisions.occupancy import OccupancyIndex
+from src.modules.collisions.parallel import ChecksPool
+from src.modules.collisions.schemas import (
+    CapacityIssue,
+    CheckParameters,
+    CheckResults,
+    CollisionTypeEnum,
+    Lesson,
+    NormalizedCheckResults,
+    OutlookIssue,
+    RoomIssue,
+    TeacherIssue,
+)
+from src.modules.collisions.single_flight import SingleFlight
+from src.modules.options.repository import OptionsData, SemesterOptions, Teacher, TeachersData, VerySameLessonId
+from tests.fixtures.semester import generate_semester
+from tests.fixtures.xlsx import (
+    build_core_courses_workbook,
+    build_electives_workbook,
+    core_courses_config,
+    electives_config,
+)
 
 rooms_yaml = """
 rooms:
@@ -1178,3 +1209,428 @@ class TestVerySameLessons:
         ]
         issues = checker.check_for_room_issue(lessons)
         assert len(issues) == 0
+
+
+# ── normalized results tests ──────────────────────────────────────────
+
+
+def test_normalized_check_results_deduplicate_lessons_and_bookings() -> None:
+    lesson_a = _make_lesson(name="A", room="105", teacher="Ivan")
+    lesson_b = _make_lesson(name="B", room="105", teacher="Ivan")
+    lesson_c = _make_lesson(name="C", room="106")
+    booking = BookingDTO.model_validate(
+        {"room_id": "105", "title": "Meeting", "start": "2025-01-06T10:00:00Z", "end": "2025-01-06T11:00:00Z"}
+    )
+    results = CheckResults(
+        issues=[
+            RoomIssue(collision_type=CollisionTypeEnum.ROOM, room="105", lessons=[lesson_a, lesson_b]),
+            TeacherIssue(
+                collision_type=CollisionTypeEnum.TEACHER,
+                teacher="Ivan",
+                teaching_lessons=[lesson_a, lesson_b],
+                studying_lessons=[],
+            ),
+            CapacityIssue(
+                collision_type=CollisionTypeEnum.CAPACITY,
+                room="106",
+                room_capacity=10,
+                needed_capacity=20,
+                lesson=lesson_c,
+            ),
+            OutlookIssue(
+                collision_type=CollisionTypeEnum.OUTLOOK,
+                outlook_event_title="Meeting",
+                outlook_info=[booking],
+                lessons=[lesson_a],
+            ),
+        ]
+    )
+
+    normalized = NormalizedCheckResults.from_check_results(results)
+
+    assert normalized.lessons == [lesson_a, lesson_b, lesson_c]
+    assert normalized.bookings == [booking]
+    room, teacher, capacity, outlook = normalized.issues
+    assert room.lessons == [0, 1]
+    assert teacher.teaching_lessons == [0, 1] and teacher.studying_lessons == []
+    assert capacity.lesson == 2 and capacity.needed_capacity == 20
+    assert outlook.lessons == [0] and outlook.outlook_info == [0]
+    # references resolve back to the same issues
+    assert [normalized.lessons[i] for i in room.lessons] == results.issues[0].lessons
+    assert len(normalized.model_dump_json()) < len(results.model_dump_json())
+
+
+# ── single-flight tests ───────────────────────────────────────────────
+
+
+class TestSingleFlight:
+    @staticmethod
+    def _counting_fn(calls: list[str], value: str, delay: float = 0.01):
+        async def fn() -> str:
+            calls.append(value)
+            await asyncio.sleep(delay)
+            return value
+
+        return fn
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_calls_share_computation(self) -> None:
+        single_flight: SingleFlight[str, str] = SingleFlight("test")
+        calls: list[str] = []
+        results = await asyncio.gather(*(single_flight.do("key", self._counting_fn(calls, "result")) for _ in range(5)))
+        assert results == ["result"] * 5
+        assert calls == ["result"]
+        stats = single_flight.stats()
+        assert (stats.calls, stats.coalesced, stats.cache_hits, stats.in_flight) == (5, 4, 0, 0)
+
+    @pytest.mark.asyncio
+    async def test_different_keys_are_computed_separately(self) -> None:
+        single_flight: SingleFlight[str, str] = SingleFlight("test")
+        calls: list[str] = []
+        results = await asyncio.gather(
+            single_flight.do("a", self._counting_fn(calls, "a")),
+            single_flight.do("b", self._counting_fn(calls, "b")),
+        )
+        assert results == ["a", "b"]
+        assert sorted(calls) == ["a", "b"]
+        assert single_flight.stats().coalesced == 0
+
+    @pytest.mark.asyncio
+    async def test_checks_with_different_tokens_are_not_shared(self) -> None:
+        calls: list[str] = []
+
+        async def run_check(options: OptionsData, params: CheckParameters, token: str) -> CheckResults:
+            calls.append(token)
+            await asyncio.sleep(0.01)
+            return CheckResults(issues=[])
+
+        with patch("src.modules.collisions.check.run_check", run_check):
+            await asyncio.gather(
+                run_check_coalesced(OptionsData(), CheckParameters(), "first"),
+                run_check_coalesced(OptionsData(), CheckParameters(), "first"),
+                run_check_coalesced(OptionsData(), CheckParameters(), "second"),
+            )
+        assert sorted(calls) == ["first", "second"]
+
+    @pytest.mark.asyncio
+    async def test_occupancy_indexes_of_different_tokens_are_not_shared(self) -> None:
+        booking_client = AsyncMock()
+        booking_client.get_rooms.return_value = []
+        booking_client.get_all_bookings.return_value = []
+        single_flight: SingleFlight[tuple[str, str], OccupancyIndex] = SingleFlight("test", ttl=60)
+        semester_options = SemesterOptions(name="Fall 25")
+        with (
+            patch("src.modules.collisions.check.fetch_lessons", AsyncMock(return_value=[])),
+            patch("src.modules.collisions.check.booking_client", booking_client),
+            patch("src.modules.collisions.check.occupancy_single_flight", single_flight),
+        ):
+            first = await get_occupancy_index(semester_options, "first")
+            assert await get_occupancy_index(semester_options, "first") is first
+            assert await get_occupancy_index(semester_options, "second") is not first
+        assert [call.args[0] for call in booking_client.get_rooms.call_args_list] == ["first", "second"]
+
+    @pytest.mark.asyncio
+    async def test_occupancy_index_without_bookings_is_not_cached(self) -> None:
+        booking_client = AsyncMock()
+        booking_client.get_rooms.return_value = []
+        booking_client.get_all_bookings.side_effect = [ConnectionError("booking is down"), []]
+        single_flight: SingleFlight[tuple[str, str], OccupancyIndex] = SingleFlight("test", ttl=60)
+        semester_options = SemesterOptions(name="Fall 25")
+        with (
+            patch("src.modules.collisions.check.fetch_lessons", AsyncMock(return_value=[])),
+            patch("src.modules.collisions.check.booking_client", booking_client),
+            patch("src.modules.collisions.check.occupancy_single_flight", single_flight),
+        ):
+            with pytest.raises(ConnectionError):
+                await get_occupancy_index(semester_options, "token")
+            await get_occupancy_index(semester_options, "token")
+        assert booking_client.get_all_bookings.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_result_is_reused_within_ttl(self) -> None:
+        single_flight: SingleFlight[str, str] = SingleFlight("test", ttl=0.05)
+        calls: list[str] = []
+        await single_flight.do("key", self._counting_fn(calls, "first", delay=0))
+        assert await single_flight.do("key", self._counting_fn(calls, "second", delay=0)) == "first"
+        assert single_flight.stats().cache_hits == 1
+        await asyncio.sleep(0.06)
+        assert await single_flight.do("key", self._counting_fn(calls, "third", delay=0)) == "third"
+        assert calls == ["first", "third"]
+
+    @pytest.mark.asyncio
+    async def test_failure_is_shared_but_not_cached(self) -> None:
+        single_flight: SingleFlight[str, str] = SingleFlight("test", ttl=60)
+
+        async def fail() -> str:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("spreadsheet is unavailable")
+
+        results = await asyncio.gather(
+            single_flight.do("key", fail), single_flight.do("key", fail), return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await single_flight.do("key", self._counting_fn([], "recovered", delay=0)) == "recovered"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self) -> None:
+        single_flight: SingleFlight[str, str] = SingleFlight("test")
+        calls: list[str] = []
+        first = asyncio.create_task(single_flight.do("key", self._counting_fn(calls, "result", delay=0.05)))
+        second = asyncio.create_task(single_flight.do("key", self._counting_fn(calls, "result", delay=0.05)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "result"
+        assert calls == ["result"]
+
+
+@pytest.mark.asyncio
+async def test_synthetic_semester_has_every_kind_of_collisions() -> None:
+    semester = generate_semester(seed=1)
+    assert semester.lessons == generate_semester(seed=1).lessons
+    assert semester.lessons != generate_semester(seed=2).lessons
+    assert {lesson.source_type for lesson in semester.lessons} == {"core_course", "elective"}
+
+    checker = CollisionChecker(token="", rooms=semester.rooms, teachers=semester.teachers)
+    with patch("src.modules.collisions.collision_checker.booking_client") as booking_client:
+        booking_client.get_all_bookings = AsyncMock(return_value=semester.bookings)
+        issues = await checker.get_collisions(semester.lessons, targets=semester.targets)
+    assert {issue.collision_type for issue in issues} == set(CollisionTypeEnum)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("free_threaded", [False, True])
+async def test_checks_in_workers_find_the_same_issues(free_threaded: bool) -> None:
+    semester = generate_semester(seed=1)
+    checker = CollisionChecker(token="", rooms=semester.rooms, teachers=semester.teachers, bookings=semester.bookings)
+    expected = await checker.get_collisions(semester.lessons, targets=semester.targets)
+
+    pool = ChecksPool()
+    with (
+        patch("src.modules.collisions.parallel.free_threaded", return_value=free_threaded),
+        patch("src.modules.collisions.collision_checker.checks_pool", pool),
+    ):
+        try:
+            issues = await checker.get_collisions(semester.lessons, targets=semester.targets, workers=3)
+        finally:
+            pool.shutdown()
+    assert issues == expected
+    # issues from worker processes hold the original lessons, not their copies
+    lesson_ids = {id(lesson) for lesson in semester.lessons}
+    room_issues = [issue for issue in issues if issue.collision_type == CollisionTypeEnum.ROOM]
+    assert room_issues
+    assert all(id(lesson) in lesson_ids for issue in room_issues for lesson in issue.lessons)
+
+
+@pytest.mark.asyncio
+async def test_checks_pool_pickles_snapshot_off_the_event_loop() -> None:
+    semester = generate_semester(seed=1)
+    checker = CollisionChecker(token="", rooms=semester.rooms, teachers=semester.teachers)
+    threads = []
+    original_dumps = pickle.dumps
+
+    def dumps(*args, **kwargs) -> bytes:
+        threads.append(threading.current_thread())
+        return original_dumps(*args, **kwargs)
+
+    pool = ChecksPool()
+    with (
+        patch("src.modules.collisions.parallel.free_threaded", return_value=False),
+        patch("src.modules.collisions.parallel.pickle.dumps", dumps),
+    ):
+        try:
+            futures = await pool.submit(checker, semester.lessons, ["check_for_room_issue"], workers=2)
+            assert await futures[0] == checker.check_for_room_issue(semester.lessons)
+        finally:
+            pool.shutdown()
+    assert threads
+    assert threading.main_thread() not in threads
+
+
+@pytest.mark.asyncio
+async def test_checks_pool_replaces_broken_workers() -> None:
+    semester = generate_semester(seed=1)
+    checker = CollisionChecker(token="", rooms=semester.rooms, teachers=semester.teachers)
+    pool = ChecksPool()
+    with patch("src.modules.collisions.parallel.free_threaded", return_value=False):
+        try:
+            broken = pool.executor(2)
+            # a worker exiting abruptly breaks the whole process pool
+            with pytest.raises(BrokenProcessPool):
+                broken.submit(os._exit, 1).result()
+            futures = await pool.submit(checker, semester.lessons, ["check_for_room_issue"], workers=2)
+            assert await futures[0] == checker.check_for_room_issue(semester.lessons)
+            assert pool.executor(2) is not broken
+        finally:
+            pool.shutdown()
+
+
+def test_checks_pool_is_started_once_for_concurrent_jobs() -> None:
+    started = []
+
+    def slow_executor(**kwargs) -> ThreadPoolExecutor:
+        sleep(0.01)
+        started.append(ThreadPoolExecutor(**kwargs))
+        return started[-1]
+
+    pool = ChecksPool()
+    with (
+        patch("src.modules.collisions.parallel.free_threaded", return_value=True),
+        patch("src.modules.collisions.parallel.ThreadPoolExecutor", side_effect=slow_executor),
+        ThreadPoolExecutor(max_workers=4) as jobs,
+    ):
+        try:
+            executors = list(jobs.map(lambda _: pool.executor(2), range(4)))
+        finally:
+            pool.shutdown()
+    assert len(started) == 1
+    assert all(executor is started[0] for executor in executors)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("bookings_fail", [False, True])
+async def test_run_check_fetches_rooms_and_bookings_while_parsing(bookings_fail: bool) -> None:
+    semester = generate_semester(seed=1)
+    options = OptionsData(
+        semester=SemesterOptions(
+            name="Fall 25", core_courses_spreadsheet_id="synthetic", core_courses_targets=semester.targets
+        ),
+        teachers=TeachersData(data=semester.teachers),
+    )
+    checker = CollisionChecker(token="", rooms=semester.rooms, teachers=semester.teachers, bookings=semester.bookings)
+    expected = await checker.get_collisions(semester.lessons, targets=semester.targets)
+    if bookings_fail:
+        expected = [issue for issue in expected if issue.collision_type != CollisionTypeEnum.OUTLOOK]
+
+    async def fetch_lessons(*_) -> list[Lesson]:
+        await asyncio.sleep(0.1)
+        return semester.lessons
+
+    async def get_rooms(token: str) -> list[RoomDTO]:
+        await asyncio.sleep(0.05)
+        return semester.rooms
+
+    async def get_all_bookings(**_) -> list[BookingDTO]:
+        await asyncio.sleep(0.05)
+        if bookings_fail:
+            raise ConnectionError("booking is down")
+        return semester.bookings
+
+    booking_client = AsyncMock()
+    booking_client.get_rooms.side_effect = get_rooms
+    booking_client.get_all_bookings.side_effect = get_all_bookings
+    timings = CheckTimings()
+    with (
+        patch("src.modules.collisions.check.fetch_lessons", fetch_lessons),
+        patch("src.modules.collisions.check.booking_client", booking_client),
+        patch("src.modules.collisions.collision_checker.booking_client", booking_client),
+    ):
+        results = await run_check(options, CheckParameters(), token="", timings=timings)
+
+    assert results.issues == expected
+    booking_client.get_rooms.assert_called_once()
+    booking_client.get_all_bookings.assert_called_once()
+    # rooms and bookings are fetched while lessons are parsed, checks wait for all of them
+    lessons_end = timings.phases["lessons"][1]
+    for phase in ("rooms", "bookings"):
+        start, end = timings.phases[phase]
+        assert start < end < lessons_end
+    assert timings.phases["checks"][0] >= lessons_end
+
+
+@pytest.mark.asyncio
+async def test_run_check_retrieves_errors_of_prefetch_when_parsing_fails() -> None:
+    options = OptionsData(semester=SemesterOptions(name="Fall 25", core_courses_spreadsheet_id="synthetic"))
+
+    async def fetch_lessons(*_) -> list[Lesson]:
+        await asyncio.sleep(0.05)
+        raise ValueError("spreadsheet is broken")
+
+    booking_client = AsyncMock()
+    booking_client.get_rooms.side_effect = ConnectionError("booking is down")
+    loop = asyncio.get_running_loop()
+    unhandled = []
+    loop.set_exception_handler(lambda _, context: unhandled.append(context))
+    try:
+        with (
+            patch("src.modules.collisions.check.fetch_lessons", fetch_lessons),
+            patch("src.modules.collisions.check.booking_client", booking_client),
+            pytest.raises(ValueError, match="spreadsheet is broken"),
+        ):
+            await run_check(options, CheckParameters(check_outlook_collisions=False), token="")
+        gc.collect()
+    finally:
+        loop.set_exception_handler(None)
+    assert unhandled == []
+
+
+def test_offline_check_from_local_files(tmp_path, capsys) -> None:
+    core_courses = core_courses_config(2)
+    electives = electives_config(1)
+    options = OptionsData(
+        semester=SemesterOptions(
+            name="Fall 25",
+            core_courses_spreadsheet_id=core_courses.spreadsheet_id,
+            core_courses_targets=core_courses.targets,
+            electives_targets=electives.targets,
+            electives=electives.electives,
+        )
+    )
+    (tmp_path / "options.json").write_text(options.model_dump_json())
+    (tmp_path / "core.xlsx").write_bytes(build_core_courses_workbook(sheets=2).getvalue())
+    (tmp_path / "electives.xlsx").write_bytes(build_electives_workbook().getvalue())
+    (tmp_path / "rooms.json").write_text('[{"id": "108", "capacity": 1}, {"id": "301", "capacity": 1}]')
+    args = ["--options", str(tmp_path / "options.json"), "--core-courses", str(tmp_path / "core.xlsx")]
+    args += ["--electives", str(tmp_path / "electives.xlsx"), "--rooms", str(tmp_path / "rooms.json")]
+
+    network = AsyncMock(side_effect=AssertionError("no network offline"))
+    with (
+        patch("src.modules.collisions.core_courses_adapter.fetch_xlsx_spreadsheet", network),
+        patch("src.modules.collisions.electives_adapter.fetch_xlsx_spreadsheet", network),
+        patch("src.modules.collisions.check.booking_client", network),
+        patch("src.modules.collisions.collision_checker.booking_client", network),
+    ):
+        assert check(build_parser().parse_args([*args, "--workers", "1"])) == 0
+        results = CheckResults.model_validate_json(capsys.readouterr().out)
+        assert check(build_parser().parse_args([*args, "--format", "table", "--fail-on-issues"])) == 1
+        table = capsys.readouterr().out.splitlines()
+
+    types = {issue.collision_type for issue in results.issues}
+    assert {CollisionTypeEnum.ROOM, CollisionTypeEnum.TEACHER, CollisionTypeEnum.CAPACITY} <= types
+    # Outlook check needs bookings
+    assert CollisionTypeEnum.OUTLOOK not in types
+    lessons = [lesson for issue in results.issues if issue.collision_type == "room" for lesson in issue.lessons]
+    assert {lesson.spreadsheet_id for lesson in lessons} == {core_courses.spreadsheet_id, "electives"}
+    assert table[0].split() == ["sheet", "room", "teacher", "capacity", "outlook", "total"]
+    assert table[-1].split() == [
+        "total",
+        *(str(sum(issue.collision_type == t for issue in results.issues)) for t in CollisionTypeEnum),
+        str(len(results.issues)),
+    ]
+
+
+def test_occupancy_index_layers_exceptions_and_bookings() -> None:
+    monday = date(2025, 9, 1)
+    rooms = [RoomDTO(id="101", capacity=30), RoomDTO(id="102", capacity=60), RoomDTO(id="103")]
+    lessons = [
+        _make_lesson("Weekly", start=(9, 0), end=(10, 30), room="101"),
+        _make_lesson("Except", start=(9, 0), end=(10, 30), room="102").model_copy(update={"date_except": [monday]}),
+        _make_lesson("On", start=(9, 0), end=(10, 30), room="103").model_copy(update={"date_on": [monday]}),
+    ]
+    booking = BookingDTO.model_validate(
+        {"room_id": "102", "title": "Meeting", "start": "2025-09-08T12:00:00+03:00", "end": "2025-09-08T13:00:00+03:00"}
+    )
+    index = OccupancyIndex.build(lessons, rooms, [booking])
+
+    def free(start: time, end: time, **kwargs) -> list[str]:
+        return [room.id for room in index.free_rooms(start, end, **kwargs)]
+
+    # every week: lessons on some weeks occupy the weekday too
+    assert free(time(10), time(11), weekday=0) == []
+    assert free(time(10, 30), time(11), weekday=0) == []  # touching lessons collide
+    assert free(time(10, 40), time(12, 10), weekday=0) == ["101", "102", "103"]
+    assert free(time(10), time(11), weekday=1) == ["101", "102", "103"]
+    # on dates: exceptions and bookings
+    assert free(time(10), time(11), dates=[monday]) == ["102"]
+    assert free(time(10), time(11), dates=[monday + timedelta(weeks=1)]) == ["103"]
+    assert free(time(12, 30), time(13), dates=[monday + timedelta(weeks=1)]) == ["101", "103"]
+    assert free(time(12, 30), time(13), dates=[monday + timedelta(weeks=1)], min_capacity=30) == ["101"]
@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import json
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from joserfc import jwt
+from joserfc.jwk import RSAKey
+
+from src.modules.inh_accounts_sdk import InNoHassleAccounts
+
+
+def _key(kid: str) -> RSAKey:
+    return RSAKey.generate_key(2048, parameters={"kid": kid})
+
+
+def _token(key: RSAKey, exp: float | None = None, **claims) -> str:
+    claims = {"uid": "123", "email": "test@innopolis.university", **claims}
+    if exp is not None:
+        claims["exp"] = int(exp)
+    return jwt.encode({"alg": "RS256", "kid": key.kid}, claims, key)
+
+
+async def _accounts(*keys: RSAKey) -> InNoHassleAccounts:
+    accounts = InNoHassleAccounts(api_jwt_token="token")
+    with patch.object(accounts, "get_key_set", AsyncMock(return_value=_jwks(*keys))):
+        await accounts.update_key_set()
+    return accounts
+
+
+def _jwks(*keys: RSAKey) -> dict:
+    return {"keys": [key.as_dict(private=False) for key in keys]}
+
+
+@pytest.mark.asyncio
+async def test_verified_token_is_cached() -> None:
+    key = _key("public")
+    accounts = await _accounts(key)
+    token = _token(key, exp=time.time() + 3600)
+
+    with patch("src.modules.inh_accounts_sdk.jwt.decode", wraps=jwt.decode) as decode:
+        first = accounts.decode_token(token)
+        second = accounts.decode_token(token)
+
+    assert first is not None and first.innohassle_id == "123"
+    assert second is first
+    assert decode.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_token_expires() -> None:
+    key = _key("public")
+    accounts = await _accounts(key)
+    token = _token(key, exp=time.time() + 3600)
+    assert accounts.decode_token(token) is not None
+
+    with patch("src.modules.inh_accounts_sdk.time.time", return_value=time.time() + 7200):
+        assert accounts.decode_token(token) is None
+
+
+@pytest.mark.asyncio
+async def test_invalid_tokens_are_rejected() -> None:
+    key = _key("public")
+    accounts = await _accounts(key)
+    assert accounts.decode_token("garbage") is None
+    assert accounts.decode_token(_token(_key("public"))) is None  # signed by another key
+    assert accounts.decode_token(_token(key, exp=time.time() - 10)) is None
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_triggers_key_set_refresh() -> None:
+    old_key, new_key = _key("public"), _key("rotated")
+    accounts = await _accounts(old_key)
+    accounts._key_set_refreshed_at = 0.0  # cooldown is over
+    token = _token(new_key, exp=time.time() + 3600)
+
+    with patch.object(accounts, "get_key_set", AsyncMock(return_value=_jwks(old_key, new_key))):
+        assert accounts.decode_token(token) is None
+        assert accounts._key_set_refresh is not None
+        await accounts._key_set_refresh
+
+    assert accounts.decode_token(token) is not None
+
+
+@pytest.mark.asyncio
+async def test_key_rotation_drops_verified_tokens() -> None:
+    key = _key("public")
+    accounts = await _accounts(key)
+    token = _token(key, exp=time.time() + 3600)
+    assert accounts.decode_token(token) is not None
+
+    with patch.object(accounts, "get_key_set", AsyncMock(return_value=_jwks(_key("public")))):
+        await accounts.update_key_set()
+
+    assert accounts.decode_token(token) is None
+
+
+@pytest.mark.asyncio
+async def test_token_with_non_string_kid_is_rejected() -> None:
+    key = _key("public")
+    accounts = await _accounts(key)
+    header = base64.urlsafe_b64encode(json.dumps({"alg": "RS256", "kid": ["public"]}).encode()).rstrip(b"=")
+    _, payload, signature = _token(key).split(".")
+    assert accounts.decode_token(".".join([header.decode(), payload, signature])) is None
+
+
+@pytest.mark.asyncio
+async def test_malformed_key_set_does_not_stop_refreshing() -> None:
+    old_key, new_key = _key("public"), _key("public")
+    accounts = await _accounts(old_key)
+    key_sets = [{"keys": [{"kid": "public", "kty": "RSA"}]}, _jwks(new_key)]
+
+    async def refreshed() -> None:
+        while accounts.key_set is not key_sets[1]:
+            await asyncio.sleep(0)
+
+    with patch.object(accounts, "get_key_set", AsyncMock(side_effect=key_sets)):
+        refresh = asyncio.create_task(accounts.refresh_key_set_periodically(0))
+        try:
+            await asyncio.wait_for(refreshed(), timeout=1)
+        finally:
+            refresh.cancel()
+
+    assert accounts.decode_token(_token(new_key)) is not None
@@ -0,0 +1,93 @@
+from datetime import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import AsyncClient
+
+from src.modules.lessons.index import LessonIndex, normalize
+from src.modules.lessons.schemas import LessonsQuery
+from src.modules.options.repository import SemesterOptions
+from src.utils import WEEKDAYS
+from tests.fixtures.semester import generate_semester
+
+
+def test_lesson_index_matches_full_scan() -> None:
+    semester = generate_semester(seed=3)
+    index = LessonIndex()
+    index.update(semester.lessons)
+
+    def scan(query: LessonsQuery):
+        for lesson in semester.lessons:
+            groups = lesson.group_name if isinstance(lesson.group_name, tuple) else (lesson.group_name,)
+            rooms = lesson.room if isinstance(lesson.room, tuple) else (lesson.room,)
+            weekdays = {d.weekday() for d in lesson.date_on} if lesson.date_on else {WEEKDAYS.index(lesson.weekday)}
+            if query.group and normalize(query.group) not in {normalize(g) for g in groups if g}:
+                continue
+            if query.teacher and normalize(query.teacher) != normalize(lesson.teacher or ""):
+                continue
+            if query.room and query.room not in rooms:
+                continue
+            if query.weekday is not None and query.weekday not in weekdays:
+                continue
+            if query.start and lesson.end_time <= query.start or query.end and lesson.start_time >= query.end:
+                continue
+            yield lesson
+
+    lesson = semester.lessons[0]
+    group = lesson.group_name[0] if isinstance(lesson.group_name, tuple) else lesson.group_name
+    for query in [
+        LessonsQuery(group=group.lower()),
+        LessonsQuery(teacher=f"  {lesson.teacher.upper()} "),
+        LessonsQuery(room=semester.rooms[0].id, weekday=1),
+        LessonsQuery(weekday=2, start=time(10, 30), end=time(12, 40)),
+        LessonsQuery(group=group, weekday=0, start=time(14)),
+    ]:
+        expected = sorted(scan(query), key=id)
+        assert expected
+        assert sorted(index.query(query), key=id) == expected
+
+
+def test_lesson_index_updates_only_changed_sheets() -> None:
+    semester = generate_semester(seed=1)
+    index = LessonIndex()
+    index.update(semester.lessons)
+    sheets = dict(index.sheets)
+    assert len(sheets) == len(semester.targets) + 1  # core courses sheets and electives
+
+    index.update([lesson.model_copy() for lesson in semester.lessons])
+    assert index.version == 1
+    assert index.sheets == sheets
+
+    changed = [lesson for lesson in semester.lessons if lesson.google_sheet_name != "BS - Year 1"]
+    changed.append(semester.lessons[0].model_copy(update={"teacher": "New Teacher"}))
+    index.update(changed)
+    assert index.version == 2
+    for key, sheet_index in index.sheets.items():
+        assert (sheet_index is sheets[key]) == (key[1] != "BS - Year 1")
+    assert [lesson.lesson_name for lesson in index.query(LessonsQuery(teacher="new teacher"))] == [
+        semester.lessons[0].lesson_name
+    ]
+
+
+@pytest.mark.asyncio
+async def test_query_lessons(authenticated_client: AsyncClient) -> None:
+    semester = generate_semester(seed=2)
+    with (
+        patch(
+            "src.modules.lessons.routes.options_repository.get_semester", return_value=SemesterOptions(name="lessons")
+        ),
+        patch("src.modules.collisions.check.fetch_lessons", AsyncMock(return_value=semester.lessons)) as fetch_lessons,
+    ):
+        group = semester.lessons[-1].group_name or semester.lessons[0].group_name[0]
+        response = await authenticated_client.get("/lessons/", params={"group": group, "limit": 2})
+        assert response.status_code == 200
+        page = response.json()
+        assert page["total"] > 2
+        assert len(page["lessons"]) == 2
+
+        response = await authenticated_client.get("/lessons/", params={"group": group, "offset": 2, "limit": 1000})
+        assert len(response.json()["lessons"]) == page["total"] - 2
+
+        response = await authenticated_client.get("/lessons/", params={"weekday": "someday"})
+        assert response.status_code == 422
+    fetch_lessons.assert_called_once()
@@ -0,0 +1,140 @@
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import yaml
+from httpx import AsyncClient
+
+from src.config import settings
+from src.config_schema import Profiling
+from src.logging_ import _callable_source
+from src.metrics import Gauge, Histogram, LabeledCounter, LabeledHistogram, Registry
+from src.modules.collisions.collision_checker import CollisionChecker
+from tests.fixtures.xlsx import build_core_courses_workbook, core_courses_config, core_courses_sheet_names, sheet_gids
+
+SHEETS = 2
+
+
+def test_histogram_quantiles_are_within_bucket_bounds() -> None:
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for _ in range(90):
+        histogram.observe(0.005)
+    for _ in range(9):
+        histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    assert histogram.count == 100
+    p50, p95, p99 = histogram.quantile(0.5), histogram.quantile(0.95), histogram.quantile(0.99)
+    assert p50 is not None and 0 < p50 <= 0.01
+    assert p95 is not None and 0.01 < p95 <= 0.1
+    assert p99 is not None and 0.01 < p99 <= 0.1
+    assert histogram.quantile(1.0) == 0.5
+
+
+def test_histogram_values_above_last_bucket() -> None:
+    histogram = Histogram(buckets=(0.01, 0.1))
+    histogram.observe(7.0)
+    assert histogram.quantile(0.5) == 7.0
+    assert Histogram().quantile(0.5) is None
+
+
+def test_labeled_histogram_checks_labels() -> None:
+    histogram = LabeledHistogram("test", "Test", ("path", "handler"))
+    histogram.labels("/a", "a").observe(1)
+    assert histogram.labels("/a", "a").count == 1
+    with pytest.raises(ValueError):
+        histogram.labels("/a")
+
+
+def test_registry_renders_text_exposition_format() -> None:
+    registry = Registry()
+    histogram = registry.register(LabeledHistogram("duration_seconds", "Duration", ("source",), buckets=(0.1, 1.0)))
+    counter = registry.register(LabeledCounter("issues_total", "Issues", ("type",)))
+    registry.register(Gauge("jobs", "Jobs", ("status",), lambda: [(("queued",), 2)]))
+    histogram.labels('a "b"').observe(0.05)
+    histogram.labels('a "b"').observe(5)
+    counter.labels("room").inc(3)
+
+    assert registry.render().splitlines() == [
+        "# HELP duration_seconds Duration",
+        "# TYPE duration_seconds histogram",
+        'duration_seconds_bucket{source="a \\"b\\"",le="0.1"} 1',
+        'duration_seconds_bucket{source="a \\"b\\"",le="1"} 1',
+        'duration_seconds_bucket{source="a \\"b\\"",le="+Inf"} 2',
+        'duration_seconds_sum{source="a \\"b\\""} 5.05',
+        'duration_seconds_count{source="a \\"b\\""} 2',
+        "# HELP issues_total Issues",
+        "# TYPE issues_total counter",
+        'issues_total{type="room"} 3',
+        "# HELP jobs Jobs",
+        "# TYPE jobs gauge",
+        'jobs{status="queued"} 2',
+    ]
+    with pytest.raises(ValueError):
+        registry.register(LabeledCounter("jobs", "Jobs", ()))
+
+
+def test_endpoint_source_is_resolved_once() -> None:
+    def handler() -> None: ...
+
+    with patch("src.logging_.inspect.getsourcelines", wraps=__import__("inspect").getsourcelines) as getsourcelines:
+        assert _callable_source(handler) == _callable_source(handler)
+    assert getsourcelines.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_latency_endpoint(authenticated_client: AsyncClient) -> None:
+    for _ in range(3):
+        assert (await authenticated_client.get("/options/semester")).status_code == 200
+
+    response = await authenticated_client.get("/metrics/latency")
+    assert response.status_code == 200
+    semester = next(item for item in response.json() if item["path"] == "/options/semester")
+    assert semester["handler"] == "get_semester"
+    assert semester["count"] >= 3
+    assert 0 <= semester["p50"] <= semester["p95"] <= semester["p99"] <= semester["max"]
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(authenticated_client: AsyncClient) -> None:
+    await CollisionChecker(token="token").get_collisions([], check_outlook_collisions=False)
+
+    response = await authenticated_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE collisions_check_duration_seconds histogram" in lines
+    assert any(line.startswith('collisions_check_duration_seconds_count{type="room"}') for line in lines)
+    assert any(line.startswith('collisions_check_jobs{status="queued"}') for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_request_is_profiled_on_demand(authenticated_client: AsyncClient, tmp_path: Path) -> None:
+    config_yaml = yaml.safe_dump(core_courses_config(SHEETS).model_dump(mode="json"))
+    with (
+        patch.object(settings, "profiling", Profiling(enabled=True, directory=tmp_path, sampling_interval=0.001)),
+        patch(
+            "src.modules.collisions.core_courses_adapter.fetch_xlsx_spreadsheet",
+            AsyncMock(side_effect=lambda **_: build_core_courses_workbook(sheets=SHEETS, seed=2)),
+        ),
+        patch(
+            "src.modules.collisions.core_courses_adapter.get_sheet_gids",
+            AsyncMock(return_value=sheet_gids(core_courses_sheet_names(SHEETS))),
+        ),
+    ):
+        for profile in ("false", "true"):
+            response = await authenticated_client.post(
+                "/parser/parse-core-courses",
+                content=config_yaml,
+                headers={"Content-Type": "text/yaml", "X-Profile": profile},
+            )
+            assert response.status_code == 200
+
+        profiles = (await authenticated_client.get("/metrics/profiles")).json()
+        assert len(profiles) == 2
+        folded = next(name for name in profiles if name.endswith(".folded"))
+        assert "parse_core_courses_route" in folded
+        response = await authenticated_client.get(f"/metrics/profiles/{folded}")
+        assert response.status_code == 200
+        assert "CoreCoursesParser" in response.text
+        assert (await authenticated_client.get("/metrics/profiles/..%2Fsettings.yaml")).status_code == 404
@@ -0,0 +1,67 @@
+import json
+import os
+import stat
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from src.modules.options.repository import OptionsData, OptionsRepository, SemesterOptions
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> OptionsRepository:
+    return OptionsRepository(str(tmp_path / "options.json"))
+
+
+def test_creates_empty_options_file(repository: OptionsRepository) -> None:
+    assert repository.get_all_options() == OptionsData()
+    assert repository.file_path.exists()
+
+
+def test_returns_cached_options_while_file_is_unchanged(repository: OptionsRepository) -> None:
+    repository.set_semester(SemesterOptions(name="Fall 25"))
+    version = repository.version
+    first = repository.get_all_options()
+    assert repository.get_all_options() is first
+    assert repository.get_semester() is first.semester
+    assert repository.version == version
+
+
+def test_reloads_options_changed_by_another_process(repository: OptionsRepository) -> None:
+    repository.set_semester(SemesterOptions(name="Fall 25"))
+    cached = repository.get_all_options()
+
+    other_worker = OptionsRepository(str(repository.file_path))
+    other_worker.set_semester(SemesterOptions(name="Spring 26"))
+
+    semester = repository.get_semester()
+    assert semester is not None and semester.name == "Spring 26"
+    assert repository.get_all_options() is not cached
+
+
+def test_writes_are_atomic_and_bump_version(repository: OptionsRepository) -> None:
+    repository.get_all_options()
+    version = repository.version
+    repository.set_semester(SemesterOptions(name="Fall 25", core_courses_spreadsheet_id="sheet"))
+
+    assert repository.version == version + 1
+    assert os.listdir(repository.file_path.parent) == ["options.json"]
+    with open(repository.file_path) as f:
+        assert json.load(f)["semester"]["core_courses_spreadsheet_id"] == "sheet"
+
+
+def test_writes_keep_file_permissions(repository: OptionsRepository) -> None:
+    repository.get_all_options()
+    assert stat.S_IMODE(os.stat(repository.file_path).st_mode) == 0o644
+    os.chmod(repository.file_path, 0o640)
+    repository.set_semester(SemesterOptions(name="Fall 25"))
+    assert stat.S_IMODE(os.stat(repository.file_path).st_mode) == 0o640
+
+
+def test_returned_options_are_immutable(repository: OptionsRepository) -> None:
+    repository.set_semester(SemesterOptions(name="Fall 25"))
+    semester = repository.get_semester()
+    assert semester is not None
+    with pytest.raises(ValidationError):
+        semester.name = "Changed"  # type: ignore
@@ -0,0 +1,340 @@
+import datetime
+import io
+import json
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+import yaml
+from httpx import AsyncClient
+from openpyxl.cell.rich_text import CellRichText, TextBlock
+from openpyxl.cell.text import InlineFont
+from openpyxl.styles import Border, Side
+
+from src.core_courses.cell_to_event import EventFieldsMemo, convert_cell_to_event, get_column_header
+from src.core_courses.config import DateRangeResolver, Override, Target
+from src.core_courses.parser import CoreCourseCell, CoreCoursesParser, CourseBlockCell
+from src.electives.parser import ElectiveParser, coordinates_to_a1
+from src.modules.collisions.core_courses_adapter import _process_location_item, get_all_core_courses_lessons
+from src.modules.collisions.electives_adapter import get_all_electives_lessons
+from src.utils import (
+    WEEKDAYS,
+    parse_month_day,
+    parse_time,
+    parse_time_range,
+    prettify_string,
+    sanitize_sheet_name,
+)
+from src.xlsx import XLSX_READERS
+from tests.fixtures.xlsx import (
+    build_core_courses_workbook,
+    build_electives_workbook,
+    core_courses_config,
+    core_courses_sheet_names,
+    electives_config,
+    electives_sheet_names,
+    sheet_gids,
+)
+
+SHEETS = 3
+SHEET_NAMES = core_courses_sheet_names(SHEETS)
+END = datetime.date(2025, 4, 27)
+
+
+def test_core_courses_pipeline_parallel_matches_sequential() -> None:
+    xlsx = build_core_courses_workbook(sheets=SHEETS, seed=1)
+
+    sequential_parser = CoreCoursesParser()
+    sequential = list(sequential_parser.pipeline(xlsx, SHEET_NAMES, sheet_gids(SHEET_NAMES), "test"))
+    parallel_parser = CoreCoursesParser()
+    parallel = list(
+        parallel_parser.pipeline_parallel(xlsx, SHEET_NAMES, sheet_gids(SHEET_NAMES), "test", max_workers=2)
+    )
+
+    assert len(parallel) == len(sequential) == SHEETS
+    for sequential_dfs, parallel_dfs in zip(sequential, parallel):
+        assert len(sequential_dfs) == len(parallel_dfs)
+        for sequential_df, parallel_df in zip(sequential_dfs, parallel_dfs):
+            pd.testing.assert_frame_equal(sequential_df, parallel_df)
+    assert dict(parallel_parser.last_dfs_merged_ranges or {}) == dict(sequential_parser.last_dfs_merged_ranges or {})
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_core_courses_cells_match_dataframes(seed: int) -> None:
+    xlsx = build_core_courses_workbook(sheets=SHEETS, seed=seed)
+    gids = sheet_gids(SHEET_NAMES)
+    dataframes = CoreCoursesParser().pipeline(xlsx, SHEET_NAMES, gids, "test")
+    cells = CoreCoursesParser().pipeline(xlsx, SHEET_NAMES, gids, "test", as_cells=True)
+
+    for grouped_dfs_with_cells_lst, sheet_cells in zip(dataframes, cells, strict=True):
+        expected = [
+            CourseBlockCell(course, group, weekday, timeslot, cell)
+            for grouped_dfs_with_cells in grouped_dfs_with_cells_lst
+            for (course, group), column in grouped_dfs_with_cells.items()
+            for (weekday, timeslot), cell in column.items()
+            if cell is not None
+        ]
+        assert expected
+        assert list(sheet_cells) == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("seed", [1, 2, 3])
+async def test_core_courses_grid_engine_matches_pandas(seed: int) -> None:
+    workbook = openpyxl.load_workbook(build_core_courses_workbook(sheets=SHEETS, seed=seed))
+    # values pandas reads in its own way and notes to the right of the schedule, outside of the bordered header
+    ws = workbook[SHEET_NAMES[0]]
+    notes_column = ws.max_column + 2
+    ws.cell(row=1, column=notes_column, value="Notes")
+    ws.cell(row=5, column=notes_column, value="MONDAY")
+    rooms = [cell for row in ws.iter_rows() for cell in row if isinstance(cell.value, int)]
+    rooms[0].value = float(rooms[0].value)
+    rooms[1].value = "N/A"
+    rooms[2].value = "   "
+    xlsx = io.BytesIO()
+    workbook.save(xlsx)
+
+    config = core_courses_config(SHEETS)
+    pandas_lessons = await get_all_core_courses_lessons(config, xlsx_file=io.BytesIO(xlsx.getvalue()))
+    grid_lessons = await get_all_core_courses_lessons(config, xlsx_file=io.BytesIO(xlsx.getvalue()), engine="grid")
+    iterparse_lessons = await get_all_core_courses_lessons(
+        config, xlsx_file=io.BytesIO(xlsx.getvalue()), engine="grid", reader="iterparse"
+    )
+    assert pandas_lessons
+    assert grid_lessons == pandas_lessons
+    assert iterparse_lessons == pandas_lessons
+
+    with pytest.raises(ValueError):
+        next(CoreCoursesParser().pipeline(xlsx, SHEET_NAMES, sheet_gids(SHEET_NAMES), "test", engine="grid"))
+
+
+def test_xlsx_readers_read_the_same_grids() -> None:
+    workbook = openpyxl.Workbook()
+    ws = workbook.active
+    ws.title = "Sheet"
+    workbook.create_sheet("Other")
+    thin = Side(style="thin")
+    ws["A1"], ws["B1"], ws["C1"] = "Header", "Merged", None
+    ws["B1"].border = Border(top=thin, bottom=thin)
+    ws["D1"].border = Border(right=thin)  # styled empty cell
+    ws.merge_cells("B1:C1")
+    ws["A2"] = CellRichText("Rich ", TextBlock(InlineFont(b=True), "text"))
+    ws["B2"], ws["C2"], ws["D2"] = 1.0, 2.5, True
+    ws["A3"], ws["B3"] = datetime.datetime(2025, 1, 13, 9, 0), "#N/A"
+    ws["C3"] = "=1+1"  # no cached value
+    ws["A5"] = "  "
+    ws["F7"].border = Border(left=thin)  # formatting only, outside of values
+    ws.merge_cells("B4:C5")
+    xlsx = io.BytesIO()
+    workbook.save(xlsx)
+
+    grids = {name: reader.read_sheets(xlsx, ["Sheet", "Missing"]) for name, reader in XLSX_READERS.items()}
+    expected = grids["openpyxl"]["Sheet"]
+    assert grids["openpyxl"].keys() == {"Sheet"}
+    assert pd.DataFrame(expected.values).equals(
+        pd.DataFrame(
+            [
+                ["Header", "Merged", np.nan, np.nan],
+                ["Rich text", 1, 2.5, True],
+                [datetime.datetime(2025, 1, 13, 9, 0), np.nan, np.nan, np.nan],
+                [np.nan, np.nan, np.nan, np.nan],
+                ["  ", np.nan, np.nan, np.nan],
+            ],
+            dtype=object,
+        )
+    )
+    # openpyxl gives borders of the merged range to all its cells when saving
+    assert expected.header_borders[1:4] == [frozenset({"top", "bottom"})] * 2 + [frozenset({"right"})]
+    assert [str(merged_range) for merged_range in expected.merged_ranges] == ["B1:C1", "B4:C5"]
+    assert (expected.max_row, expected.max_column) == (ws.max_row, ws.max_column)
+    for name, reader in XLSX_READERS.items():
+        assert reader.sheet_names(xlsx) == ["Sheet", "Other"]
+        grid = grids[name]["Sheet"]
+        assert pd.DataFrame(grid.values).equals(pd.DataFrame(expected.values)), name
+        assert grid.header_borders == expected.header_borders
+        assert list(grid.merged_ranges) == list(expected.merged_ranges)
+        assert (grid.max_row, grid.max_column) == (expected.max_row, expected.max_column)
+
+
+@pytest.mark.asyncio
+async def test_parse_core_courses_ndjson_matches_json(authenticated_client: AsyncClient) -> None:
+    config_yaml = yaml.safe_dump(core_courses_config(SHEETS).model_dump(mode="json"))
+    with (
+        patch(
+            "src.modules.collisions.core_courses_adapter.fetch_xlsx_spreadsheet",
+            AsyncMock(side_effect=lambda **_: build_core_courses_workbook(sheets=SHEETS, seed=2)),
+        ),
+        patch(
+            "src.modules.collisions.core_courses_adapter.get_sheet_gids",
+            AsyncMock(return_value=sheet_gids(SHEET_NAMES)),
+        ),
+    ):
+        as_json = await authenticated_client.post(
+            "/parser/parse-core-courses", content=config_yaml, headers={"Content-Type": "text/yaml"}
+        )
+        as_ndjson = await authenticated_client.post(
+            "/parser/parse-core-courses",
+            params={"format": "ndjson"},
+            content=config_yaml,
+            headers={"Content-Type": "text/yaml"},
+        )
+
+    assert as_json.status_code == as_ndjson.status_code == 200
+    assert as_ndjson.headers["content-type"] == "application/x-ndjson"
+    json_lessons = as_json.json()
+    ndjson_lessons = [json.loads(line) for line in as_ndjson.text.splitlines()]
+    assert json_lessons
+    assert [lesson["google_sheet_name"] for lesson in ndjson_lessons] == sorted(
+        (lesson["google_sheet_name"] for lesson in ndjson_lessons), key=SHEET_NAMES.index
+    )
+
+    def key(lesson: dict) -> str:
+        return json.dumps(lesson, sort_keys=True)
+
+    assert sorted(ndjson_lessons, key=key) == sorted(json_lessons, key=key)
+
+
+@pytest.mark.asyncio
+async def test_electives_workbook_is_parsed_line_by_line() -> None:
+    xlsx = build_electives_workbook(sheets=2, weeks=3, seed=1)
+    sheet_names = electives_sheet_names(2)
+    workbook = openpyxl.load_workbook(io.BytesIO(xlsx.getvalue()))
+    expected_lines = sum(
+        len(value.splitlines())
+        for sheet_name in sheet_names
+        for row in workbook[sheet_name].iter_rows(min_row=2, values_only=True)
+        if row[0] and not row[0].startswith("Week")
+        for value in row[1:]
+        if value
+    )
+    with (
+        patch("src.modules.collisions.electives_adapter.fetch_xlsx_spreadsheet", AsyncMock(return_value=xlsx)),
+        patch(
+            "src.modules.collisions.electives_adapter.get_sheet_gids", AsyncMock(return_value=sheet_gids(sheet_names))
+        ),
+    ):
+        lessons = await get_all_electives_lessons(electives_config(2))
+
+    assert len(lessons) == expected_lines
+    for lesson in lessons:
+        assert lesson.date_on and WEEKDAYS[lesson.date_on[0].weekday()] == lesson.weekday
+        assert lesson.teacher is not None
+    pandas_lessons = await get_all_electives_lessons(electives_config(2), xlsx_file=xlsx)
+    for reader in XLSX_READERS:
+        assert await get_all_electives_lessons(electives_config(2), xlsx_file=xlsx, reader=reader) == pandas_lessons
+
+
+def test_electives_weeks_are_split_lazily_in_the_same_order() -> None:
+    sheet_name = electives_sheet_names(1)[0]
+    workbook = openpyxl.load_workbook(build_electives_workbook(weeks=3, fill_ratio=1, seed=1))
+    ws = workbook[sheet_name]
+    # swap the first two timeslots of the last week
+    last_week_row = max(row for row in range(1, ws.max_row + 1) if str(ws.cell(row, 1).value).startswith("Week"))
+    for column in range(1, ws.max_column + 1):
+        first, second = ws.cell(last_week_row + 1, column), ws.cell(last_week_row + 2, column)
+        first.value, second.value = second.value, first.value
+    xlsx = io.BytesIO()
+    workbook.save(xlsx)
+
+    parser = ElectiveParser()
+    sheet_name = sanitize_sheet_name(sheet_name)
+    dfs, coordinates = parser.get_clear_dataframes_from_xlsx(xlsx, [sheet_name])
+    weeks = parser.split_df_by_weeks(dfs[sheet_name], coordinates[sheet_name])
+    first_week = next(weeks)
+    first_week_df, _ = first_week
+    for week_df, week_coordinates in [first_week, *weeks]:
+        # timeslots are in the order of the first week, as if weeks were joined into one table
+        assert week_df.index.tolist() == first_week_df.index.tolist()
+        assert week_coordinates.shape == week_df.shape
+        for (i, j), value in np.ndenumerate(week_df.to_numpy()):
+            assert value == prettify_string(ws[coordinates_to_a1(week_coordinates[i, j])].value.strip())
+
+
+def test_time_and_date_parsing() -> None:
+    assert parse_time_range("9:00-10:30") == (datetime.time(9, 0), datetime.time(10, 30))
+    assert parse_time_range("Week 1") is None
+    assert parse_month_day("February 29", 2028) == datetime.date(2028, 2, 29)
+    assert parse_month_day("SUNDAY", 2028) is None
+    parse_time.cache_clear()
+    for _ in range(3):
+        parse_time_range("9:00-10:30")
+        parse_time("09:00")
+    assert parse_time.cache_info().hits >= 2
+
+
+def test_column_header_resolves_overrides_once() -> None:
+    target = Target(
+        sheet_name="BS - Year 1",
+        start_date=datetime.date(2025, 1, 13),
+        end_date=datetime.date(2025, 5, 4),
+        override=[
+            Override(groups=["B25-CSE-01"], courses=[], start_date=datetime.datetime(2025, 2, 3), end_date=END),
+            Override(groups=[], courses=["BS1"], start_date=datetime.datetime(2025, 1, 20), end_date=END),
+        ],
+    )
+    dates = DateRangeResolver(target)
+    assert get_column_header("BS1", "B25-CSE-01 (29)", dates) == (
+        "B25-CSE-01",
+        29,
+        datetime.date(2025, 2, 3),
+        END,
+    )
+    assert get_column_header("BS1", "B25-CSE-02(G12)", dates) == ("B25-CSE-02", 12, datetime.date(2025, 1, 20), END)
+    assert get_column_header("BS2", "B25-DSAI-01 (30)", dates) == (
+        "B25-DSAI-01",
+        30,
+        target.start_date,
+        target.end_date,
+    )
+    # the outlook check resolves merged lessons by the tuple of groups, which matches no override
+    assert dates.resolve(("B25-CSE-01", "B25-CSE-02"), "BS2") == (target.start_date, target.end_date)
+
+    target.override.clear()  # resolved ranges are cached by the resolver
+    assert dates.resolve("B25-CSE-01", "BS1") == (datetime.date(2025, 2, 3), END)
+
+    cell = CoreCourseCell(
+        value=("Mathematical Analysis I (lec)", "Ivan Ivanov", "105"),
+        spreadsheet_id="test",
+        google_sheet_gid="0",
+        google_sheet_name="BS - Year 1",
+        a1="C5",
+    )
+    kwargs = dict(
+        weekday="MONDAY", timeslot=(datetime.time(9), datetime.time(10, 30)), course="BS2", group="B25-DSAI-01 (30)"
+    )
+    header = get_column_header("BS2", "B25-DSAI-01 (30)", DateRangeResolver(target))
+    assert convert_cell_to_event(cell, target=target, header=header, **kwargs) == convert_cell_to_event(
+        cell, target=target, **kwargs
+    )
+
+
+def test_event_fields_memo_shares_processed_fields() -> None:
+    # starts on Monday
+    target = Target(sheet_name="BS - Year 1", start_date=datetime.date(2025, 1, 13), end_date=END, override=[])
+    cell = CoreCourseCell(
+        value=("Physics I (lab)", "Ivan Ivanov/ Maria Razmazina", "108 (WEEK 2,4)"),
+        spreadsheet_id="test",
+        google_sheet_gid="0",
+        google_sheet_name="BS - Year 1",
+        a1="C5",
+    )
+    memo = EventFieldsMemo()
+    lessons = []
+    for weekday, group in [("MONDAY", "B25-CSE-01 (29)"), ("WEDNESDAY", "B25-CSE-02 (28)")]:
+        kwargs = dict(
+            weekday=weekday,
+            timeslot=(datetime.time(9), datetime.time(10, 30)),
+            course="BS1",
+            group=group,
+            target=target,
+        )
+        event = convert_cell_to_event(cell, memo=memo, **kwargs)
+        assert event == convert_cell_to_event(cell, **kwargs)
+        lessons.extend(_process_location_item(event, target))
+    assert (memo.hits, memo.misses) == (1, 1)
+    assert lessons[0].teacher == "Ivan Ivanov,Maria Razmazina" and lessons[0].lesson_class_type == "lab"
+    # the shared location item is not modified by the first lesson
+    assert lessons[0].date_on == [datetime.date(2025, 1, 20), datetime.date(2025, 2, 3)]
+    assert lessons[1].date_on == [datetime.date(2025, 1, 22), datetime.date(2025, 2, 5)]